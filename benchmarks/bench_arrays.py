@@ -0,0 +1,85 @@
+"""Cost of encrypting arrays in memory, and of reading a few rows from disk.
+
+First compares `encrypt_array()` with the serializing round trip
+`np.frombuffer(cipher.encrypt(arr.tobytes(), ...))` on the whole
+matrix in CTR mode: time and peak memory allocated (by `tracemalloc`).
+
+Then saves a random (--rows, --cols) float32 matrix with `save_encrypted()`
+and reports the time to save it, to decrypt it whole, and to read
+--batch random rows at a time (cold, with an empty chunk cache, and
+then again warm) for each --chunk-bytes setting.
+
+    python benchmarks/bench_arrays.py [--rows N] [--cols N] [--batch N] [--mode gcm|ctr]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from npaes import AES, encrypt_array, load_encrypted, save_encrypted
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def peak_memory(func, *args, **kwargs) -> tuple[float, int]:
+    tracemalloc.start()
+    try:
+        seconds = timed(func, *args, **kwargs)
+        return seconds, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def serialized(cipher: AES, arr: np.ndarray, iv: bytes) -> np.ndarray:
+    ciphertext = cipher.encrypt(arr.tobytes(), mode="ctr", iv=iv)
+    return np.frombuffer(ciphertext, dtype=arr.dtype).reshape(arr.shape)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--cols", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--mode", choices=["gcm", "ctr"], default="gcm")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    arr = rng.random((args.rows, args.cols), dtype=np.float32)
+    key = rng.bytes(16)
+    cipher, iv = AES(key), rng.bytes(16)
+    encrypt_array(cipher, arr[:16], mode="ctr", iv=iv)  # Calibrate and build tables first
+    for label, func in (("tobytes/frombuffer", serialized), ("encrypt_array", None)):
+        if func is None:
+            seconds, peak = peak_memory(encrypt_array, cipher, arr, mode="ctr", iv=iv)
+        else:
+            seconds, peak = peak_memory(func, cipher, arr, iv)
+        print(f"{label:>18}: {seconds:6.2f} s, peak {peak / 1e6:6.1f} MB")
+    print()
+    print(f"{arr.nbytes / 1e6:.1f} MB matrix, {args.mode}, {args.batch} rows per read")
+    print(f"{'chunk':>8} {'save s':>7} {'full s':>7} {'cold ms/read':>13} {'warm ms/read':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "x.npaes"
+        for chunk_bytes in (4096, 16384, 65536, 262144):
+            save = timed(save_encrypted, path, arr, key, mode=args.mode, chunk_bytes=chunk_bytes)
+            x = load_encrypted(path, key, cache_chunks=1 << 20)
+            full = timed(np.asarray, x)
+            picks = [rng.integers(0, args.rows, args.batch) for _ in range(args.reads)]
+            x.cache_clear()
+            cold = sum(timed(x.__getitem__, p) for p in picks) / args.reads
+            warm = sum(timed(x.__getitem__, p) for p in picks) / args.reads
+            print(f"{chunk_bytes:>8} {save:7.2f} {full:7.2f} {1e3 * cold:13.2f} {1e3 * warm:13.2f}")
+            x.close()
+
+
+if __name__ == "__main__":
+    main()
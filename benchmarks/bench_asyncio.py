@@ -0,0 +1,96 @@
+"""Event-loop latency while encrypting, with and without `npaes.aio`.
+
+A ticker coroutine sleeps 1 ms at a time and records how late each wake
+is.  While it runs, --size bytes are CTR-encrypted three ways:
+synchronously inside a coroutine (`AES.encrypt()`), with
+`AES.encrypt_async()`, and streamed over a loopback TCP connection
+through `CTRStreamWriter`/`CTRStreamReader` in 64 KiB writes.  Reports
+wall time, throughput and the worst and 99th-percentile loop lag.
+
+    python benchmarks/bench_asyncio.py [--size BYTES]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from npaes import AES
+from npaes.aio import CTRStreamReader, CTRStreamWriter
+
+TICK = 0.001
+CHUNK = 64 * 1024
+
+
+async def ticker(lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def measure(name: str, size: int, job) -> None:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await job()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    lag_ms = np.array(lags) * 1e3
+    print(
+        f"{name:>10}: {elapsed * 1e3:8.1f} ms, {size / elapsed / 1e6:7.1f} MB/s,"
+        f" loop lag max {lag_ms.max():7.2f} ms, p99 {np.percentile(lag_ms, 99):6.2f} ms"
+    )
+
+
+async def main(size: int) -> None:
+    cipher = AES(os.urandom(16))
+    iv = os.urandom(16)
+    data = os.urandom(size)
+
+    async def blocking() -> None:
+        cipher.encrypt(data, mode="ctr", iv=iv)
+
+    async def offloaded() -> None:
+        await cipher.encrypt_async(data, mode="ctr", iv=iv)
+
+    async def loopback() -> None:
+        done = asyncio.get_running_loop().create_future()
+
+        async def handle(reader, writer) -> None:
+            r = CTRStreamReader(reader, cipher, iv)
+            nbytes = 0
+            while chunk := await r.read(CHUNK):
+                nbytes += len(chunk)
+            done.set_result(nbytes)
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            w = CTRStreamWriter(writer, cipher, iv)
+            view = memoryview(data)
+            for start in range(0, size, CHUNK):
+                await w.write(view[start : start + CHUNK])
+            w.close()
+            await w.wait_closed()
+            assert await done == size
+
+    await measure("blocking", size, blocking)
+    await measure("offloaded", size, offloaded)
+    await measure("loopback", size, loopback)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.size))
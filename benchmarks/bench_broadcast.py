@@ -0,0 +1,52 @@
+"""Many keys, few blocks each: one broadcast call versus a loop over keys.
+
+Encrypts --blocks blocks under each of --keys keys, once with a Python
+loop of `AES.encrypt_blocks` over pre-built ciphers and once with a
+single `npaes.encrypt_blocks(blocks, schedules)` call on the
+(keys, blocks, 16) broadcast, and reports the best of --runs.
+
+    python benchmarks/bench_broadcast.py [--keys N] [--blocks N] [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+import npaes
+from npaes import AES
+
+
+def best(func, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 256, (args.keys, 16), dtype=np.uint8)
+    blocks = rng.integers(0, 256, (args.keys, args.blocks, 16), dtype=np.uint8)
+    schedules = npaes.key_schedules(keys)[:, None]  # (keys, 1, 11, 4, 4)
+    ciphers = [AES(k.tobytes()) for k in keys]
+    pairs = list(zip(ciphers, blocks, strict=True))
+    looped = best(lambda: [c.encrypt_blocks(b) for c, b in pairs], args.runs)
+    broadcast = best(lambda: npaes.encrypt_blocks(blocks, schedules), args.runs)
+    n = args.keys * args.blocks
+    print(f"{args.keys} keys x {args.blocks} blocks")
+    print(f"  loop over keys: {looped * 1e3:8.1f} ms ({n / looped:10.0f} blocks/s)")
+    print(f"  one broadcast:  {broadcast * 1e3:8.1f} ms ({n / broadcast:10.0f} blocks/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Per-packet cost of AES-CCM, batched and one packet at a time.
+
+Encrypts --packets packets of --size bytes (each with 8 bytes of
+associated data and its own 13-byte nonce) with `ccm_encrypt_batch`,
+and a sample of them with `ccm_encrypt` in a loop, and reports the
+median microseconds per packet of --runs repetitions.
+
+    python benchmarks/bench_ccm.py [--packets N] [--size BYTES] [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+
+from npaes import AES
+from npaes.aead import ccm_encrypt, ccm_encrypt_batch
+
+
+def per_packet_us(func, npackets: int, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) / npackets * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packets", type=int, default=10_000)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    cipher = AES(os.urandom(16))
+    nonces = [os.urandom(13) for _ in range(args.packets)]
+    packets = [os.urandom(args.size) for _ in range(args.packets)]
+    headers = [os.urandom(8) for _ in range(args.packets)]
+    sample = min(args.packets, 200)
+
+    def batched() -> None:
+        ccm_encrypt_batch(cipher, nonces, packets, headers, tag_length=8)
+
+    def looped() -> None:
+        for i in range(sample):
+            ccm_encrypt(cipher, nonces[i], packets[i], headers[i], tag_length=8)
+
+    batch_us = per_packet_us(batched, args.packets, args.runs)
+    loop_us = per_packet_us(looped, sample, args.runs)
+    print(
+        f"CCM, {args.size}-byte packets: {batch_us:.2f} us/packet batched ({args.packets} packets)"
+    )
+    print(f"CCM, {args.size}-byte packets: {loop_us:.2f} us/packet one at a time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Time `import npaes` in fresh interpreters.
+
+Reports npaes's own share of the import (NumPy excluded) from
+`python -X importtime`, median of --runs subprocesses, both with and
+without cached bytecode.  The no-bytecode figure is the one that
+matters for serverless cold starts, where __pycache__ is often absent
+or read-only.
+
+    python benchmarks/bench_import.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+def npaes_import_us(*, bytecode: bool) -> int:
+    """Microseconds spent importing npaes modules, excluding dependencies."""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    # Import NumPy first so its cost is not attributed to npaes
+    code = "import numpy, numpy.typing; import npaes"
+    cmd = [sys.executable, "-X", "importtime", "-c", code]
+    with tempfile.TemporaryDirectory() as empty:
+        if not bytecode:
+            # An empty cache prefix forces npaes (and only the modules not
+            # yet imported, i.e. npaes) to be compiled from source
+            env["PYTHONPYCACHEPREFIX"] = empty
+            cmd.insert(1, "-B")
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+    total = 0
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        if self_us.strip().isdigit() and name.strip().startswith("npaes"):
+            total += int(self_us)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+    npaes_import_us(bytecode=True)  # Populate __pycache__
+    for bytecode in (True, False):
+        samples = [npaes_import_us(bytecode=bytecode) for _ in range(args.runs)]
+        label = "with bytecode" if bytecode else "from source"
+        print(f"import npaes ({label}): {statistics.median(samples) / 1000:.2f} ms median")
+
+
+if __name__ == "__main__":
+    main()
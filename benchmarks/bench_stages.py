@@ -0,0 +1,38 @@
+"""Where the time goes in each engine, stage by stage, by batch size.
+
+Prints the share of key expansion, layout conversion, SubBytes,
+ShiftRows, MixColumns, the fused T-table round, AddRoundKey and output
+conversion for each engine and batch size; see `npaes.profiling`.
+
+    python benchmarks/bench_stages.py [--sizes N ...] [--engines NAME ...]
+        [--key-bytes 16|24|32] [--decrypt] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from npaes.profiling import breakdown_table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 256, 4096])
+    parser.add_argument("--engines", nargs="+", default=["reference", "vectorized", "ttable"])
+    parser.add_argument("--key-bytes", type=int, default=16, choices=(16, 24, 32))
+    parser.add_argument("--decrypt", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(
+        breakdown_table(
+            args.sizes,
+            args.engines,
+            key_bytes=args.key_bytes,
+            decrypt=args.decrypt,
+            repeat=args.repeat,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Small-message throughput of one shared `AES` instance by thread count.
+
+Each of N threads CTR-encrypts --size-byte messages with the same
+`AES` object for --seconds, and the total messages per second is
+reported for N = 1, 2, 4, ... up to --threads.  With the GIL, the
+per-call Python overhead serializes and throughput stays flat; on a
+free-threaded build (python3.13t/3.14t with PYTHON_GIL=0) it should
+grow with the thread count up to the number of cores.
+
+    python benchmarks/bench_threads.py [--threads N] [--size BYTES] [--seconds S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from npaes import AES
+
+
+def throughput(cipher: AES, nthreads: int, size: int, seconds: float) -> float:
+    message = os.urandom(size)
+    iv = os.urandom(16)
+    counts = [0] * nthreads
+    start = threading.Barrier(nthreads + 1)
+    stop = threading.Event()
+
+    def work(i: int) -> None:
+        start.wait()
+        n = 0
+        while not stop.is_set():
+            cipher.encrypt(message, mode="ctr", iv=iv)
+            n += 1
+        counts[i] = n
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(nthreads)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    cipher = AES(os.urandom(16))
+    cipher.encrypt(bytes(args.size), mode="ctr", iv=bytes(16))  # Calibrate "auto" first
+    base = None
+    n = 1
+    while n <= args.threads:
+        rate = throughput(cipher, n, args.size, args.seconds)
+        base = base or rate
+        print(f"{n:>3} threads: {rate:10.0f} msgs/s ({rate / base:4.2f}x)")
+        n *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Throughput and peak engine memory of `AES.encrypt_blocks` by tile size.
+
+Encrypts --size bytes in place with `AES(tile_blocks=...)` for a range
+of tile sizes, and once untiled, and reports the median MB/s of --runs
+repetitions and the peak memory allocated during a call (measured with
+`tracemalloc`, which sees NumPy's allocations).
+
+    python benchmarks/bench_tiling.py [--size BYTES] [--runs N] [--backend NAME]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+from npaes import AES
+
+
+def measure(cipher: AES, blocks: np.ndarray, runs: int) -> tuple[float, int]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cipher.encrypt_blocks(blocks, out=blocks)
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    cipher.encrypt_blocks(blocks, out=blocks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return blocks.nbytes / statistics.median(samples) / 1e6, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--backend", default="auto")
+    args = parser.parse_args()
+    blocks = np.zeros((args.size // 16, 16), dtype=np.uint8)
+    key = bytes(16)
+    for tile in (1 << 10, 1 << 12, 1 << 14, 1 << 16, len(blocks)):
+        cipher = AES(key, backend=args.backend, tile_blocks=tile)
+        mbps, peak = measure(cipher, blocks, args.runs)
+        label = "untiled" if tile == len(blocks) else f"{tile} blocks"
+        print(f"{label:>14}: {mbps:7.1f} MB/s, peak {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
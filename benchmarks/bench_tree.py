@@ -0,0 +1,75 @@
+"""Directory encryption: a per-file loop against `npaes.tree` by worker count.
+
+Builds a temporary tree of --files small files (up to --small bytes
+each) plus one --large-byte file, then encrypts it three ways: one
+`encrypt_stream()` per file, `encrypt_tree()` in this process (batched
+small files, no pool), and `encrypt_tree()` on a process pool of 2, 4,
+... up to --workers.  The pool can only help with more than one core.
+
+    python benchmarks/bench_tree.py [--files N] [--small BYTES] [--large BYTES] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from npaes import AES
+from npaes.cli import encrypt_stream
+from npaes.tree import encrypt_tree
+
+
+def per_file(src: Path, dst: Path, cipher: AES) -> None:
+    for path in src.rglob("*"):
+        if path.is_file():
+            out = dst / path.relative_to(src)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("rb") as f, out.open("wb") as g:
+                encrypt_stream(f, g, cipher)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--small", type=int, default=4096)
+    parser.add_argument("--large", type=int, default=32 << 20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    cipher = AES(os.urandom(16))
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "src"
+        for i in range(args.files):
+            path = src / f"{i % 100:02d}" / f"{i}.bin"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(os.urandom(rng.randrange(args.small + 1)))
+        (src / "dump.bin").write_bytes(os.urandom(args.large))
+        total = sum(p.stat().st_size for p in src.rglob("*") if p.is_file())
+        print(f"{args.files + 1} files, {total / 1e6:.1f} MB")
+
+        def run(label: str, func) -> None:
+            dst = Path(tmp) / "dst"
+            start = time.perf_counter()
+            func(dst)
+            seconds = time.perf_counter() - start
+            print(f"{label:>22}: {seconds:7.2f} s ({total / 1e6 / seconds:6.1f} MB/s)")
+            shutil.rmtree(dst)
+
+        run("per-file loop", lambda dst: per_file(src, dst, cipher))
+        run("encrypt_tree, inline", lambda dst: encrypt_tree(src, dst, cipher, workers=1))
+        n = 2
+        while n <= args.workers:
+            run(
+                f"encrypt_tree, {n} procs",
+                lambda dst, n=n: encrypt_tree(src, dst, cipher, workers=n),
+            )
+            n *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -111,11 +111,23 @@ Rijndael Algorithm: Short Description & Technical Notes:
 
 from __future__ import annotations
 
-__all__ = ("AES",)
+__all__ = (
+    "AES",
+    "decrypt_array",
+    "decrypt_blocks",
+    "encrypt_array",
+    "encrypt_blocks",
+    "key_schedule",
+    "key_schedules",
+    "load_encrypted",
+    "save_encrypted",
+)
 __version__ = "0.4"
 
 import functools
-from typing import Literal, TypeAlias, cast
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Literal, NamedTuple, ParamSpec, TypeAlias, TypeVar, cast
 
 import numpy as np
 from numpy import arange, array, int16, uint8
@@ -123,59 +135,350 @@ from numpy import bitwise_xor as xor
 from numpy.lib.stride_tricks import as_strided
 from numpy.typing import NDArray
 
+from npaes.padding import PKCS7, Padding, pad_into, pkcs7_pad_lengths
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import FunctionType
+
+    from typing_extensions import Buffer
+
+    from npaes.arrays import decrypt_array, encrypt_array, load_encrypted, save_encrypted
+    from npaes.backends import Backend
+    from npaes.metrics import Registry
+
 # PEP 695 `type` statement would be cleaner but requires Python 3.12+.
 # This project supports 3.10+, so we use TypeAlias instead.
 KeyLengthBytes: TypeAlias = Literal[16, 24, 32]
 Nk: TypeAlias = Literal[4, 6, 8]
 Nr: TypeAlias = Literal[10, 12, 14]
 UInt8Array: TypeAlias = NDArray[np.uint8]
+# "ecb" is the raw block cipher; the others are in `npaes.modes`
+Mode: TypeAlias = Literal["ecb", "ctr", "cfb", "ofb"]
+
+
+_P = ParamSpec("_P")
+_R = TypeVar("_R")
+
+# Set by `npaes.metrics.enable()`.  While it is None, a metered call
+# costs one check of this global.
+_metrics: Registry | None = None
+
+
+def _nbytes(data: object) -> int:
+    """Size of a bytes-like object or array, or of a list or tuple of them."""
+    if isinstance(data, np.ndarray):
+        return data.nbytes  # Datetime arrays, for one, have no buffer interface
+    if isinstance(data, (list, tuple)):
+        return sum(memoryview(item).nbytes for item in data)
+    return memoryview(cast("Buffer", data)).nbytes
+
+
+def _metered(
+    entry: str, mode: str | None = None, cipher: str | None = None, data: str | None = None
+) -> Callable[[Callable[_P, _R]], Callable[_P, _R]]:
+    """Record calls of the decorated method or mode function in `npaes.metrics`.
+
+    The first argument is the `AES` instance (or an object whose
+    attribute `cipher` is one).  The input data is the argument named
+    `data`, by default the second; it may be a list of messages.
+    `mode` defaults to the call's `mode=` keyword argument, else "ecb".
+    A call whose arguments cannot be sized is passed through unrecorded,
+    so that the function's own checks report the problem.
+    """
+
+    def decorate(func: Callable[_P, _R]) -> Callable[_P, _R]:
+        names = cast("FunctionType", func).__code__.co_varnames
+        position = 1 if data is None else names.index(data)
+
+        @functools.wraps(func)
+        def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _R:
+            if _metrics is None:
+                return func(*args, **kwargs)
+            try:
+                aes = cast("AES", args[0] if cipher is None else getattr(args[0], cipher))
+                value = args[position] if len(args) > position else kwargs[names[position]]
+                nbytes = _nbytes(value)
+                labels = (
+                    entry,
+                    mode or str(kwargs.get("mode", "ecb")),
+                    aes.backend,
+                    8 * len(aes.key),
+                )
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+                return func(*args, **kwargs)
+            return _metrics.call(labels, nbytes, func, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
 
 
 class AES:
     key: bytes
-
-    def __init__(self, key: bytes) -> None:  # TODO: iv
+    backend: str
+    tile_blocks: int
+
+    def __init__(
+        self,
+        key: bytes,
+        backend: str = "auto",
+        *,
+        tile_blocks: int | None = None,
+        max_memory: int | None = None,
+    ) -> None:  # TODO: iv
         if not isinstance(key, bytes):
             raise TypeError(f"`key` must be bytes, not {type(key)}")
         if len(key) not in ALLOWED_KEYLENGTH_BYTES:
             raise ValueError(f"len(key) must be 16, 24, or 32 bytes, not {len(key)}")
+        # Expanded once here rather than on every call, and shared
+        # read-only with other instances for the same key
+        self._setup(key, cached_key_schedule(key), backend, tile_blocks, max_memory)
+
+    @classmethod
+    def from_schedule(
+        cls,
+        schedule: UInt8Array,
+        backend: str = "auto",
+        *,
+        tile_blocks: int | None = None,
+        max_memory: int | None = None,
+    ) -> AES:
+        """`AES` for an already expanded `key_schedule()`, shape (Nr + 1, 4, 4).
+
+        This skips the key expansion, e.g. for schedules held in a
+        `npaes.keyring.Keyring`.  The schedule is copied, and `key` is
+        recovered from its first Nk words.
+        """
+        schedule = np.array(schedule, dtype=uint8)
+        if schedule.ndim != 3 or schedule.shape[1:] != (4, 4) or len(schedule) not in (11, 13, 15):
+            raise ValueError(f"`schedule` must have shape (Nr + 1, 4, 4), not {schedule.shape}")
+        nk = len(schedule) - 7  # Nr = Nk + 6
+        key = schedule.swapaxes(1, 2).reshape(-1)[: 4 * nk].tobytes()
+        self = cls.__new__(cls)
+        self._setup(key, schedule, backend, tile_blocks, max_memory)
+        return self
+
+    def _setup(
+        self,
+        key: bytes,
+        schedule: UInt8Array,
+        backend: str,
+        tile_blocks: int | None,
+        max_memory: int | None,
+    ) -> None:
+        if backend != "auto":
+            _engine(0, backend)  # Raises early on an unknown name
         self.key = key
+        self.backend = backend
+        self.tile_blocks = _tile_blocks(tile_blocks, max_memory)
+        self._schedule = schedule
+        # Other per-key values (e.g. CMAC subkeys), derived on first use
+        self._derived: dict[str, UInt8Array] = {}
+
+    def encrypt_blocks(self, blocks: UInt8Array, out: UInt8Array | None = None) -> UInt8Array:
+        """Encrypt an (n, 16) uint8 array of blocks with the cached schedule.
+
+        This is the array-level primitive that `encrypt()` and the modes
+        in `npaes.modes` are built on.  `out` may be `blocks` itself.
+        The engine runs on `tile_blocks` blocks at a time, so its
+        temporaries stay the size of one tile however large `blocks` is.
+        """
+        return self._tiled("encrypt_blocks", blocks, out)
+
+    def decrypt_blocks(self, blocks: UInt8Array, out: UInt8Array | None = None) -> UInt8Array:
+        """Inverse of `encrypt_blocks()`."""
+        return self._tiled("decrypt_blocks", blocks, out)
+
+    def _tiled(self, op: str, blocks: UInt8Array, out: UInt8Array | None) -> UInt8Array:
+        if _metrics is None:
+            return self._run_tiles(op, blocks, out)
+        engine = _engine(min(len(blocks), self.tile_blocks), self.backend)
+        labels = (f"AES.{op}", "ecb", engine.name, 8 * len(self.key))
+        return _metrics.call(labels, blocks.nbytes, self._run_tiles, op, blocks, out)
+
+    def _run_tiles(self, op: str, blocks: UInt8Array, out: UInt8Array | None) -> UInt8Array:
+        n, tile = len(blocks), self.tile_blocks
+        if n <= tile:
+            return getattr(_engine(n, self.backend), op)(blocks, self._schedule, out=out)
+        if out is None:
+            out = np.empty_like(blocks)
+        elif out.shape != blocks.shape:
+            raise ValueError(f"`out` must have shape {blocks.shape}, not {out.shape}")
+        func = getattr(_engine(tile, self.backend), op)
+        for start in range(0, n, tile):
+            func(blocks[start : start + tile], self._schedule, out=out[start : start + tile])
+        return out
 
-    def encrypt(self, plaintext: bytes) -> bytes:
-        if not isinstance(plaintext, bytes):
-            raise TypeError(f"`plaintext` must be bytes, not {type(plaintext)}")
-        if len(plaintext) % BLOCKSIZE_BYTES != 0:
-            raise ValueError(
-                "len(plaintext) should be a multiple of 16"
-                " (AES encrypts and decrypts in 128-bit blocks)."
-                " Pad the input first."
-            )
-        parray = plaintext_to_3darray(plaintext)  # 3d
-        karray = key_to_array(self.key)
-        # TODO: we could probably vectorize this and just operate with everything
-        # in 3 dimensions rather than 2
-        ciphertext = b""
-        for p in parray:
-            ciphertext += array_to_bytes(encrypt_raw(p, karray))
-        return ciphertext
-
-    def decrypt(self, ciphertext: bytes) -> bytes:
-        if not isinstance(ciphertext, bytes):
-            raise TypeError(f"`ciphertext` must be bytes, not {type(ciphertext)}")
-        carray = plaintext_to_3darray(ciphertext)  # 3d
-        karray = key_to_array(self.key)
-        # TODO: we could probably vectorize this and just operate with everything
-        # in 3 dimensions rather than 2
-        plaintext = b""
-        for c in carray:
-            plaintext += array_to_bytes(decrypt_raw(c, karray))
-        return plaintext
+    @_metered("AES.encrypt")
+    def encrypt(
+        self,
+        plaintext: bytes,
+        padding: Padding = None,
+        *,
+        mode: Mode = "ecb",
+        iv: bytes | None = None,
+    ) -> bytes:
+        """Encrypt `plaintext` in `mode` ("ecb", "ctr", "cfb" or "ofb").
+
+        With `padding="pkcs7"`, any length is accepted: the plaintext is
+        copied once into the padded output buffer, which is then
+        encrypted in-place.  Otherwise ECB needs a multiple of 16 bytes.
+        CTR, CFB and OFB take any length and a 16-byte `iv` (for CTR,
+        the initial counter block); see `npaes.modes`.
+        """
+        _check_arguments(plaintext, padding, mode, iv, decrypt=False)
+        if mode != "ecb":
+            return self._stream(plaintext, mode, cast("bytes", iv), decrypt=False)
+        if padding == PKCS7:
+            blocks = pad_into(plaintext).reshape(-1, BLOCKSIZE_BYTES)
+            out = blocks
+        else:
+            blocks = bytes_to_blocks(plaintext)
+            out = np.empty_like(blocks)
+        return self.encrypt_blocks(blocks, out=out).tobytes()
+
+    @_metered("AES.decrypt")
+    def decrypt(
+        self,
+        ciphertext: bytes,
+        padding: Padding = None,
+        *,
+        mode: Mode = "ecb",
+        iv: bytes | None = None,
+    ) -> bytes:
+        """Decrypt `ciphertext` in `mode`, stripping PKCS#7 padding if asked.
+
+        Raises ValueError if `padding="pkcs7"` and the padding is invalid.
+        """
+        _check_arguments(ciphertext, padding, mode, iv, decrypt=True)
+        if mode != "ecb":
+            return self._stream(ciphertext, mode, cast("bytes", iv), decrypt=True)
+        blocks = bytes_to_blocks(ciphertext)
+        out = self.decrypt_blocks(blocks, out=np.empty_like(blocks))
+        if padding is None:
+            return out.tobytes()
+        npad = int(pkcs7_pad_lengths(out[-1])[0])
+        # Slice before converting so the plaintext is copied only once
+        return out.reshape(-1)[: out.size - npad].tobytes()
+
+    async def encrypt_async(
+        self,
+        plaintext: bytes,
+        padding: Padding = None,
+        *,
+        mode: Mode = "ecb",
+        iv: bytes | None = None,
+    ) -> bytes:
+        """`encrypt()` for asyncio code, offloading large inputs; see `npaes.aio`."""
+        from npaes import aio
+
+        return await aio.encrypt(self, plaintext, padding, mode=mode, iv=iv)
+
+    async def decrypt_async(
+        self,
+        ciphertext: bytes,
+        padding: Padding = None,
+        *,
+        mode: Mode = "ecb",
+        iv: bytes | None = None,
+    ) -> bytes:
+        """`decrypt()` for asyncio code, offloading large inputs; see `npaes.aio`."""
+        from npaes import aio
+
+        return await aio.decrypt(self, ciphertext, padding, mode=mode, iv=iv)
+
+    def _stream(self, data: bytes, mode: str, iv: bytes, *, decrypt: bool) -> bytes:
+        """Stream modes: any length, no padding."""
+        from npaes import modes
+
+        if mode == "ctr":
+            return modes.ctr_xor(self, data, iv).tobytes()
+        if mode == "ofb":
+            return modes.ofb_xor(self, data, iv).tobytes()
+        if decrypt:
+            return modes.cfb_decrypt(self, data, iv).tobytes()
+        return modes.cfb_encrypt(self, data, iv).tobytes()
+
+
+def _check_arguments(
+    data: bytes, padding: Padding, mode: str, iv: bytes | None, *, decrypt: bool
+) -> None:
+    """Raise TypeError/ValueError for arguments `AES.encrypt()`/`decrypt()` reject.
+
+    Shared with `npaes.aio`, whose offloaded paths never reach them.
+    """
+    name = "ciphertext" if decrypt else "plaintext"
+    if not isinstance(data, bytes):
+        raise TypeError(f"`{name}` must be bytes, not {type(data)}")
+    if mode != "ecb":
+        from npaes.modes import _check_iv
+
+        if mode not in ("ctr", "cfb", "ofb"):
+            raise ValueError(f"`mode` must be 'ecb', 'ctr', 'cfb', or 'ofb', not {mode!r}")
+        if padding is not None:
+            raise ValueError(f"{mode.upper()} mode does not use padding")
+        if iv is None:
+            raise ValueError(f"{mode.upper()} mode requires an `iv`")
+        _check_iv(iv)
+        return
+    if iv is not None:
+        raise ValueError("ECB mode does not take an `iv`")
+    if padding not in (None, PKCS7):
+        raise ValueError(f"`padding` must be None or 'pkcs7', not {padding!r}")
+    if decrypt and len(data) % BLOCKSIZE_BYTES != 0:
+        raise ValueError(
+            "len(ciphertext) should be a multiple of 16"
+            " (AES encrypts and decrypts in 128-bit blocks)."
+        )
+    if not decrypt and padding is None and len(data) % BLOCKSIZE_BYTES != 0:
+        raise ValueError(
+            "len(plaintext) should be a multiple of 16"
+            " (AES encrypts and decrypts in 128-bit blocks)."
+            " Pad the input first, or pass padding='pkcs7'."
+        )
+    if decrypt and padding and not data:
+        raise ValueError("Invalid PKCS#7 padding (empty ciphertext)")
+
+
+def _tile_blocks(tile_blocks: int | None, max_memory: int | None) -> int:
+    if max_memory is None:
+        tile = TILE_BLOCKS if tile_blocks is None else tile_blocks
+        if tile < 1:
+            raise ValueError(f"`tile_blocks` must be at least 1, not {tile}")
+        return tile
+    if tile_blocks is not None:
+        raise ValueError("Pass at most one of `tile_blocks` and `max_memory`")
+    if max_memory < SCRATCH_BYTES_PER_BLOCK:
+        raise ValueError(
+            f"`max_memory` must be at least {SCRATCH_BYTES_PER_BLOCK} bytes, not {max_memory}"
+        )
+    return max_memory // SCRATCH_BYTES_PER_BLOCK
+
+
+def _engine(nblocks: int, backend: str) -> Backend:
+    # npaes.backends is imported on first use rather than at import time
+    # so that a bare `import npaes` stays cheap (it is the larger module)
+    from npaes.backends import select_backend
+
+    return select_backend(nblocks, backend)
 
 
 # Rijndael processes data blocks of 128 bits
 BLOCKSIZE_BITS = 128
 BLOCKSIZE_BYTES = 16
 
+# Bulk calls run the engine on at most this many blocks at a time
+# (`AES(tile_blocks=...)`).  256 KiB of input per tile is large enough
+# that per-call overhead is negligible and small enough that an engine's
+# temporaries stay in cache.
+TILE_BLOCKS = 1 << 14
+
+# Upper bound on the engine temporaries per block of a tile (the
+# "ttable" engine peaks at about 112 bytes), used to turn
+# `AES(max_memory=...)` into a tile size
+SCRATCH_BYTES_PER_BLOCK = 128
+
 # Rinjdael allows Cipher Keys with lengths of 128, 192, or 256 bits,
 # corresponding to 16, 24, and 32 bytes respectively
 ALLOWED_KEYLENGTH_BITS = frozenset({128, 192, 256})
@@ -203,266 +506,25 @@ def numrounds(nk: Nk, _table={4: 10, 6: 12, 8: 14}) -> Nr:
 # SubBytes(), ShiftRows(), MixColumns()
 # (AddRoundKey() is just an XOR)
 
-SBOX = array(
-    [
-        #  0     1     2     3     4     5     6     7     8     9     a     b     c     d     e     f
-        0x63,
-        0x7C,
-        0x77,
-        0x7B,
-        0xF2,
-        0x6B,
-        0x6F,
-        0xC5,
-        0x30,
-        0x01,
-        0x67,
-        0x2B,
-        0xFE,
-        0xD7,
-        0xAB,
-        0x76,  # 0
-        0xCA,
-        0x82,
-        0xC9,
-        0x7D,
-        0xFA,
-        0x59,
-        0x47,
-        0xF0,
-        0xAD,
-        0xD4,
-        0xA2,
-        0xAF,
-        0x9C,
-        0xA4,
-        0x72,
-        0xC0,  # 1
-        0xB7,
-        0xFD,
-        0x93,
-        0x26,
-        0x36,
-        0x3F,
-        0xF7,
-        0xCC,
-        0x34,
-        0xA5,
-        0xE5,
-        0xF1,
-        0x71,
-        0xD8,
-        0x31,
-        0x15,  # 2
-        0x04,
-        0xC7,
-        0x23,
-        0xC3,
-        0x18,
-        0x96,
-        0x05,
-        0x9A,
-        0x07,
-        0x12,
-        0x80,
-        0xE2,
-        0xEB,
-        0x27,
-        0xB2,
-        0x75,  # 3
-        0x09,
-        0x83,
-        0x2C,
-        0x1A,
-        0x1B,
-        0x6E,
-        0x5A,
-        0xA0,
-        0x52,
-        0x3B,
-        0xD6,
-        0xB3,
-        0x29,
-        0xE3,
-        0x2F,
-        0x84,  # 4
-        0x53,
-        0xD1,
-        0x00,
-        0xED,
-        0x20,
-        0xFC,
-        0xB1,
-        0x5B,
-        0x6A,
-        0xCB,
-        0xBE,
-        0x39,
-        0x4A,
-        0x4C,
-        0x58,
-        0xCF,  # 5
-        0xD0,
-        0xEF,
-        0xAA,
-        0xFB,
-        0x43,
-        0x4D,
-        0x33,
-        0x85,
-        0x45,
-        0xF9,
-        0x02,
-        0x7F,
-        0x50,
-        0x3C,
-        0x9F,
-        0xA8,  # 6
-        0x51,
-        0xA3,
-        0x40,
-        0x8F,
-        0x92,
-        0x9D,
-        0x38,
-        0xF5,
-        0xBC,
-        0xB6,
-        0xDA,
-        0x21,
-        0x10,
-        0xFF,
-        0xF3,
-        0xD2,  # 7
-        0xCD,
-        0x0C,
-        0x13,
-        0xEC,
-        0x5F,
-        0x97,
-        0x44,
-        0x17,
-        0xC4,
-        0xA7,
-        0x7E,
-        0x3D,
-        0x64,
-        0x5D,
-        0x19,
-        0x73,  # 8
-        0x60,
-        0x81,
-        0x4F,
-        0xDC,
-        0x22,
-        0x2A,
-        0x90,
-        0x88,
-        0x46,
-        0xEE,
-        0xB8,
-        0x14,
-        0xDE,
-        0x5E,
-        0x0B,
-        0xDB,  # 9
-        0xE0,
-        0x32,
-        0x3A,
-        0x0A,
-        0x49,
-        0x06,
-        0x24,
-        0x5C,
-        0xC2,
-        0xD3,
-        0xAC,
-        0x62,
-        0x91,
-        0x95,
-        0xE4,
-        0x79,  # a
-        0xE7,
-        0xC8,
-        0x37,
-        0x6D,
-        0x8D,
-        0xD5,
-        0x4E,
-        0xA9,
-        0x6C,
-        0x56,
-        0xF4,
-        0xEA,
-        0x65,
-        0x7A,
-        0xAE,
-        0x08,  # b
-        0xBA,
-        0x78,
-        0x25,
-        0x2E,
-        0x1C,
-        0xA6,
-        0xB4,
-        0xC6,
-        0xE8,
-        0xDD,
-        0x74,
-        0x1F,
-        0x4B,
-        0xBD,
-        0x8B,
-        0x8A,  # c
-        0x70,
-        0x3E,
-        0xB5,
-        0x66,
-        0x48,
-        0x03,
-        0xF6,
-        0x0E,
-        0x61,
-        0x35,
-        0x57,
-        0xB9,
-        0x86,
-        0xC1,
-        0x1D,
-        0x9E,  # d
-        0xE1,
-        0xF8,
-        0x98,
-        0x11,
-        0x69,
-        0xD9,
-        0x8E,
-        0x94,
-        0x9B,
-        0x1E,
-        0x87,
-        0xE9,
-        0xCE,
-        0x55,
-        0x28,
-        0xDF,  # e
-        0x8C,
-        0xA1,
-        0x89,
-        0x0D,
-        0xBF,
-        0xE6,
-        0x42,
-        0x68,
-        0x41,
-        0x99,
-        0x2D,
-        0x0F,
-        0xB0,
-        0x54,
-        0xBB,
-        0x16,  # f
-    ],
+SBOX = np.frombuffer(
+    bytes.fromhex(
+        "637c777bf26b6fc53001672bfed7ab76"  # 0
+        "ca82c97dfa5947f0add4a2af9ca472c0"  # 1
+        "b7fd9326363ff7cc34a5e5f171d83115"  # 2
+        "04c723c31896059a071280e2eb27b275"  # 3
+        "09832c1a1b6e5aa0523bd6b329e32f84"  # 4
+        "53d100ed20fcb15b6acbbe394a4c58cf"  # 5
+        "d0efaafb434d338545f9027f503c9fa8"  # 6
+        "51a3408f929d38f5bcb6da2110fff3d2"  # 7
+        "cd0c13ec5f974417c4a77e3d645d1973"  # 8
+        "60814fdc222a908846eeb814de5e0bdb"  # 9
+        "e0323a0a4906245cc2d3ac629195e479"  # a
+        "e7c8376d8dd54ea96c56f4ea657aae08"  # b
+        "ba78252e1ca6b4c6e8dd741f4bbd8b8a"  # c
+        "703eb5664803f60e613557b986c11d9e"  # d
+        "e1f8981169d98e949b1e87e9ce5528df"  # e
+        "8ca1890dbfe6426841992d0fb054bb16"  # f
+    ),
     dtype=uint8,
 )
 
@@ -478,566 +540,97 @@ def sub_bytes(state: UInt8Array, out: UInt8Array | None = None, _sbox=SBOX) -> U
 # np.atleast_2d(arange(4)) - array([0, 3, 2, 1])[:, None]
 # ...but that doesn't seem any simpler now, does it?
 colindexer = array([[0, 1, 2, 3], [1, 2, 3, 0], [2, 3, 0, 1], [3, 0, 1, 2]], dtype=uint8)
+_row_indexer = arange(4, dtype=uint8)[:, None]
 
 
 def shift_rows(
     state: UInt8Array,
     out: UInt8Array | None = None,
-    _rows=arange(4, dtype=uint8)[:, None],
+    _rows=_row_indexer,
     _cols=colindexer,
 ) -> UInt8Array:
-    """Cyclically shift last 3 rows in the State."""
+    """Cyclically shift last 3 rows in the State.
+
+    `state` may also be a stack of States with shape (..., 4, 4).
+    """
     if out is not None:
-        out[:] = state[_rows, _cols]
+        out[:] = state[..., _rows, _cols]
         return out
-    return state[_rows, _cols]
+    return state[..., _rows, _cols]
 
 
 # ETABLE and LTABLE are lookup tables for matrix multiplication in GF(2^8)
-ETABLE = array(
-    [
-        #  0     1     2     3     4     5     6     7     8     9     a     b     c     d     e     f
-        0x01,
-        0x03,
-        0x05,
-        0x0F,
-        0x11,
-        0x33,
-        0x55,
-        0xFF,
-        0x1A,
-        0x2E,
-        0x72,
-        0x96,
-        0xA1,
-        0xF8,
-        0x13,
-        0x35,  # 0
-        0x5F,
-        0xE1,
-        0x38,
-        0x48,
-        0xD8,
-        0x73,
-        0x95,
-        0xA4,
-        0xF7,
-        0x02,
-        0x06,
-        0x0A,
-        0x1E,
-        0x22,
-        0x66,
-        0xAA,  # 1
-        0xE5,
-        0x34,
-        0x5C,
-        0xE4,
-        0x37,
-        0x59,
-        0xEB,
-        0x26,
-        0x6A,
-        0xBE,
-        0xD9,
-        0x70,
-        0x90,
-        0xAB,
-        0xE6,
-        0x31,  # 2
-        0x53,
-        0xF5,
-        0x04,
-        0x0C,
-        0x14,
-        0x3C,
-        0x44,
-        0xCC,
-        0x4F,
-        0xD1,
-        0x68,
-        0xB8,
-        0xD3,
-        0x6E,
-        0xB2,
-        0xCD,  # 3
-        0x4C,
-        0xD4,
-        0x67,
-        0xA9,
-        0xE0,
-        0x3B,
-        0x4D,
-        0xD7,
-        0x62,
-        0xA6,
-        0xF1,
-        0x08,
-        0x18,
-        0x28,
-        0x78,
-        0x88,  # 4
-        0x83,
-        0x9E,
-        0xB9,
-        0xD0,
-        0x6B,
-        0xBD,
-        0xDC,
-        0x7F,
-        0x81,
-        0x98,
-        0xB3,
-        0xCE,
-        0x49,
-        0xDB,
-        0x76,
-        0x9A,  # 5
-        0xB5,
-        0xC4,
-        0x57,
-        0xF9,
-        0x10,
-        0x30,
-        0x50,
-        0xF0,
-        0x0B,
-        0x1D,
-        0x27,
-        0x69,
-        0xBB,
-        0xD6,
-        0x61,
-        0xA3,  # 6
-        0xFE,
-        0x19,
-        0x2B,
-        0x7D,
-        0x87,
-        0x92,
-        0xAD,
-        0xEC,
-        0x2F,
-        0x71,
-        0x93,
-        0xAE,
-        0xE9,
-        0x20,
-        0x60,
-        0xA0,  # 7
-        0xFB,
-        0x16,
-        0x3A,
-        0x4E,
-        0xD2,
-        0x6D,
-        0xB7,
-        0xC2,
-        0x5D,
-        0xE7,
-        0x32,
-        0x56,
-        0xFA,
-        0x15,
-        0x3F,
-        0x41,  # 8
-        0xC3,
-        0x5E,
-        0xE2,
-        0x3D,
-        0x47,
-        0xC9,
-        0x40,
-        0xC0,
-        0x5B,
-        0xED,
-        0x2C,
-        0x74,
-        0x9C,
-        0xBF,
-        0xDA,
-        0x75,  # 9
-        0x9F,
-        0xBA,
-        0xD5,
-        0x64,
-        0xAC,
-        0xEF,
-        0x2A,
-        0x7E,
-        0x82,
-        0x9D,
-        0xBC,
-        0xDF,
-        0x7A,
-        0x8E,
-        0x89,
-        0x80,  # a
-        0x9B,
-        0xB6,
-        0xC1,
-        0x58,
-        0xE8,
-        0x23,
-        0x65,
-        0xAF,
-        0xEA,
-        0x25,
-        0x6F,
-        0xB1,
-        0xC8,
-        0x43,
-        0xC5,
-        0x54,  # b
-        0xFC,
-        0x1F,
-        0x21,
-        0x63,
-        0xA5,
-        0xF4,
-        0x07,
-        0x09,
-        0x1B,
-        0x2D,
-        0x77,
-        0x99,
-        0xB0,
-        0xCB,
-        0x46,
-        0xCA,  # c
-        0x45,
-        0xCF,
-        0x4A,
-        0xDE,
-        0x79,
-        0x8B,
-        0x86,
-        0x91,
-        0xA8,
-        0xE3,
-        0x3E,
-        0x42,
-        0xC6,
-        0x51,
-        0xF3,
-        0x0E,  # d
-        0x12,
-        0x36,
-        0x5A,
-        0xEE,
-        0x29,
-        0x7B,
-        0x8D,
-        0x8C,
-        0x8F,
-        0x8A,
-        0x85,
-        0x94,
-        0xA7,
-        0xF2,
-        0x0D,
-        0x17,  # e
-        0x39,
-        0x4B,
-        0xDD,
-        0x7C,
-        0x84,
-        0x97,
-        0xA2,
-        0xFD,
-        0x1C,
-        0x24,
-        0x6C,
-        0xB4,
-        0xC7,
-        0x52,
-        0xF6,
-        0x01,  # f
-    ],
+ETABLE = np.frombuffer(
+    bytes.fromhex(
+        "0103050f113355ff1a2e7296a1f81335"  # 0
+        "5fe13848d87395a4f702060a1e2266aa"  # 1
+        "e5345ce43759eb266abed97090abe631"  # 2
+        "53f5040c143c44cc4fd168b8d36eb2cd"  # 3
+        "4cd467a9e03b4dd762a6f10818287888"  # 4
+        "839eb9d06bbddc7f8198b3ce49db769a"  # 5
+        "b5c457f9103050f00b1d2769bbd661a3"  # 6
+        "fe192b7d8792adec2f7193aee92060a0"  # 7
+        "fb163a4ed26db7c25de73256fa153f41"  # 8
+        "c35ee23d47c940c05bed2c749cbfda75"  # 9
+        "9fbad564acef2a7e829dbcdf7a8e8980"  # a
+        "9bb6c158e82365afea256fb1c843c554"  # b
+        "fc1f2163a5f407091b2d7799b0cb46ca"  # c
+        "45cf4ade798b8691a8e33e42c651f30e"  # d
+        "12365aee297b8d8c8f8a8594a7f20d17"  # e
+        "394bdd7c8497a2fd1c246cb4c752f601"  # f
+    ),
     dtype=uint8,
 )
 
 # There is no value at 0,0 here, just a placeholder.  dtype is int16, not
 # uint8, because we will be adding two of these together
-LTABLE = array(
-    [
-        #  0     1     2     3     4     5     6     7     8     9     a     b     c     d     e     f
-        0x00,
-        0x00,
-        0x19,
-        0x01,
-        0x32,
-        0x02,
-        0x1A,
-        0xC6,
-        0x4B,
-        0xC7,
-        0x1B,
-        0x68,
-        0x33,
-        0xEE,
-        0xDF,
-        0x03,  # 0
-        0x64,
-        0x04,
-        0xE0,
-        0x0E,
-        0x34,
-        0x8D,
-        0x81,
-        0xEF,
-        0x4C,
-        0x71,
-        0x08,
-        0xC8,
-        0xF8,
-        0x69,
-        0x1C,
-        0xC1,  # 1
-        0x7D,
-        0xC2,
-        0x1D,
-        0xB5,
-        0xF9,
-        0xB9,
-        0x27,
-        0x6A,
-        0x4D,
-        0xE4,
-        0xA6,
-        0x72,
-        0x9A,
-        0xC9,
-        0x09,
-        0x78,  # 2
-        0x65,
-        0x2F,
-        0x8A,
-        0x05,
-        0x21,
-        0x0F,
-        0xE1,
-        0x24,
-        0x12,
-        0xF0,
-        0x82,
-        0x45,
-        0x35,
-        0x93,
-        0xDA,
-        0x8E,  # 3
-        0x96,
-        0x8F,
-        0xDB,
-        0xBD,
-        0x36,
-        0xD0,
-        0xCE,
-        0x94,
-        0x13,
-        0x5C,
-        0xD2,
-        0xF1,
-        0x40,
-        0x46,
-        0x83,
-        0x38,  # 4
-        0x66,
-        0xDD,
-        0xFD,
-        0x30,
-        0xBF,
-        0x06,
-        0x8B,
-        0x62,
-        0xB3,
-        0x25,
-        0xE2,
-        0x98,
-        0x22,
-        0x88,
-        0x91,
-        0x10,  # 5
-        0x7E,
-        0x6E,
-        0x48,
-        0xC3,
-        0xA3,
-        0xB6,
-        0x1E,
-        0x42,
-        0x3A,
-        0x6B,
-        0x28,
-        0x54,
-        0xFA,
-        0x85,
-        0x3D,
-        0xBA,  # 6
-        0x2B,
-        0x79,
-        0x0A,
-        0x15,
-        0x9B,
-        0x9F,
-        0x5E,
-        0xCA,
-        0x4E,
-        0xD4,
-        0xAC,
-        0xE5,
-        0xF3,
-        0x73,
-        0xA7,
-        0x57,  # 7
-        0xAF,
-        0x58,
-        0xA8,
-        0x50,
-        0xF4,
-        0xEA,
-        0xD6,
-        0x74,
-        0x4F,
-        0xAE,
-        0xE9,
-        0xD5,
-        0xE7,
-        0xE6,
-        0xAD,
-        0xE8,  # 8
-        0x2C,
-        0xD7,
-        0x75,
-        0x7A,
-        0xEB,
-        0x16,
-        0x0B,
-        0xF5,
-        0x59,
-        0xCB,
-        0x5F,
-        0xB0,
-        0x9C,
-        0xA9,
-        0x51,
-        0xA0,  # 9
-        0x7F,
-        0x0C,
-        0xF6,
-        0x6F,
-        0x17,
-        0xC4,
-        0x49,
-        0xEC,
-        0xD8,
-        0x43,
-        0x1F,
-        0x2D,
-        0xA4,
-        0x76,
-        0x7B,
-        0xB7,  # a
-        0xCC,
-        0xBB,
-        0x3E,
-        0x5A,
-        0xFB,
-        0x60,
-        0xB1,
-        0x86,
-        0x3B,
-        0x52,
-        0xA1,
-        0x6C,
-        0xAA,
-        0x55,
-        0x29,
-        0x9D,  # b
-        0x97,
-        0xB2,
-        0x87,
-        0x90,
-        0x61,
-        0xBE,
-        0xDC,
-        0xFC,
-        0xBC,
-        0x95,
-        0xCF,
-        0xCD,
-        0x37,
-        0x3F,
-        0x5B,
-        0xD1,  # c
-        0x53,
-        0x39,
-        0x84,
-        0x3C,
-        0x41,
-        0xA2,
-        0x6D,
-        0x47,
-        0x14,
-        0x2A,
-        0x9E,
-        0x5D,
-        0x56,
-        0xF2,
-        0xD3,
-        0xAB,  # d
-        0x44,
-        0x11,
-        0x92,
-        0xD9,
-        0x23,
-        0x20,
-        0x2E,
-        0x89,
-        0xB4,
-        0x7C,
-        0xB8,
-        0x26,
-        0x77,
-        0x99,
-        0xE3,
-        0xA5,  # e
-        0x67,
-        0x4A,
-        0xED,
-        0xDE,
-        0xC5,
-        0x31,
-        0xFE,
-        0x18,
-        0x0D,
-        0x63,
-        0x8C,
-        0x80,
-        0xC0,
-        0xF7,
-        0x70,
-        0x07,  # f
-    ],
-    dtype=int16,
-)
+LTABLE = np.frombuffer(
+    bytes.fromhex(
+        "0000190132021ac64bc71b6833eedf03"  # 0
+        "6404e00e348d81ef4c7108c8f8691cc1"  # 1
+        "7dc21db5f9b9276a4de4a6729ac90978"  # 2
+        "652f8a05210fe12412f082453593da8e"  # 3
+        "968fdbbd36d0ce94135cd2f140468338"  # 4
+        "66ddfd30bf068b62b325e29822889110"  # 5
+        "7e6e48c3a3b61e423a6b2854fa853dba"  # 6
+        "2b790a159b9f5eca4ed4ace5f373a757"  # 7
+        "af58a850f4ead6744faee9d5e7e6ade8"  # 8
+        "2cd7757aeb160bf559cb5fb09ca951a0"  # 9
+        "7f0cf66f17c449ecd8431f2da4767bb7"  # a
+        "ccbb3e5afb60b1863b52a16caa55299d"  # b
+        "97b2879061bedcfcbc95cfcd373f5bd1"  # c
+        "5339843c41a26d47142a9e5d56f2d3ab"  # d
+        "441192d923202e89b47cb8267799e3a5"  # e
+        "674aeddec531fe180d638c80c0f77007"  # f
+    ),
+    dtype=uint8,
+).astype(int16)
 
 
-def gf_multiply(x: UInt8Array, y: UInt8Array, _ff: int = 0xFF) -> UInt8Array:
-    """Vectorized multiplication in GF(2^8).
+@functools.cache
+def _gf_product_table() -> UInt8Array:
+    """Full 256x256 multiplication table in GF(2^8), built on first use.
 
-    Note: this accepts arrays only, not scalars.  Otherwise the
-    assignment on the last line will fail and we don't feel
-    like making that check.
+    Derived from ETABLE and LTABLE: the product of two nonzero elements
+    is the antilog of the sum of their logs, mod 255.
     """
-
-    res = LTABLE[x] + LTABLE[y]
-    res = ETABLE[np.where(res > 0xFF, res - _ff, res)]
+    logs = LTABLE[:, None] + LTABLE
+    res = ETABLE[np.where(logs > 0xFF, logs - 0xFF, logs)]
     # Any number multiplied by zero GF(2^8) equals zero
-    res[~np.logical_and(x, y)] = 0
+    res[0, :] = res[:, 0] = 0
+    res.flags.writeable = False
     return res
 
 
+def gf_multiply(x: UInt8Array, y: UInt8Array) -> UInt8Array:
+    """Vectorized multiplication in GF(2^8).
+
+    `x` and `y` broadcast against each other like any ufunc operands;
+    each product is a single lookup in `_gf_product_table()`.
+    """
+    return _gf_product_table()[x, y]
+
+
 def _mix_columns(
     state: UInt8Array,
     out: UInt8Array | None = None,
@@ -1047,19 +640,21 @@ def _mix_columns(
     pm2: UInt8Array,
     pm3: UInt8Array,
 ) -> UInt8Array:
+    # Rows are taken as (..., 1, 4) slices rather than `state[0]` so that
+    # the same code broadcasts over a stack of States, shape (..., 4, 4)
     if out is not None:
         out[:] = (
-            gf_multiply(state[0], pm0)
-            ^ gf_multiply(state[1], pm1)
-            ^ gf_multiply(state[2], pm2)
-            ^ gf_multiply(state[3], pm3)
+            gf_multiply(state[..., 0:1, :], pm0)
+            ^ gf_multiply(state[..., 1:2, :], pm1)
+            ^ gf_multiply(state[..., 2:3, :], pm2)
+            ^ gf_multiply(state[..., 3:4, :], pm3)
         )
         return out
     return (
-        gf_multiply(state[0], pm0)
-        ^ gf_multiply(state[1], pm1)
-        ^ gf_multiply(state[2], pm2)
-        ^ gf_multiply(state[3], pm3)
+        gf_multiply(state[..., 0:1, :], pm0)
+        ^ gf_multiply(state[..., 1:2, :], pm1)
+        ^ gf_multiply(state[..., 2:3, :], pm2)
+        ^ gf_multiply(state[..., 3:4, :], pm3)
     )
 
 
@@ -1120,10 +715,8 @@ sub_word = sub_bytes
 # x (x is denoted as {02}) in the field GF(2^8)"
 # (I.e. powers of X % polynomial in GF(2^8))
 #
-# Just a tuple for now, because tuple access is about 4 times as fast
-# as ndarray access, at least for this size & type
-#
-# Note: this is 1-indexed, hence empty first row
+# One (16, 4) array rather than a tuple of 16 small ones, which keeps
+# import cheap.  Note: this is 1-indexed, hence the placeholder first row
 #
 # Generated via:
 #
@@ -1135,24 +728,27 @@ sub_word = sub_bytes
 #     elif i > 1 and j >= 0x80:
 #         j = (2 * j) ^ 0x11b
 #     yield j
-RCON = (
-    array([np.nan, np.nan, np.nan, np.nan]),  # NAN
-    array([0x01, 0x00, 0x00, 0x00], dtype=uint8),  # 1
-    array([0x02, 0x00, 0x00, 0x00], dtype=uint8),  # 2
-    array([0x04, 0x00, 0x00, 0x00], dtype=uint8),  # 4
-    array([0x08, 0x00, 0x00, 0x00], dtype=uint8),  # 8
-    array([0x10, 0x00, 0x00, 0x00], dtype=uint8),  # 16
-    array([0x20, 0x00, 0x00, 0x00], dtype=uint8),  # 32
-    array([0x40, 0x00, 0x00, 0x00], dtype=uint8),  # 64
-    array([0x80, 0x00, 0x00, 0x00], dtype=uint8),  # 128
-    array([0x1B, 0x00, 0x00, 0x00], dtype=uint8),  # 27
-    array([0x36, 0x00, 0x00, 0x00], dtype=uint8),  # 54
-    array([0x6C, 0x00, 0x00, 0x00], dtype=uint8),  # 108
-    array([0xD8, 0x00, 0x00, 0x00], dtype=uint8),  # 216
-    array([0xAB, 0x00, 0x00, 0x00], dtype=uint8),  # 171
-    array([0x4D, 0x00, 0x00, 0x00], dtype=uint8),  # 77
-    array([0x9A, 0x00, 0x00, 0x00], dtype=uint8),  # 154
-)
+RCON = np.frombuffer(
+    bytes.fromhex(
+        "00000000"  # placeholder
+        "01000000"  # 1
+        "02000000"  # 2
+        "04000000"  # 4
+        "08000000"  # 8
+        "10000000"  # 16
+        "20000000"  # 32
+        "40000000"  # 64
+        "80000000"  # 128
+        "1b000000"  # 27
+        "36000000"  # 54
+        "6c000000"  # 108
+        "d8000000"  # 216
+        "ab000000"  # 171
+        "4d000000"  # 77
+        "9a000000"  # 154
+    ),
+    dtype=uint8,
+).reshape(16, 4)
 
 
 def expand_key(key: UInt8Array) -> UInt8Array:
@@ -1198,6 +794,123 @@ def expand_key(key: UInt8Array) -> UInt8Array:
     return w
 
 
+def key_schedule(key: bytes) -> UInt8Array:
+    """Expand `key` into its stack of round keys, shape (Nr + 1, 4, 4).
+
+    Each round key follows the same column ordering as the State, so
+    `key_schedule(key)[i]` can be XORed directly into a State for
+    round i.  This is the form consumed by the batched backends in
+    `npaes.backends`.
+    """
+    w = expand_key(key_to_array(key))  # 4 rows, NB * (nr + 1) columns (words)
+    return np.ascontiguousarray(w.reshape(4, -1, NB).swapaxes(0, 1))
+
+
+def key_schedules(keys: UInt8Array) -> UInt8Array:
+    """Vectorized `key_schedule()` over a stack of keys.
+
+    `keys` has shape (K, 4 * Nk), one cipher key of the same length
+    per row, in input byte order.  The result has shape
+    (K, Nr + 1, 4, 4).  This is the same loop as `expand_key()`, but
+    each step fills word i for all K keys at once.
+    """
+    keys = np.asarray(keys, dtype=uint8)
+    if keys.ndim != 2 or keys.shape[1] not in ALLOWED_KEYLENGTH_BYTES:
+        raise ValueError(f"`keys` must have shape (K, 16|24|32), not {keys.shape}")
+    nk = cast(Nk, keys.shape[1] // 4)
+    nr = numrounds(nk)
+    nwords = NB * (nr + 1)
+    # Indexed [key, word, byte] here; transposed to column ordering below
+    w = np.empty((len(keys), nwords, 4), dtype=uint8)
+    w[:, :nk] = keys.reshape(-1, nk, 4)
+    for i in range(nk, nwords):
+        temp = w[:, i - 1]
+        if i % nk == 0:
+            temp = xor(sub_word(temp[:, [1, 2, 3, 0]]), RCON[i // nk])
+        elif nk > 6 and i % nk == 4:
+            temp = sub_word(temp)
+        w[:, i] = xor(w[:, i - nk], temp)
+    return np.ascontiguousarray(w.reshape(len(keys), nr + 1, NB, 4).swapaxes(2, 3))
+
+
+# ---------------------------------------------------------------------
+# Schedule cache
+#
+# Code that builds `AES(key)` per request from a small working set of
+# keys would otherwise expand the same keys over and over.  `AES`
+# looks schedules up in this bounded LRU instead.  Decryption runs on
+# the same round keys (the engines derive the inverse forms they need),
+# so one entry per key serves both directions.  Entries are read-only
+# arrays shared by every instance for that key.  Set the size to 0 to
+# keep no key material beyond the lifetime of each `AES` instance.
+
+
+class ScheduleCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+_cache_lock = threading.Lock()
+_cache: OrderedDict[bytes, UInt8Array] = OrderedDict()
+_cache_maxsize = 128
+_cache_stats = [0, 0, 0]  # Hits, misses, evictions
+
+
+def cached_key_schedule(key: bytes) -> UInt8Array:
+    """`key_schedule(key)` through the module-level LRU cache.
+
+    The result is read-only.  Thread-safe; two threads that miss on the
+    same key at once may both expand it, but only one copy is kept.
+    """
+    with _cache_lock:
+        schedule = _cache.get(key)
+        if schedule is not None:
+            _cache.move_to_end(key)
+            _cache_stats[0] += 1
+            return schedule
+        _cache_stats[1] += 1
+    schedule = key_schedule(key)
+    schedule.flags.writeable = False
+    with _cache_lock:
+        if _cache_maxsize:
+            schedule = _cache.setdefault(key, schedule)
+            _cache.move_to_end(key)
+            _evict(_cache_maxsize)
+    return schedule
+
+
+def _evict(maxsize: int) -> None:
+    while len(_cache) > maxsize:
+        _cache.popitem(last=False)
+        _cache_stats[2] += 1
+
+
+def schedule_cache_info() -> ScheduleCacheInfo:
+    """Hit, miss and eviction counts and the size of the schedule cache."""
+    with _cache_lock:
+        return ScheduleCacheInfo(*_cache_stats, _cache_maxsize, len(_cache))
+
+
+def schedule_cache_clear() -> None:
+    """Empty the schedule cache and reset its counters."""
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats[:] = [0, 0, 0]
+
+
+def set_schedule_cache_size(maxsize: int) -> None:
+    """Bound the schedule cache to `maxsize` keys (0 disables it)."""
+    global _cache_maxsize
+    if maxsize < 0:
+        raise ValueError(f"`maxsize` must be nonnegative, not {maxsize}")
+    with _cache_lock:
+        _cache_maxsize = maxsize
+        _evict(maxsize)
+
+
 def encrypt_raw(state: UInt8Array, key: UInt8Array) -> UInt8Array:
     """Encrypt a single input data block, `state`, using `key`.
 
@@ -1253,276 +966,35 @@ invcolindexer = array([[0, 1, 2, 3], [3, 0, 1, 2], [2, 3, 0, 1], [1, 2, 3, 0]],
 def inv_shift_rows(
     state: UInt8Array,
     out: UInt8Array | None = None,
-    _rows=arange(4, dtype=uint8)[:, None],
+    _rows=_row_indexer,
     _cols=invcolindexer,
 ) -> UInt8Array:
     """Cyclically shift last 3 rows in the State, inverse."""
     if out is not None:
-        out[:] = state[_rows, _cols]
+        out[:] = state[..., _rows, _cols]
         return out
-    return state[_rows, _cols]
-
-
-INVSBOX = array(
-    [
-        #  0     1     2     3     4     5     6     7     8     9     a     b     c     d     e     f
-        0x52,
-        0x09,
-        0x6A,
-        0xD5,
-        0x30,
-        0x36,
-        0xA5,
-        0x38,
-        0xBF,
-        0x40,
-        0xA3,
-        0x9E,
-        0x81,
-        0xF3,
-        0xD7,
-        0xFB,  # 0
-        0x7C,
-        0xE3,
-        0x39,
-        0x82,
-        0x9B,
-        0x2F,
-        0xFF,
-        0x87,
-        0x34,
-        0x8E,
-        0x43,
-        0x44,
-        0xC4,
-        0xDE,
-        0xE9,
-        0xCB,  # 1
-        0x54,
-        0x7B,
-        0x94,
-        0x32,
-        0xA6,
-        0xC2,
-        0x23,
-        0x3D,
-        0xEE,
-        0x4C,
-        0x95,
-        0x0B,
-        0x42,
-        0xFA,
-        0xC3,
-        0x4E,  # 2
-        0x08,
-        0x2E,
-        0xA1,
-        0x66,
-        0x28,
-        0xD9,
-        0x24,
-        0xB2,
-        0x76,
-        0x5B,
-        0xA2,
-        0x49,
-        0x6D,
-        0x8B,
-        0xD1,
-        0x25,  # 3
-        0x72,
-        0xF8,
-        0xF6,
-        0x64,
-        0x86,
-        0x68,
-        0x98,
-        0x16,
-        0xD4,
-        0xA4,
-        0x5C,
-        0xCC,
-        0x5D,
-        0x65,
-        0xB6,
-        0x92,  # 4
-        0x6C,
-        0x70,
-        0x48,
-        0x50,
-        0xFD,
-        0xED,
-        0xB9,
-        0xDA,
-        0x5E,
-        0x15,
-        0x46,
-        0x57,
-        0xA7,
-        0x8D,
-        0x9D,
-        0x84,  # 5
-        0x90,
-        0xD8,
-        0xAB,
-        0x00,
-        0x8C,
-        0xBC,
-        0xD3,
-        0x0A,
-        0xF7,
-        0xE4,
-        0x58,
-        0x05,
-        0xB8,
-        0xB3,
-        0x45,
-        0x06,  # 6
-        0xD0,
-        0x2C,
-        0x1E,
-        0x8F,
-        0xCA,
-        0x3F,
-        0x0F,
-        0x02,
-        0xC1,
-        0xAF,
-        0xBD,
-        0x03,
-        0x01,
-        0x13,
-        0x8A,
-        0x6B,  # 7
-        0x3A,
-        0x91,
-        0x11,
-        0x41,
-        0x4F,
-        0x67,
-        0xDC,
-        0xEA,
-        0x97,
-        0xF2,
-        0xCF,
-        0xCE,
-        0xF0,
-        0xB4,
-        0xE6,
-        0x73,  # 8
-        0x96,
-        0xAC,
-        0x74,
-        0x22,
-        0xE7,
-        0xAD,
-        0x35,
-        0x85,
-        0xE2,
-        0xF9,
-        0x37,
-        0xE8,
-        0x1C,
-        0x75,
-        0xDF,
-        0x6E,  # 9
-        0x47,
-        0xF1,
-        0x1A,
-        0x71,
-        0x1D,
-        0x29,
-        0xC5,
-        0x89,
-        0x6F,
-        0xB7,
-        0x62,
-        0x0E,
-        0xAA,
-        0x18,
-        0xBE,
-        0x1B,  # a
-        0xFC,
-        0x56,
-        0x3E,
-        0x4B,
-        0xC6,
-        0xD2,
-        0x79,
-        0x20,
-        0x9A,
-        0xDB,
-        0xC0,
-        0xFE,
-        0x78,
-        0xCD,
-        0x5A,
-        0xF4,  # b
-        0x1F,
-        0xDD,
-        0xA8,
-        0x33,
-        0x88,
-        0x07,
-        0xC7,
-        0x31,
-        0xB1,
-        0x12,
-        0x10,
-        0x59,
-        0x27,
-        0x80,
-        0xEC,
-        0x5F,  # c
-        0x60,
-        0x51,
-        0x7F,
-        0xA9,
-        0x19,
-        0xB5,
-        0x4A,
-        0x0D,
-        0x2D,
-        0xE5,
-        0x7A,
-        0x9F,
-        0x93,
-        0xC9,
-        0x9C,
-        0xEF,  # d
-        0xA0,
-        0xE0,
-        0x3B,
-        0x4D,
-        0xAE,
-        0x2A,
-        0xF5,
-        0xB0,
-        0xC8,
-        0xEB,
-        0xBB,
-        0x3C,
-        0x83,
-        0x53,
-        0x99,
-        0x61,  # e
-        0x17,
-        0x2B,
-        0x04,
-        0x7E,
-        0xBA,
-        0x77,
-        0xD6,
-        0x26,
-        0xE1,
-        0x69,
-        0x14,
-        0x63,
-        0x55,
-        0x21,
-        0x0C,
-        0x7D,  # f
-    ],
+    return state[..., _rows, _cols]
+
+
+INVSBOX = np.frombuffer(
+    bytes.fromhex(
+        "52096ad53036a538bf40a39e81f3d7fb"  # 0
+        "7ce339829b2fff87348e4344c4dee9cb"  # 1
+        "547b9432a6c2233dee4c950b42fac34e"  # 2
+        "082ea16628d924b2765ba2496d8bd125"  # 3
+        "72f8f66486689816d4a45ccc5d65b692"  # 4
+        "6c704850fdedb9da5e154657a78d9d84"  # 5
+        "90d8ab008cbcd30af7e45805b8b34506"  # 6
+        "d02c1e8fca3f0f02c1afbd0301138a6b"  # 7
+        "3a9111414f67dcea97f2cfcef0b4e673"  # 8
+        "96ac7422e7ad3585e2f937e81c75df6e"  # 9
+        "47f11a711d29c5896fb7620eaa18be1b"  # a
+        "fc563e4bc6d279209adbc0fe78cd5af4"  # b
+        "1fdda8338807c731b11210592780ec5f"  # c
+        "60517fa919b54a0d2de57a9f93c99cef"  # d
+        "a0e03b4dae2af5b0c8ebbb3c83539961"  # e
+        "172b047eba77d626e169146355210c7d"  # f
+    ),
     dtype=uint8,
 )
 
@@ -1534,6 +1006,29 @@ def inv_sub_bytes(state: UInt8Array, out: UInt8Array | None = None, _sbox=INVSBO
     return _sbox[state]
 
 
+# The tables above are shared by every thread, and on free-threaded
+# builds read by them truly concurrently, so writes to them must raise
+for _table in (
+    colindexer,
+    invcolindexer,
+    _row_indexer,
+    ETABLE,
+    LTABLE,
+    ax_polynomial,
+    inv_ax_polynomial,
+    pm0,
+    pm1,
+    pm2,
+    pm3,
+    ipm0,
+    ipm1,
+    ipm2,
+    ipm3,
+):
+    _table.flags.writeable = False
+del _table
+
+
 def decrypt_raw(state: UInt8Array, key: UInt8Array) -> UInt8Array:
     """Decrypt a single ciphertext data block, `state`, using `key`.
 
@@ -1570,6 +1065,140 @@ def decrypt_raw(state: UInt8Array, key: UInt8Array) -> UInt8Array:
     return state
 
 
+# ---------------------------------------------------------------------
+# Batched block functions
+#
+# `encrypt_raw()`/`decrypt_raw()` take one State and one key.  These
+# take arrays of blocks and schedules and broadcast them against each
+# other like a gufunc with core signature (16),(Nr+1,4,4)->(16), so
+# code built on top of them needs no Python loop over blocks or keys.
+
+
+def encrypt_blocks(
+    blocks: UInt8Array,
+    schedule: UInt8Array,
+    out: UInt8Array | None = None,
+    *,
+    backend: str = "auto",
+    tile_blocks: int | None = None,
+    max_memory: int | None = None,
+) -> UInt8Array:
+    """Encrypt an array of blocks under one or many key schedules.
+
+    `blocks` has shape (..., 16), in input byte order, or (..., 4, 4),
+    as States in FIPS197's column ordering (as taken by
+    `encrypt_raw()`).  `schedule` has shape (..., Nr + 1, 4, 4): one
+    `key_schedule()`, or a stack of them (e.g. from `key_schedules()`)
+    whose leading axes broadcast against those of `blocks`.  The
+    result has the broadcast leading shape and the block layout of
+    `blocks`; `out` may be `blocks` itself.  `backend`, `tile_blocks`
+    and `max_memory` are as for `AES`.
+
+    >>> keys = key_schedules(rng.integers(0, 256, (8, 16), dtype=np.uint8))  # (8, 11, 4, 4)
+    >>> encrypt_blocks(blocks[:, None], keys).shape  # blocks: (n, 16) -> (n, 8, 16)
+    """
+    return _broadcast_blocks(
+        "encrypt_blocks", blocks, schedule, out, backend, tile_blocks, max_memory
+    )
+
+
+def decrypt_blocks(
+    blocks: UInt8Array,
+    schedule: UInt8Array,
+    out: UInt8Array | None = None,
+    *,
+    backend: str = "auto",
+    tile_blocks: int | None = None,
+    max_memory: int | None = None,
+) -> UInt8Array:
+    """Inverse of `encrypt_blocks()`."""
+    return _broadcast_blocks(
+        "decrypt_blocks", blocks, schedule, out, backend, tile_blocks, max_memory
+    )
+
+
+def _broadcast_blocks(
+    op: str,
+    blocks: UInt8Array,
+    schedule: UInt8Array,
+    out: UInt8Array | None,
+    backend: str,
+    tile_blocks: int | None,
+    max_memory: int | None,
+) -> UInt8Array:
+    blocks, schedule = np.asarray(blocks), np.asarray(schedule)
+    if blocks.dtype != uint8 or schedule.dtype != uint8:
+        raise TypeError(
+            f"`blocks` and `schedule` must be uint8 arrays, not {blocks.dtype} and {schedule.dtype}"
+        )
+    if blocks.shape[-1:] == (BLOCKSIZE_BYTES,):
+        states, lead, flat = False, blocks.shape[:-1], blocks
+    elif blocks.shape[-2:] == (4, NB):
+        # Column ordering: byte r + 4c of the block is state[r, c]
+        states, lead, flat = True, blocks.shape[:-2], blocks.swapaxes(-1, -2)
+    else:
+        raise ValueError(f"`blocks` must have shape (..., 16) or (..., 4, 4), not {blocks.shape}")
+    if (
+        schedule.ndim < 3
+        or schedule.shape[-2:] != (4, NB)
+        or schedule.shape[-3] not in (11, 13, 15)
+    ):
+        raise ValueError(f"`schedule` must have shape (..., Nr + 1, 4, 4), not {schedule.shape}")
+    keys = schedule.shape[:-3]
+    try:
+        shape = np.broadcast_shapes(lead, keys)
+    except ValueError:
+        raise ValueError(
+            f"`blocks` (leading shape {lead}) and `schedule` (leading shape {keys})"
+            " do not broadcast"
+        ) from None
+    want = (*shape, 4, NB) if states else (*shape, BLOCKSIZE_BYTES)
+    if out is not None and (out.shape != want or out.dtype != uint8):
+        raise ValueError(f"`out` must be uint8 with shape {want}, not {out.shape}")
+    n = int(np.prod(shape, dtype=np.intp))
+    src = np.broadcast_to(flat, (*shape, *flat.shape[len(lead) :]))
+    src = np.ascontiguousarray(src).reshape(n, BLOCKSIZE_BYTES)  # No copy if already laid out
+    direct = out is not None and not states and out.flags.c_contiguous
+    dst = out.reshape(n, BLOCKSIZE_BYTES) if direct else np.empty((n, BLOCKSIZE_BYTES), uint8)
+    if keys:
+        # Block i uses schedule stack[index[i]]; the per-block schedules
+        # are gathered one tile at a time, as in `npaes.keyring`
+        stack = schedule.reshape(-1, *schedule.shape[-3:])
+        index = np.broadcast_to(np.arange(len(stack)).reshape(keys), shape).reshape(-1)
+    else:
+        stack, index = schedule, None
+    tile = _tile_blocks(tile_blocks, max_memory)
+    engine = _engine(min(n, tile), backend)
+    if _metrics is None:
+        _run_broadcast(getattr(engine, op), src, stack, index, dst, tile)
+    else:
+        labels = (op, "ecb", engine.name, 32 * (schedule.shape[-3] - 7))
+        args = (getattr(engine, op), src, stack, index, dst, tile)
+        _metrics.call(labels, src.nbytes, _run_broadcast, *args)
+    if direct:
+        return out
+    result = dst.reshape(*shape, BLOCKSIZE_BYTES)
+    if states:
+        result = result.reshape(*shape, NB, 4).swapaxes(-1, -2)
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def _run_broadcast(
+    func: Callable[..., UInt8Array],
+    src: UInt8Array,
+    stack: UInt8Array,
+    index: np.ndarray | None,
+    dst: UInt8Array,
+    tile: int,
+) -> None:
+    for start in range(0, len(src), tile):
+        part = slice(start, start + tile)
+        func(src[part], stack if index is None else stack[index[part]], out=dst[part])
+
+
 # ---------------------------------------------------------------------
 # Helpers
 # These are really only used in test_npaes.py for round-trip tests
@@ -1627,3 +1256,31 @@ def plaintext_to_3darray(b: bytes) -> UInt8Array:
 
 def key_to_array(key: bytes) -> UInt8Array:
     return array(bytearray(key), dtype=np.uint8).reshape(-1, 4).swapaxes(0, 1)
+
+
+def bytes_to_blocks(b: bytes) -> UInt8Array:
+    """Read-only (n, 16) view of `b`, one row per 16-byte block.
+
+    Unlike `plaintext_to_3darray()`, this makes no copy; the rows are
+    in input byte order rather than FIPS197's column ordering.
+    """
+    return np.frombuffer(b, dtype=uint8).reshape(-1, BLOCKSIZE_BYTES)
+
+
+# Names that live in submodules but are exported here.  They are
+# imported on first access so that `import npaes` stays cheap.
+_LAZY_EXPORTS = {
+    "decrypt_array": "npaes.arrays",
+    "encrypt_array": "npaes.arrays",
+    "load_encrypted": "npaes.arrays",
+    "save_encrypted": "npaes.arrays",
+}
+
+
+def __getattr__(name: str) -> object:
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(module), name)
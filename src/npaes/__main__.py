@@ -0,0 +1,7 @@
+"""``python -m npaes``; see `npaes.cli`."""
+
+import sys
+
+from npaes.cli import main
+
+sys.exit(main())
@@ -0,0 +1,630 @@
+"""Authenticated encryption with associated data.
+
+CCM (NIST SP 800-38C, RFC 3610) is CTR-mode encryption plus a CBC-MAC
+over a formatted copy of the nonce, associated data and payload, both
+under the same key.  Here both halves reuse the one cached schedule on
+the `AES` instance and both are batched across messages:
+
+- the CTR half builds the counter blocks of every message (block 0 of
+  each masks its tag) and encrypts them all in one call;
+- the CBC-MAC half lays the formatted blocks of every message out in
+  one buffer and runs step i of all the chains together (see
+  `npaes.mac`), so a batch of m packets of at most n blocks costs n
+  batched calls rather than m * n single-block ones.
+
+The `*_batch` functions take parallel sequences of nonces, messages and
+associated data; all nonces in a batch must have the same length, from
+7 to 13 bytes.  The single-message functions are batches of one.
+
+GCM (NIST SP 800-38D) is CTR encryption from the counter block
+nonce || 1 (96-bit nonces only), authenticated with GHASH, a Horner
+polynomial evaluation over GF(2^128) at a key-derived point H.  The
+batch functions take Arrow-style buffers -- all messages back to back
+plus an offsets array, see `npaes.ragged` -- encrypt every message's
+counter blocks in one call, and run step i of every message's GHASH
+together.  Multiplying by the fixed H uses Shoup's 8-bit tables: X * H
+is the XOR of 16 table rows, one per byte of X, built once per key and
+cached on the `AES` instance.
+
+SIV (RFC 5297) is deterministic: the IV is S2V, a CMAC-based PRF of
+the associated data and plaintext, and the payload is CTR-encrypted
+under a second key starting from that IV.  `SIV.encrypt_batch()` runs
+each CMAC of S2V over all records at once (again via `npaes.mac`),
+combines the results with vectorized doubling, and encrypts every
+record's counter blocks in one call.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "SIV",
+    "ccm_decrypt",
+    "ccm_decrypt_batch",
+    "ccm_encrypt",
+    "ccm_encrypt_batch",
+    "gcm_decrypt",
+    "gcm_decrypt_batch",
+    "gcm_encrypt",
+    "gcm_encrypt_batch",
+)
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, BLOCKSIZE_BYTES, UInt8Array, _metered
+from npaes.mac import _cbc_mac, _chain, _cmac, _double_blocks
+from npaes.ragged import (
+    check_offsets,
+    gather_runs,
+    join,
+    lengths_of,
+    run_starts,
+    scatter_runs,
+    split,
+)
+
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
+    from typing_extensions import Buffer
+
+CCM_TAG_LENGTHS = frozenset({4, 6, 8, 10, 12, 14, 16})
+
+
+def _blocks(nbytes: np.ndarray) -> np.ndarray:
+    return -(-nbytes // BLOCKSIZE_BYTES)
+
+
+def _big_endian(values: np.ndarray, width: int) -> UInt8Array:
+    """Each value as `width` <= 8 big-endian bytes, shape (len(values), width)."""
+    return values.astype(">u8").view(uint8).reshape(-1, 8)[:, 8 - width :]
+
+
+def _check_ccm(
+    nonces: Sequence[bytes],
+    messages: Sequence[bytes],
+    associated_data: Sequence[bytes] | None,
+    tag_length: int,
+) -> tuple[UInt8Array, Sequence[bytes]]:
+    """Validate a batch; return the (m, len(nonce)) nonces and the associated data."""
+    if tag_length not in CCM_TAG_LENGTHS:
+        raise ValueError(f"`tag_length` must be one of 4, 6, ..., 16, not {tag_length}")
+    m = len(messages)
+    if associated_data is None:
+        associated_data = [b""] * m
+    if len(nonces) != m or len(associated_data) != m:
+        raise ValueError("`nonces`, the messages and `associated_data` must have the same length")
+    sizes = set(map(len, nonces))
+    if len(sizes) > 1:
+        raise ValueError("All nonces in a batch must have the same length")
+    size = sizes.pop() if sizes else 13
+    if not 7 <= size <= 13:
+        raise ValueError(f"len(nonce) must be between 7 and 13 bytes, not {size}")
+    return join(nonces).reshape(m, size), associated_data
+
+
+def _keystream(cipher: AES, nonces: UInt8Array, nblocks: np.ndarray) -> UInt8Array:
+    """Counter blocks 0, ..., nblocks[i] - 1 of every message, encrypted in one call."""
+    width = BLOCKSIZE_BYTES - 1 - nonces.shape[1]  # L, the counter width
+    total = int(nblocks.sum())
+    counters = np.zeros((total, BLOCKSIZE_BYTES), dtype=uint8)
+    counters[:, 0] = width - 1
+    counters[:, 1 : 1 + nonces.shape[1]] = np.repeat(nonces, nblocks, axis=0)
+    index = np.arange(total) - np.repeat(run_starts(nblocks), nblocks)
+    counters[:, BLOCKSIZE_BYTES - width :] = _big_endian(index, width)
+    return cipher.encrypt_blocks(counters, out=counters)
+
+
+def _cbc_tags(
+    cipher: AES,
+    nonces: UInt8Array,
+    tag_length: int,
+    payload: UInt8Array,
+    plen: np.ndarray,
+    aad: UInt8Array,
+    alen: np.ndarray,
+) -> UInt8Array:
+    """The unmasked CBC-MAC T of every message, shape (m, 16)."""
+    m, nonce_size = nonces.shape
+    width = BLOCKSIZE_BYTES - 1 - nonce_size
+    if width < 8 and (plen >> (8 * width)).any():
+        raise ValueError(f"A {nonce_size}-byte nonce limits messages to 2**{8 * width} - 1 bytes")
+
+    # a is encoded in 2, 6 or 10 bytes (SP 800-38C, A.2.2)
+    hlen = np.select([alen == 0, alen < 0xFF00, alen < 2**32], [0, 2, 6], 10)
+    header = np.zeros((m, 10), dtype=uint8)
+    for size, marker in ((2, b""), (6, b"\xff\xfe"), (10, b"\xff\xff")):
+        rows = hlen == size
+        header[rows, : len(marker)] = np.frombuffer(marker, dtype=uint8)
+        header[rows, len(marker) : size] = _big_endian(alen[rows], size - len(marker))
+
+    ablocks = _blocks(hlen + alen)
+    nblocks = 1 + ablocks + _blocks(plen)
+    starts = run_starts(nblocks)
+    blocks = np.zeros((int(nblocks.sum()), BLOCKSIZE_BYTES), dtype=uint8)
+    flat = blocks.reshape(-1)
+    b0 = blocks[starts]
+    b0[:, 0] = 64 * (alen > 0) + 8 * ((tag_length - 2) // 2) + width - 1
+    b0[:, 1 : 1 + nonce_size] = nonces
+    b0[:, BLOCKSIZE_BYTES - width :] = _big_endian(plen, width)
+    blocks[starts] = b0
+    first = (starts + 1) * BLOCKSIZE_BYTES
+    scatter_runs(flat, first, header[np.arange(10) < hlen[:, None]], hlen)
+    scatter_runs(flat, first + hlen, aad, alen)
+    scatter_runs(flat, first + ablocks * BLOCKSIZE_BYTES, payload, plen)
+    return _cbc_mac(cipher, blocks, starts, nblocks)
+
+
+@_metered("aead.ccm_encrypt_batch", "ccm", data="plaintexts")
+def ccm_encrypt_batch(
+    cipher: AES,
+    nonces: Sequence[bytes],
+    plaintexts: Sequence[bytes],
+    associated_data: Sequence[bytes] | None = None,
+    tag_length: int = 16,
+) -> list[bytes]:
+    """CCM-encrypt many messages; each result is ciphertext || tag."""
+    nonce_arr, associated_data = _check_ccm(nonces, plaintexts, associated_data, tag_length)
+    m = len(plaintexts)
+    plen = lengths_of(plaintexts)
+    plain = join(plaintexts)
+    tags = _cbc_tags(
+        cipher,
+        nonce_arr,
+        tag_length,
+        plain,
+        plen,
+        join(associated_data),
+        lengths_of(associated_data),
+    )
+
+    kblocks = 1 + _blocks(plen)
+    kstarts = run_starts(kblocks)
+    stream = _keystream(cipher, nonce_arr, kblocks)
+    sflat = stream.reshape(-1)
+    cipher_bytes = np.bitwise_xor(plain, gather_runs(sflat, (kstarts + 1) * BLOCKSIZE_BYTES, plen))
+    tags = np.bitwise_xor(tags[:, :tag_length], stream[kstarts, :tag_length])
+
+    olen = plen + tag_length
+    ostarts = run_starts(olen)
+    out = np.empty(int(olen.sum()), dtype=uint8)
+    scatter_runs(out, ostarts, cipher_bytes, plen)
+    scatter_runs(out, ostarts + plen, tags.reshape(-1), np.full(m, tag_length))
+    return split(out.tobytes(), olen)
+
+
+@_metered("aead.ccm_decrypt_batch", "ccm", data="ciphertexts")
+def ccm_decrypt_batch(
+    cipher: AES,
+    nonces: Sequence[bytes],
+    ciphertexts: Sequence[bytes],
+    associated_data: Sequence[bytes] | None = None,
+    tag_length: int = 16,
+) -> list[bytes]:
+    """Inverse of `ccm_encrypt_batch()`.
+
+    Raises ValueError if any message fails authentication; no plaintext
+    is returned in that case.
+    """
+    nonce_arr, associated_data = _check_ccm(nonces, ciphertexts, associated_data, tag_length)
+    m = len(ciphertexts)
+    clen = lengths_of(ciphertexts)
+    if (clen < tag_length).any():
+        raise ValueError(f"Each ciphertext must include its {tag_length}-byte tag")
+    plen = clen - tag_length
+    joined = join(ciphertexts)
+    cstarts = run_starts(clen)
+    received = gather_runs(joined, cstarts + plen, np.full(m, tag_length)).reshape(m, tag_length)
+
+    kblocks = 1 + _blocks(plen)
+    kstarts = run_starts(kblocks)
+    stream = _keystream(cipher, nonce_arr, kblocks)
+    sflat = stream.reshape(-1)
+    plain = np.bitwise_xor(
+        gather_runs(joined, cstarts, plen),
+        gather_runs(sflat, (kstarts + 1) * BLOCKSIZE_BYTES, plen),
+    )
+
+    tags = _cbc_tags(
+        cipher,
+        nonce_arr,
+        tag_length,
+        plain,
+        plen,
+        join(associated_data),
+        lengths_of(associated_data),
+    )
+    expected = np.bitwise_xor(tags[:, :tag_length], stream[kstarts, :tag_length])
+    ok = _tags_match(expected, received)
+    if not ok.all():
+        bad = np.count_nonzero(~ok)
+        raise ValueError(f"CCM authentication failed ({bad} of {m} messages)")
+    return split(plain.tobytes(), plen)
+
+
+def _tags_match(expected: UInt8Array, received: UInt8Array) -> np.ndarray:
+    """Per-row tag check that reads every byte of every tag.
+
+    The byte differences are ORed together instead of compared with
+    `==` and `all()`, which may stop at the first mismatch, so the time
+    taken does not depend on where a tag differs (as with
+    `hmac.compare_digest` in `npaes.mac.cmac_verify`).
+    """
+    return np.bitwise_or.reduce(expected ^ received, axis=1) == 0
+
+
+def _check_bytes(**inputs: bytes) -> None:
+    for name, value in inputs.items():
+        if not isinstance(value, bytes):
+            raise TypeError(f"`{name}` must be bytes, not {type(value)}")
+
+
+@_metered("aead.ccm_encrypt", "ccm", data="plaintext")
+def ccm_encrypt(
+    cipher: AES, nonce: bytes, plaintext: bytes, associated_data: bytes = b"", tag_length: int = 16
+) -> bytes:
+    """CCM-encrypt one message, returning ciphertext || tag."""
+    _check_bytes(nonce=nonce, plaintext=plaintext, associated_data=associated_data)
+    return ccm_encrypt_batch(cipher, [nonce], [plaintext], [associated_data], tag_length)[0]
+
+
+@_metered("aead.ccm_decrypt", "ccm", data="ciphertext")
+def ccm_decrypt(
+    cipher: AES, nonce: bytes, ciphertext: bytes, associated_data: bytes = b"", tag_length: int = 16
+) -> bytes:
+    """Verify and decrypt one CCM message (ciphertext || tag)."""
+    _check_bytes(nonce=nonce, ciphertext=ciphertext, associated_data=associated_data)
+    return ccm_decrypt_batch(cipher, [nonce], [ciphertext], [associated_data], tag_length)[0]
+
+
+# ---------------------------------------------------------------------
+# GCM
+
+GCM_NONCE_BYTES = 12
+GCM_TAG_LENGTHS = frozenset({4, 8, 12, 13, 14, 15, 16})
+_GCM_R = 0xE1 << 120  # x^128 + x^7 + x^2 + x + 1, in GCM's reflected bit order
+
+
+def _ghash_table(cipher: AES) -> np.ndarray:
+    """Shoup's table for multiplying by H, shape (16, 256, 2) uint64.
+
+    Row [p, b] is the product of H and the element whose only nonzero
+    byte is b at position p.  Computed on first use and cached on
+    `cipher`.
+    """
+    table = cipher._derived.get("ghash")
+    if table is None:
+        zero = np.zeros((1, BLOCKSIZE_BYTES), dtype=uint8)
+        v = int.from_bytes(cipher.encrypt_blocks(zero).tobytes(), "big")
+        powers = []  # H * x^i for bit i = 0 (the MSB of byte 0), ..., 127
+        for _ in range(128):
+            powers.append(v.to_bytes(BLOCKSIZE_BYTES, "big"))
+            v = (v >> 1) ^ (_GCM_R if v & 1 else 0)
+        by_byte = np.frombuffer(b"".join(powers), dtype=uint8).reshape(16, 1, 8, BLOCKSIZE_BYTES)
+        bits = (np.arange(256)[:, None] >> np.arange(7, -1, -1) & 1).astype(uint8)
+        table = np.bitwise_xor.reduce(bits[None, :, :, None] * by_byte, axis=2).view("u8")
+        cipher._derived["ghash"] = table
+    return table
+
+
+def _ghash(
+    cipher: AES, aad: UInt8Array, alen: np.ndarray, text: UInt8Array, tlen: np.ndarray
+) -> UInt8Array:
+    """GHASH of A || pad || C || pad || [len(A)]64 || [len(C)]64 for every message."""
+    m = len(alen)
+    ablocks, tblocks = _blocks(alen), _blocks(tlen)
+    nblocks = ablocks + tblocks + 1
+    starts = run_starts(nblocks)
+    blocks = np.zeros((int(nblocks.sum()), BLOCKSIZE_BYTES), dtype=uint8)
+    flat = blocks.reshape(-1)
+    scatter_runs(flat, starts * BLOCKSIZE_BYTES, aad, alen)
+    scatter_runs(flat, (starts + ablocks) * BLOCKSIZE_BYTES, text, tlen)
+    bit_lengths = np.empty((m, 2), dtype=">u8")
+    bit_lengths[:, 0] = alen * 8
+    bit_lengths[:, 1] = tlen * 8
+    blocks[starts + nblocks - 1] = bit_lengths.view(uint8)
+
+    table = _ghash_table(cipher)
+    positions = np.arange(BLOCKSIZE_BYTES)
+
+    def times_h(x: UInt8Array) -> None:
+        x.view("u8")[:] = np.bitwise_xor.reduce(table[positions, x], axis=1)
+
+    return _chain(blocks, starts, nblocks, times_h)
+
+
+def _gcm_keystream(cipher: AES, nonces: UInt8Array, nblocks: np.ndarray) -> UInt8Array:
+    """E(J0), E(J0 + 1), ... for each message, where J0 = nonce || 1."""
+    total = int(nblocks.sum())
+    counters = np.empty((total, BLOCKSIZE_BYTES), dtype=uint8)
+    counters[:, :GCM_NONCE_BYTES] = np.repeat(nonces, nblocks, axis=0)
+    index = np.arange(total) - np.repeat(run_starts(nblocks), nblocks)
+    # inc32: only the last 32 bits count, wrapping mod 2^32
+    counters[:, GCM_NONCE_BYTES:] = (index + 1).astype(">u4").view(uint8).reshape(total, 4)
+    return cipher.encrypt_blocks(counters, out=counters)
+
+
+def _check_gcm(
+    data: Buffer,
+    offsets: ArrayLike,
+    nonces: UInt8Array,
+    associated_data: Buffer | None,
+    ad_offsets: ArrayLike | None,
+) -> tuple[UInt8Array, np.ndarray, UInt8Array, np.ndarray]:
+    """Validate a GCM batch; return the data, its run lengths, the AAD and its run lengths."""
+    src = np.frombuffer(memoryview(data), dtype=uint8)
+    lengths = check_offsets(offsets, src.size)
+    m = len(lengths)
+    nonces = np.asarray(nonces)
+    if nonces.dtype != uint8 or nonces.shape != (m, GCM_NONCE_BYTES):
+        raise ValueError(
+            f"`nonces` must be a ({m}, 12) uint8 array, not {nonces.dtype} {nonces.shape}"
+        )
+    if associated_data is None:
+        return src, lengths, np.empty(0, dtype=uint8), np.zeros(m, dtype=np.intp)
+    if ad_offsets is None:
+        raise ValueError("`ad_offsets` is required with `associated_data`")
+    aad = np.frombuffer(memoryview(associated_data), dtype=uint8)
+    alen = check_offsets(ad_offsets, aad.size)
+    if len(alen) != m:
+        raise ValueError("`offsets` and `ad_offsets` must describe the same number of messages")
+    return src, lengths, aad, alen
+
+
+@_metered("aead.gcm_encrypt_batch", "gcm")
+def gcm_encrypt_batch(
+    cipher: AES,
+    data: Buffer,
+    offsets: ArrayLike,
+    nonces: UInt8Array,
+    associated_data: Buffer | None = None,
+    ad_offsets: ArrayLike | None = None,
+    tag_length: int = 16,
+) -> tuple[UInt8Array, UInt8Array]:
+    """GCM-encrypt many messages stored back to back.
+
+    Message i is data[offsets[i] : offsets[i + 1]] with the 12-byte
+    nonce nonces[i] (shape (m, 12)) and, if given, associated data
+    associated_data[ad_offsets[i] : ad_offsets[i + 1]].  Returns the
+    ciphertext, one array laid out with the same `offsets`, and the
+    tags, shape (m, tag_length).
+    """
+    if tag_length not in GCM_TAG_LENGTHS:
+        raise ValueError(f"`tag_length` must be one of 4, 8, 12, ..., 16, not {tag_length}")
+    src, lengths, aad, alen = _check_gcm(data, offsets, nonces, associated_data, ad_offsets)
+    kblocks = 1 + _blocks(lengths)
+    kstarts = run_starts(kblocks)
+    stream = _gcm_keystream(cipher, np.asarray(nonces), kblocks)
+    out = gather_runs(stream.reshape(-1), (kstarts + 1) * BLOCKSIZE_BYTES, lengths)
+    np.bitwise_xor(out, src, out=out)
+    tags = _ghash(cipher, aad, alen, out, lengths)
+    np.bitwise_xor(tags, stream[kstarts], out=tags)
+    return out, tags[:, :tag_length]
+
+
+@_metered("aead.gcm_decrypt_batch", "gcm")
+def gcm_decrypt_batch(
+    cipher: AES,
+    data: Buffer,
+    offsets: ArrayLike,
+    nonces: UInt8Array,
+    tags: UInt8Array,
+    associated_data: Buffer | None = None,
+    ad_offsets: ArrayLike | None = None,
+) -> UInt8Array:
+    """Inverse of `gcm_encrypt_batch()`; `tags` is its (m, tag_length) output.
+
+    Raises ValueError if any message fails authentication; no plaintext
+    is returned in that case.
+    """
+    src, lengths, aad, alen = _check_gcm(data, offsets, nonces, associated_data, ad_offsets)
+    tags = np.asarray(tags)
+    m = len(lengths)
+    if (
+        tags.dtype != uint8
+        or tags.ndim != 2
+        or len(tags) != m
+        or tags.shape[1] not in GCM_TAG_LENGTHS
+    ):
+        raise ValueError(
+            f"`tags` must be an (m, tag_length) uint8 array, not {tags.dtype} {tags.shape}"
+        )
+    kblocks = 1 + _blocks(lengths)
+    kstarts = run_starts(kblocks)
+    stream = _gcm_keystream(cipher, np.asarray(nonces), kblocks)
+    expected = _ghash(cipher, aad, alen, src, lengths)
+    np.bitwise_xor(expected, stream[kstarts], out=expected)
+    ok = _tags_match(expected[:, : tags.shape[1]], tags)
+    if not ok.all():
+        bad = np.count_nonzero(~ok)
+        raise ValueError(f"GCM authentication failed ({bad} of {m} messages)")
+    out = gather_runs(stream.reshape(-1), (kstarts + 1) * BLOCKSIZE_BYTES, lengths)
+    return np.bitwise_xor(out, src, out=out)
+
+
+def _check_nonce(nonce: bytes) -> UInt8Array:
+    if len(nonce) != GCM_NONCE_BYTES:
+        raise ValueError(f"len(nonce) must be 12 bytes, not {len(nonce)}")
+    return np.frombuffer(nonce, dtype=uint8).reshape(1, GCM_NONCE_BYTES)
+
+
+@_metered("aead.gcm_encrypt", "gcm", data="plaintext")
+def gcm_encrypt(
+    cipher: AES, nonce: bytes, plaintext: bytes, associated_data: bytes = b"", tag_length: int = 16
+) -> bytes:
+    """GCM-encrypt one message, returning ciphertext || tag."""
+    _check_bytes(nonce=nonce, plaintext=plaintext, associated_data=associated_data)
+    out, tags = gcm_encrypt_batch(
+        cipher,
+        plaintext,
+        [0, len(plaintext)],
+        _check_nonce(nonce),
+        associated_data,
+        [0, len(associated_data)],
+        tag_length,
+    )
+    return out.tobytes() + tags.tobytes()
+
+
+@_metered("aead.gcm_decrypt", "gcm", data="ciphertext")
+def gcm_decrypt(
+    cipher: AES, nonce: bytes, ciphertext: bytes, associated_data: bytes = b"", tag_length: int = 16
+) -> bytes:
+    """Verify and decrypt one GCM message (ciphertext || tag)."""
+    _check_bytes(nonce=nonce, ciphertext=ciphertext, associated_data=associated_data)
+    if tag_length not in GCM_TAG_LENGTHS:
+        raise ValueError(f"`tag_length` must be one of 4, 8, 12, ..., 16, not {tag_length}")
+    if len(ciphertext) < tag_length:
+        raise ValueError(f"The ciphertext must include its {tag_length}-byte tag")
+    n = len(ciphertext) - tag_length
+    tag = np.frombuffer(ciphertext, dtype=uint8, offset=n).reshape(1, tag_length)
+    out = gcm_decrypt_batch(
+        cipher,
+        memoryview(ciphertext)[:n],
+        [0, n],
+        _check_nonce(nonce),
+        tag,
+        associated_data,
+        [0, len(associated_data)],
+    )
+    return out.tobytes()
+
+
+# ---------------------------------------------------------------------
+# SIV
+
+_SIV_MAX_COMPONENTS = 126  # RFC 5297, section 7: at most 127 S2V inputs
+
+
+class SIV:
+    """AES-SIV (RFC 5297) deterministic authenticated encryption.
+
+    `key` is 32, 48 or 64 bytes: the S2V (CMAC) key followed by the CTR
+    key, each half an AES key.  Equal plaintexts with equal associated
+    data give equal ciphertexts -- the property an encrypted equality
+    index relies on, and all that SIV reveals.  For ordinary randomized
+    encryption, pass a nonce as the last associated-data component.
+
+    Each result is the 16-byte synthetic IV followed by the ciphertext.
+    """
+
+    def __init__(self, key: bytes, backend: str = "auto") -> None:
+        if not isinstance(key, bytes):
+            raise TypeError(f"`key` must be bytes, not {type(key)}")
+        if len(key) not in (32, 48, 64):
+            raise ValueError(f"len(key) must be 32, 48, or 64 bytes, not {len(key)}")
+        half = len(key) // 2
+        self.mac_cipher = AES(key[:half], backend=backend)
+        self.ctr_cipher = AES(key[half:], backend=backend)
+        # S2V starts from CMAC(<zero>), the same for every record
+        self._d0 = _cmac(self.mac_cipher, np.zeros(BLOCKSIZE_BYTES, dtype=uint8), np.array([16]))
+
+    @_metered("SIV.encrypt", "siv", cipher="ctr_cipher")
+    def encrypt(self, plaintext: bytes, *associated_data: bytes) -> bytes:
+        """Encrypt one record: synthetic IV || ciphertext."""
+        _check_bytes(plaintext=plaintext)
+        return self.encrypt_batch([plaintext], *[[ad] for ad in associated_data])[0]
+
+    @_metered("SIV.decrypt", "siv", cipher="ctr_cipher")
+    def decrypt(self, ciphertext: bytes, *associated_data: bytes) -> bytes:
+        """Verify and decrypt one record."""
+        _check_bytes(ciphertext=ciphertext)
+        return self.decrypt_batch([ciphertext], *[[ad] for ad in associated_data])[0]
+
+    @_metered("SIV.encrypt_batch", "siv", cipher="ctr_cipher")
+    def encrypt_batch(
+        self, plaintexts: Sequence[bytes], *associated_data: Sequence[bytes]
+    ) -> list[bytes]:
+        """Encrypt many records.
+
+        Each `associated_data` argument is one component for every
+        record: a sequence of len(plaintexts) bytes objects.
+        """
+        self._check_components(len(plaintexts), associated_data)
+        plen = lengths_of(plaintexts)
+        plain = join(plaintexts)
+        v = self._s2v(plain, plen, associated_data)
+        olen = plen + BLOCKSIZE_BYTES
+        ostarts = run_starts(olen)
+        out = np.empty(int(olen.sum()), dtype=uint8)
+        scatter_runs(out, ostarts, v.reshape(-1), np.full(len(plen), BLOCKSIZE_BYTES))
+        scatter_runs(out, ostarts + BLOCKSIZE_BYTES, self._ctr(v, plain, plen), plen)
+        return split(out.tobytes(), olen)
+
+    @_metered("SIV.decrypt_batch", "siv", cipher="ctr_cipher")
+    def decrypt_batch(
+        self, ciphertexts: Sequence[bytes], *associated_data: Sequence[bytes]
+    ) -> list[bytes]:
+        """Inverse of `encrypt_batch()`.
+
+        Raises ValueError if any record fails authentication; no
+        plaintext is returned in that case.
+        """
+        m = len(ciphertexts)
+        self._check_components(m, associated_data)
+        clen = lengths_of(ciphertexts)
+        if (clen < BLOCKSIZE_BYTES).any():
+            raise ValueError("Each SIV ciphertext must include its 16-byte IV")
+        plen = clen - BLOCKSIZE_BYTES
+        joined = join(ciphertexts)
+        cstarts = run_starts(clen)
+        v = gather_runs(joined, cstarts, np.full(m, BLOCKSIZE_BYTES)).reshape(m, BLOCKSIZE_BYTES)
+        plain = self._ctr(v, gather_runs(joined, cstarts + BLOCKSIZE_BYTES, plen), plen)
+        ok = _tags_match(self._s2v(plain, plen, associated_data), v)
+        if not ok.all():
+            bad = np.count_nonzero(~ok)
+            raise ValueError(f"SIV authentication failed ({bad} of {m} records)")
+        return split(plain.tobytes(), plen)
+
+    @staticmethod
+    def _check_components(m: int, associated_data: tuple[Sequence[bytes], ...]) -> None:
+        if len(associated_data) > _SIV_MAX_COMPONENTS:
+            raise ValueError(
+                f"At most {_SIV_MAX_COMPONENTS} associated-data components are allowed"
+            )
+        if any(len(column) != m for column in associated_data):
+            raise ValueError("Each associated-data component must have one entry per record")
+
+    def _s2v(
+        self, plain: UInt8Array, plen: np.ndarray, associated_data: tuple[Sequence[bytes], ...]
+    ) -> UInt8Array:
+        """S2V (RFC 5297, section 2.4) of every record, shape (m, 16)."""
+        m = len(plen)
+        d = np.repeat(self._d0, m, axis=0)
+        for column in associated_data:
+            d = _double_blocks(d)
+            d ^= _cmac(self.mac_cipher, join(column), lengths_of(column))
+
+        # The last input, the plaintext, is folded in as
+        #   len >= 16: Sn xorend D
+        #   len < 16:  dbl(D) xor pad(Sn)
+        tlen = np.maximum(plen, BLOCKSIZE_BYTES)
+        tstarts = run_starts(tlen)
+        t = np.zeros(int(tlen.sum()), dtype=uint8)
+        scatter_runs(t, tstarts, plain, plen)
+        short = plen < BLOCKSIZE_BYTES
+        t[tstarts[short] + plen[short]] = 0x80
+        mask = np.where(short[:, None], _double_blocks(d), d)
+        t[(tstarts + tlen - BLOCKSIZE_BYTES)[:, None] + np.arange(BLOCKSIZE_BYTES)] ^= mask
+        return _cmac(self.mac_cipher, t, tlen)
+
+    def _ctr(self, v: UInt8Array, data: UInt8Array, lengths: np.ndarray) -> UInt8Array:
+        """XOR each record with its keystream from counter Q = V with bits 63 and 31 cleared.
+
+        Clearing those bits lets the counter be incremented as a 64-bit
+        add on the low half, which cannot carry.
+        """
+        q = v.copy()
+        q[:, 8] &= 0x7F
+        q[:, 12] &= 0x7F
+        nblocks = _blocks(lengths)
+        starts = run_starts(nblocks)
+        counters = np.repeat(q, nblocks, axis=0)
+        index = np.arange(len(counters)) - np.repeat(starts, nblocks)
+        counters.view(">u8")[:, 1] += index.astype(np.uint64)
+        stream = self.ctr_cipher.encrypt_blocks(counters, out=counters)
+        return np.bitwise_xor(
+            data, gather_runs(stream.reshape(-1), starts * BLOCKSIZE_BYTES, lengths)
+        )
@@ -0,0 +1,308 @@
+"""asyncio integration: encrypt without blocking the event loop.
+
+A large `AES.encrypt()` call holds the thread for as long as it runs,
+and in a coroutine that thread is the event loop's.  `encrypt()` and
+`decrypt()` here (also `AES.encrypt_async()`/`AES.decrypt_async()`)
+avoid that:
+
+- inputs of at most `inline_bytes` run inline, since a hop to a worker
+  thread costs more than the work;
+- larger inputs are cut into tiles of `tile_bytes`, which run on an
+  executor (the loop's default one unless given) and write into one
+  preallocated output.  ECB and CTR tiles are independent, as are CFB
+  decryption tiles (each takes the ciphertext block before it as IV);
+  CFB encryption and OFB are serial chains, so they run on the
+  executor as a single job.
+
+NumPy releases the GIL inside its larger array operations, so tiles on
+a thread pool overlap with each other and with the loop.
+
+Arguments are checked as `AES.encrypt()`/`AES.decrypt()` check them,
+before either path is taken.  With `npaes.metrics` enabled, inline
+calls are recorded as `AES.encrypt`/`AES.decrypt` and offloaded ones
+as `aio.encrypt`/`aio.decrypt`, with the wall time the caller waited
+(and no CPU time, which is spent on the executor's threads).
+
+`CTRStreamReader` and `CTRStreamWriter` wrap asyncio streams and
+decrypt/encrypt CTR data on the fly, tracking the stream offset.
+"""
+
+from __future__ import annotations
+
+__all__ = ("INLINE_BYTES", "TILE_BYTES", "CTRStreamReader", "CTRStreamWriter", "decrypt", "encrypt")
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import uint8
+
+import npaes
+from npaes import (
+    BLOCKSIZE_BYTES,
+    PKCS7,
+    Mode,
+    Padding,
+    UInt8Array,
+    _check_arguments,
+    pad_into,
+    pkcs7_pad_lengths,
+)
+from npaes.modes import _check_iv, cfb_decrypt, ctr_xor
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from concurrent.futures import Executor
+
+    from npaes import AES
+
+INLINE_BYTES = 16 * 1024
+TILE_BYTES = 1024 * 1024
+
+
+async def _run_tiles(
+    size: int,
+    tile_bytes: int,
+    work: Callable[[int, int], None],
+    executor: Executor | None,
+) -> None:
+    """Run work(start, stop) for each tile of [0, size) on `executor`, concurrently."""
+    if tile_bytes < BLOCKSIZE_BYTES or tile_bytes % BLOCKSIZE_BYTES:
+        raise ValueError(f"`tile_bytes` must be a positive multiple of 16, not {tile_bytes}")
+    loop = asyncio.get_running_loop()
+    jobs = [
+        loop.run_in_executor(executor, work, start, min(start + tile_bytes, size))
+        for start in range(0, size, tile_bytes)
+    ]
+    await asyncio.gather(*jobs)
+
+
+async def _metered(
+    entry: str, cipher: AES, mode: str, nbytes: int, work: Awaitable[bytes]
+) -> bytes:
+    """Await `work`, recording it under `entry` if metering is on."""
+    registry = npaes._metrics
+    if registry is None:
+        return await work
+    start = time.perf_counter()
+    try:
+        return await work
+    finally:
+        labels = (entry, mode, cipher.backend, 8 * len(cipher.key))
+        registry.record(labels, nbytes, time.perf_counter() - start, 0.0)
+
+
+async def encrypt(
+    cipher: AES,
+    plaintext: bytes,
+    padding: Padding = None,
+    *,
+    mode: Mode = "ecb",
+    iv: bytes | None = None,
+    executor: Executor | None = None,
+    inline_bytes: int = INLINE_BYTES,
+    tile_bytes: int = TILE_BYTES,
+) -> bytes:
+    """`cipher.encrypt(...)` that does not block the event loop."""
+    _check_arguments(plaintext, padding, mode, iv, decrypt=False)
+    if len(plaintext) <= inline_bytes:
+        return cipher.encrypt(plaintext, padding, mode=mode, iv=iv)
+    work = _encrypt(cipher, plaintext, padding, mode, iv, executor, tile_bytes)
+    return await _metered("aio.encrypt", cipher, mode, len(plaintext), work)
+
+
+async def _encrypt(
+    cipher: AES,
+    plaintext: bytes,
+    padding: Padding,
+    mode: Mode,
+    iv: bytes | None,
+    executor: Executor | None,
+    tile_bytes: int,
+) -> bytes:
+    if mode == "ctr" and iv is not None:
+        return await _ctr(cipher, plaintext, iv, executor, tile_bytes)
+    if mode != "ecb":
+        # Serial chains
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, lambda: cipher.encrypt(plaintext, padding, mode=mode, iv=iv)
+        )
+    out = pad_into(plaintext) if padding == PKCS7 else np.frombuffer(plaintext, dtype=uint8).copy()
+    blocks = out.reshape(-1, BLOCKSIZE_BYTES)
+
+    def work(start: int, stop: int) -> None:
+        tile = blocks[start // BLOCKSIZE_BYTES : stop // BLOCKSIZE_BYTES]
+        cipher.encrypt_blocks(tile, out=tile)
+
+    await _run_tiles(out.size, tile_bytes, work, executor)
+    return out.tobytes()
+
+
+async def decrypt(
+    cipher: AES,
+    ciphertext: bytes,
+    padding: Padding = None,
+    *,
+    mode: Mode = "ecb",
+    iv: bytes | None = None,
+    executor: Executor | None = None,
+    inline_bytes: int = INLINE_BYTES,
+    tile_bytes: int = TILE_BYTES,
+) -> bytes:
+    """`cipher.decrypt(...)` that does not block the event loop."""
+    _check_arguments(ciphertext, padding, mode, iv, decrypt=True)
+    if len(ciphertext) <= inline_bytes:
+        return cipher.decrypt(ciphertext, padding, mode=mode, iv=iv)
+    work = _decrypt(cipher, ciphertext, padding, mode, iv, executor, tile_bytes)
+    return await _metered("aio.decrypt", cipher, mode, len(ciphertext), work)
+
+
+async def _decrypt(
+    cipher: AES,
+    ciphertext: bytes,
+    padding: Padding,
+    mode: Mode,
+    iv: bytes | None,
+    executor: Executor | None,
+    tile_bytes: int,
+) -> bytes:
+    if mode == "ctr" and iv is not None:
+        return await _ctr(cipher, ciphertext, iv, executor, tile_bytes)
+    if mode == "cfb" and iv is not None:
+        return await _cfb_decrypt(cipher, ciphertext, iv, executor, tile_bytes)
+    if mode != "ecb":
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, lambda: cipher.decrypt(ciphertext, padding, mode=mode, iv=iv)
+        )
+    src = np.frombuffer(ciphertext, dtype=uint8).reshape(-1, BLOCKSIZE_BYTES)
+    out = np.empty_like(src)
+
+    def work(start: int, stop: int) -> None:
+        tiles = slice(start // BLOCKSIZE_BYTES, stop // BLOCKSIZE_BYTES)
+        cipher.decrypt_blocks(src[tiles], out=out[tiles])
+
+    await _run_tiles(len(ciphertext), tile_bytes, work, executor)
+    if padding is None:
+        return out.tobytes()
+    npad = int(pkcs7_pad_lengths(out[-1])[0])
+    return out.reshape(-1)[: out.size - npad].tobytes()
+
+
+async def _ctr(
+    cipher: AES, data: bytes, iv: bytes, executor: Executor | None, tile_bytes: int
+) -> bytes:
+    out = np.empty(len(data), dtype=uint8)
+    view = memoryview(data)
+
+    def work(start: int, stop: int) -> None:
+        out[start:stop] = ctr_xor(cipher, view[start:stop], iv, start)
+
+    await _run_tiles(len(data), tile_bytes, work, executor)
+    return out.tobytes()
+
+
+async def _cfb_decrypt(
+    cipher: AES, data: bytes, iv: bytes, executor: Executor | None, tile_bytes: int
+) -> bytes:
+    out = np.empty(len(data), dtype=uint8)
+    view = memoryview(data)
+
+    def work(start: int, stop: int) -> None:
+        tile_iv = iv if start == 0 else bytes(view[start - BLOCKSIZE_BYTES : start])
+        out[start:stop] = cfb_decrypt(cipher, view[start:stop], tile_iv)
+
+    await _run_tiles(len(data), tile_bytes, work, executor)
+    return out.tobytes()
+
+
+async def _ctr_offloaded(
+    cipher: AES, data: bytes, iv: bytes, offset: int, inline_bytes: int
+) -> bytes:
+    """CTR at stream `offset`, inline if small and on the default executor if not."""
+    if len(data) <= inline_bytes:
+        return ctr_xor(cipher, data, iv, offset).tobytes()
+    loop = asyncio.get_running_loop()
+    stream: UInt8Array = await loop.run_in_executor(None, ctr_xor, cipher, data, iv, offset)
+    return stream.tobytes()
+
+
+class CTRStreamWriter:
+    """Encrypt everything written to an `asyncio.StreamWriter` in CTR mode.
+
+    `iv` is the initial counter block for stream offset `offset`.
+    `write()` is a coroutine: it encrypts (offloading large chunks),
+    writes, and waits for the transport to drain.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        cipher: AES,
+        iv: bytes,
+        *,
+        offset: int = 0,
+        inline_bytes: int = INLINE_BYTES,
+    ) -> None:
+        _check_iv(iv)
+        self.writer = writer
+        self.cipher = cipher
+        self.iv = iv
+        self.offset = offset
+        self.inline_bytes = inline_bytes
+
+    async def write(self, data: bytes) -> None:
+        """Encrypt and send `data`."""
+        start = self.offset
+        self.offset += len(data)
+        self.writer.write(
+            await _ctr_offloaded(self.cipher, data, self.iv, start, self.inline_bytes)
+        )
+        await self.writer.drain()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    async def wait_closed(self) -> None:
+        await self.writer.wait_closed()
+
+
+class CTRStreamReader:
+    """Decrypt CTR data read from an `asyncio.StreamReader`.
+
+    The read methods mirror `asyncio.StreamReader`'s and return
+    plaintext.  `iv` is the initial counter block for stream offset
+    `offset`.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        cipher: AES,
+        iv: bytes,
+        *,
+        offset: int = 0,
+        inline_bytes: int = INLINE_BYTES,
+    ) -> None:
+        _check_iv(iv)
+        self.reader = reader
+        self.cipher = cipher
+        self.iv = iv
+        self.offset = offset
+        self.inline_bytes = inline_bytes
+
+    async def _decrypt(self, data: bytes) -> bytes:
+        start = self.offset
+        self.offset += len(data)
+        return await _ctr_offloaded(self.cipher, data, self.iv, start, self.inline_bytes)
+
+    async def read(self, n: int = -1) -> bytes:
+        return await self._decrypt(await self.reader.read(n))
+
+    async def readexactly(self, n: int) -> bytes:
+        return await self._decrypt(await self.reader.readexactly(n))
+
+    def at_eof(self) -> bool:
+        return self.reader.at_eof()
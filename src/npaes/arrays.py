@@ -0,0 +1,542 @@
+"""Encrypting NumPy arrays, in memory or on disk a chunk at a time.
+
+`encrypt_array()` and `decrypt_array()` encrypt an ndarray of any dtype
+(float64, a structured dtype, ...) without serializing it: the
+C-contiguous input is reinterpreted as bytes through a view, the engine
+writes into a new array of the same shape and dtype (or into `out=`,
+which may be the input itself), and nothing else the size of the array
+is allocated.  The stream modes (CTR, CFB, OFB) run one tile at a time.  This
+replaces `np.frombuffer(cipher.encrypt(arr.tobytes()), ...)`, which
+makes two extra full copies.
+
+`save_encrypted()` writes an array in the spirit of a `.npy` file: a
+plaintext header holding the dtype, shape and encryption parameters,
+followed by the array data in C order.  The data is cut into chunks of
+whole rows (along the first axis), each of which can be decrypted on
+its own:
+
+- "gcm" (the default): each chunk is a separate AES-GCM message with
+  its own 16-byte tag.  The nonce is a random 8-byte file salt followed
+  by the 32-bit chunk index, and the header is the associated data of
+  every chunk, so a chunk that is altered, moved to another index or
+  paired with an altered header fails to decrypt.
+- "ctr": the data is one CTR stream from a random initial counter
+  block, and chunk i is decrypted from its byte offset alone.  There is
+  no integrity protection, and a wrong key gives garbage, not an error.
+
+`load_encrypted()` returns an `EncryptedArray`, which decrypts nothing
+up front.  Indexing it with NumPy syntax works out which rows the first
+index touches, decrypts only their chunks (all missing chunks in one
+batched call), and applies the rest of the index to those rows.
+Decrypted chunks are kept in an LRU cache, so reading a few rows at a
+time from the same region decrypts each chunk once:
+
+    >>> npaes.save_encrypted("features.npaes", features, key)
+    >>> x = npaes.load_encrypted("features.npaes", key)
+    >>> x[1000:1010, 3:7]  # decrypts only the chunk(s) holding rows 1000-1009
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "CHUNK_BYTES",
+    "EncryptedArray",
+    "decrypt_array",
+    "encrypt_array",
+    "load_encrypted",
+    "save_encrypted",
+)
+
+import ast
+import math
+import operator
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, BLOCKSIZE_BYTES, _metered
+from npaes.aead import gcm_decrypt_batch, gcm_encrypt_batch
+from npaes.modes import _check_iv, cfb_decrypt, cfb_encrypt, ctr_keystream, ctr_xor, ofb_keystream
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+    from numpy.typing import ArrayLike, DTypeLike
+    from typing_extensions import Buffer
+
+    from npaes import Mode, UInt8Array
+
+MAGIC = b"\x93NPAES"
+VERSION = 1
+# Target plaintext size of one chunk; a chunk always holds whole rows
+CHUNK_BYTES = 16 * 1024
+# Decrypted chunks kept per `EncryptedArray` by default
+CACHE_CHUNKS = 64
+# Chunks are encrypted and decrypted in batches of about this many bytes
+BATCH_BYTES = 16 * 1024 * 1024
+TAG_BYTES = 16
+SALT_BYTES = 8
+_PREFIX = struct.Struct("<6sBxI")  # Magic, version, header length
+_ALIGN = 64  # The data starts on a 64-byte boundary, as in .npy
+
+ArrayMode = Literal["gcm", "ctr"]
+
+
+def _as_cipher(key: bytes | AES) -> AES:
+    return key if isinstance(key, AES) else AES(key)
+
+
+def _nrows(shape: tuple[int, ...]) -> int:
+    # A 0-d array is stored as one row
+    return shape[0] if shape else 1
+
+
+def _chunk_rows(shape: tuple[int, ...], itemsize: int, chunk_bytes: int) -> int:
+    row_bytes = itemsize * math.prod(shape[1:])
+    return max(1, chunk_bytes // row_bytes) if row_bytes else max(1, _nrows(shape))
+
+
+def _header(meta: dict[str, Any]) -> bytes:
+    text = repr(meta).encode("latin1")
+    text += b" " * (-(_PREFIX.size + len(text) + 1) % _ALIGN) + b"\n"
+    return _PREFIX.pack(MAGIC, VERSION, len(text)) + text
+
+
+def _read_header(f: BinaryIO) -> tuple[bytes, dict[str, Any]]:
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size or not prefix.startswith(MAGIC):
+        raise ValueError("Not an npaes encrypted array file")
+    _, version, size = _PREFIX.unpack(prefix)
+    if version != VERSION:
+        raise ValueError(f"Unsupported encrypted array format version {version}")
+    text = f.read(size)
+    try:
+        meta = ast.literal_eval(text.decode("latin1"))
+        missing = {"descr", "shape", "mode", "chunk_rows", "nonce", "key_bits"} - set(meta)
+    except (SyntaxError, ValueError, TypeError) as e:
+        raise ValueError("Corrupt encrypted array header") from e
+    if missing:
+        raise ValueError(f"Encrypted array header is missing {sorted(missing)}")
+    return prefix + text, meta
+
+
+def _gcm_nonces(salt: bytes, chunk_ids: ArrayLike) -> UInt8Array:
+    ids = np.asarray(chunk_ids, dtype=np.uint64)
+    nonces = np.empty((len(ids), SALT_BYTES + 4), dtype=uint8)
+    nonces[:, :SALT_BYTES] = np.frombuffer(salt, dtype=uint8)
+    nonces[:, SALT_BYTES:] = ids.astype(">u4").view(uint8).reshape(-1, 4)
+    return nonces
+
+
+def save_encrypted(
+    path: str | os.PathLike[str],
+    arr: ArrayLike,
+    key: bytes | AES,
+    *,
+    mode: ArrayMode = "gcm",
+    chunk_bytes: int = CHUNK_BYTES,
+) -> None:
+    """Encrypt `arr` into the file `path`, in chunks of about `chunk_bytes`.
+
+    `key` is a 16, 24 or 32-byte key or an `AES` instance.  Any dtype
+    without Python objects may be saved; the data is stored in C order.
+    Smaller chunks make reading a few rows cheaper and full reads a
+    little slower.
+    """
+    arr = np.asarray(arr)
+    if arr.dtype.hasobject:
+        raise ValueError("Arrays of Python objects cannot be encrypted")
+    if mode not in ("gcm", "ctr"):
+        raise ValueError(f"`mode` must be 'gcm' or 'ctr', not {mode!r}")
+    if chunk_bytes < 1:
+        raise ValueError(f"`chunk_bytes` must be at least 1, not {chunk_bytes}")
+    cipher = _as_cipher(key)
+    shape = tuple(int(n) for n in arr.shape)
+    chunk_rows = _chunk_rows(shape, arr.itemsize, chunk_bytes)
+    data = np.ascontiguousarray(arr).reshape(-1).view(uint8)
+    stride = chunk_rows * arr.itemsize * math.prod(shape[1:])  # Plaintext bytes per chunk
+    nchunks = -(-data.size // stride) if data.size else 0
+    if mode == "gcm" and nchunks > 2**32:
+        raise ValueError("Too many chunks for 32-bit chunk indexes; raise `chunk_bytes`")
+    nonce = os.urandom(SALT_BYTES if mode == "gcm" else 16)
+    header = _header(
+        {
+            "descr": np.lib.format.dtype_to_descr(arr.dtype),
+            "shape": shape,
+            "mode": mode,
+            "chunk_rows": chunk_rows,
+            "nonce": nonce.hex(),
+            "key_bits": 8 * len(cipher.key),
+        }
+    )
+    step = max(1, BATCH_BYTES // stride) if stride else 1
+    with Path(path).open("wb") as f:
+        f.write(header)
+        for first in range(0, nchunks, step):
+            ids = np.arange(first, min(first + step, nchunks))
+            lo, hi = first * stride, min((first + len(ids)) * stride, data.size)
+            if mode == "ctr":
+                f.write(ctr_xor(cipher, data[lo:hi].data, nonce, lo).data)
+                continue
+            offsets = np.minimum(np.arange(first, first + len(ids) + 1) * stride, hi) - lo
+            out, tags = gcm_encrypt_batch(
+                cipher,
+                data[lo:hi].data,
+                offsets,
+                _gcm_nonces(nonce, ids),
+                header * len(ids),
+                np.arange(len(ids) + 1) * len(header),
+            )
+            # Each chunk is stored as its ciphertext followed by its tag
+            stored = np.empty(out.size + tags.size, dtype=uint8)
+            for i in range(len(ids)):
+                start, end = offsets[i] + i * TAG_BYTES, offsets[i + 1] + i * TAG_BYTES
+                stored[start:end] = out[offsets[i] : offsets[i + 1]]
+                stored[end : end + TAG_BYTES] = tags[i]
+            f.write(stored.data)
+
+
+def load_encrypted(
+    path: str | os.PathLike[str],
+    key: bytes | AES,
+    mmap: bool = True,
+    *,
+    cache_chunks: int = CACHE_CHUNKS,
+) -> EncryptedArray:
+    """Open a file written by `save_encrypted()` without decrypting it.
+
+    With `mmap=True` the ciphertext is memory-mapped and only the chunks
+    you read are paged in; otherwise it is read into memory at once.
+    """
+    return EncryptedArray(path, key, mmap=mmap, cache_chunks=cache_chunks)
+
+
+class EncryptedArray:
+    """Read-only array whose chunks are decrypted as they are indexed.
+
+    Supports `shape`, `dtype`, `len()`, NumPy indexing and
+    `np.asarray()`.  Indexing returns ordinary (decrypted) arrays.  The
+    first index decides which chunks are decrypted: an integer, slice,
+    integer array or boolean mask selects rows; anything else (e.g.
+    `...` or `None` first) decrypts the whole array.  Up to
+    `cache_chunks` decrypted chunks are kept, least recently used
+    first out.  Thread-safe.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        key: bytes | AES,
+        *,
+        mmap: bool = True,
+        cache_chunks: int = CACHE_CHUNKS,
+    ) -> None:
+        if cache_chunks < 0:
+            raise ValueError(f"`cache_chunks` must be nonnegative, not {cache_chunks}")
+        self.cipher = _as_cipher(key)
+        with Path(path).open("rb") as f:
+            self._header, meta = _read_header(f)
+            data = None if mmap else np.fromfile(f, dtype=uint8)
+        if meta["key_bits"] != 8 * len(self.cipher.key):
+            raise ValueError(
+                f"The array was encrypted with a {meta['key_bits']}-bit key,"
+                f" not a {8 * len(self.cipher.key)}-bit one"
+            )
+        if meta["mode"] not in ("gcm", "ctr"):
+            raise ValueError(f"Unknown encryption mode {meta['mode']!r}")
+        self.dtype = np.lib.format.descr_to_dtype(meta["descr"])
+        self.shape: tuple[int, ...] = tuple(meta["shape"])
+        self.mode: ArrayMode = meta["mode"]
+        self.chunk_rows: int = meta["chunk_rows"]
+        self.cache_chunks = cache_chunks
+        self._nonce = bytes.fromhex(meta["nonce"])
+        self._row_bytes = self.dtype.itemsize * math.prod(self.shape[1:])
+        self._stride = self.chunk_rows * self._row_bytes
+        self.nchunks = -(-self.nbytes // self._stride) if self.nbytes else 0
+        size = self.nbytes + (self.nchunks * TAG_BYTES if self.mode == "gcm" else 0)
+        available = Path(path).stat().st_size - len(self._header) if data is None else data.size
+        if available < size:
+            raise ValueError(f"Encrypted array file is truncated ({available} of {size} bytes)")
+        if data is None:
+            # np.memmap cannot map zero bytes
+            data = (
+                np.memmap(path, dtype=uint8, mode="r", offset=len(self._header), shape=(size,))
+                if size
+                else np.empty(0, dtype=uint8)
+            )
+        self._data: np.ndarray = data[:size]
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __enter__(self) -> EncryptedArray:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<EncryptedArray shape={self.shape} dtype={self.dtype} mode={self.mode!r}>"
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def size(self) -> int:
+        return math.prod(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self.size * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        if not self.shape:
+            raise TypeError("len() of unsized object")
+        return self.shape[0]
+
+    def __array__(self, dtype: DTypeLike | None = None, copy: bool | None = None) -> np.ndarray:
+        if copy is False:
+            raise ValueError("An EncryptedArray cannot be converted to an array without a copy")
+        out = self._rows(np.arange(_nrows(self.shape))).reshape(self.shape)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def __getitem__(self, index: Any) -> Any:
+        key = index if isinstance(index, tuple) else (index,)
+        if not self.shape or not key:
+            return np.asarray(self)[index]
+        first, rest = key[0], key[1:]
+        rows = np.arange(self.shape[0])
+        if isinstance(first, slice):
+            return self._rows(rows[first])[(slice(None), *rest)]
+        if isinstance(first, (int, np.integer)) and not isinstance(first, (bool, np.bool_)):
+            i = operator.index(first)
+            if not -len(rows) <= i < len(rows):
+                raise IndexError(f"index {i} is out of bounds for axis 0 with size {len(rows)}")
+            return self._rows(rows[i : i + 1 or None])[(0, *rest)]
+        if first is None or first is Ellipsis:
+            return np.asarray(self)[index]
+        selector = np.asarray(first)
+        if selector.dtype == bool and selector.ndim == 1:
+            if len(selector) != len(rows):
+                raise IndexError(
+                    f"boolean index did not match axis 0 of size {len(rows)};"
+                    f" size of index is {len(selector)}"
+                )
+            selector = np.flatnonzero(selector)
+        if selector.dtype.kind not in "iu":
+            return np.asarray(self)[index]
+        wanted = rows[selector]  # Bounds-checks and wraps negative indexes
+        unique, inverse = np.unique(wanted, return_inverse=True)
+        return self._rows(unique)[(inverse.reshape(wanted.shape), *rest)]
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        """Rows `rows` (in that order) as a new array, decrypting as needed."""
+        out = np.empty((len(rows), *self.shape[1:]), dtype=self.dtype)
+        if not out.nbytes:
+            return out
+        chunk_ids = rows // self.chunk_rows
+        order = np.argsort(chunk_ids, kind="stable")
+        ids, starts = np.unique(chunk_ids[order], return_index=True)
+        chunks = self._chunks(ids.tolist())
+        for c, lo, hi in zip(ids.tolist(), starts, [*starts[1:], len(rows)], strict=True):
+            pick = order[lo:hi]
+            out[pick] = chunks[c][rows[pick] - c * self.chunk_rows]
+        return out
+
+    def _chunks(self, ids: list[int]) -> dict[int, np.ndarray]:
+        if self.closed:
+            raise ValueError("Operation on a closed EncryptedArray")
+        found: dict[int, np.ndarray] = {}
+        missing = []
+        with self._lock:
+            for c in ids:
+                chunk = self._cache.get(c)
+                if chunk is None:
+                    missing.append(c)
+                else:
+                    self._cache.move_to_end(c)
+                    found[c] = chunk
+        step = max(1, BATCH_BYTES // self._stride)
+        for i in range(0, len(missing), step):
+            found.update(self._decrypt(missing[i : i + step]))
+        if self.cache_chunks:
+            with self._lock:
+                for c in missing:
+                    self._cache[c] = found[c]
+                    self._cache.move_to_end(c)
+                while len(self._cache) > self.cache_chunks:
+                    self._cache.popitem(last=False)
+        return found
+
+    def _decrypt(self, ids: list[int]) -> dict[int, np.ndarray]:
+        """Decrypt chunks `ids` as read-only (rows, ...) arrays."""
+        stride = self._stride
+        sizes = [min(stride, self.nbytes - c * stride) for c in ids]
+        if self.mode == "ctr":
+            plain = []
+            for c, n in zip(ids, sizes, strict=True):
+                start = c * stride
+                plain.append(
+                    ctr_xor(self.cipher, self._data[start : start + n].data, self._nonce, start)
+                )
+        else:
+            starts = [c * (stride + TAG_BYTES) for c in ids]
+            ciphertext = np.concatenate(
+                [self._data[s : s + n] for s, n in zip(starts, sizes, strict=True)]
+            )
+            tags = np.stack(
+                [self._data[s + n : s + n + TAG_BYTES] for s, n in zip(starts, sizes, strict=True)]
+            )
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            out = gcm_decrypt_batch(
+                self.cipher,
+                ciphertext.data,
+                offsets,
+                _gcm_nonces(self._nonce, ids),
+                tags,
+                self._header * len(ids),
+                np.arange(len(ids) + 1) * len(self._header),
+            )
+            plain = np.split(out, offsets[1:-1])
+        chunks = {}
+        for c, chunk in zip(ids, plain, strict=True):
+            chunk = chunk.view(self.dtype).reshape(-1, *self.shape[1:])
+            chunk.flags.writeable = False
+            chunks[c] = chunk
+        return chunks
+
+    def cache_clear(self) -> None:
+        """Drop every cached decrypted chunk."""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        """Release the ciphertext and the cached plaintext."""
+        self.closed = True
+        self.cache_clear()
+        self._data = np.empty(0, dtype=uint8)
+
+
+# ---------------------------------------------------------------------
+# In-memory arrays
+
+
+def _bytes_of(arr: np.ndarray, name: str) -> UInt8Array:
+    """`arr` as a flat uint8 view (no copy)."""
+    if arr.dtype.hasobject:
+        raise ValueError(f"`{name}` holds Python objects, which cannot be encrypted")
+    if not arr.flags.c_contiguous:
+        raise ValueError(f"`{name}` must be C-contiguous; see np.ascontiguousarray()")
+    return arr.reshape(-1).view(uint8)
+
+
+def _output(like: np.ndarray, out: np.ndarray | None) -> np.ndarray:
+    if out is None:
+        return np.empty_like(like, order="C")
+    if out.nbytes != like.nbytes:
+        raise ValueError(f"`out` must have {like.nbytes} bytes, not {out.nbytes}")
+    if not out.flags.writeable:
+        raise ValueError("`out` must be writeable")
+    return out
+
+
+def _crypt(
+    cipher: AES, src: UInt8Array, dst: UInt8Array, mode: str, iv: bytes | None, *, decrypt: bool
+) -> None:
+    """Encrypt or decrypt the bytes `src` into `dst`, which may be `src`."""
+    if mode == "ecb":
+        if iv is not None:
+            raise ValueError("ECB mode does not take an `iv`")
+        if src.size % BLOCKSIZE_BYTES:
+            raise ValueError(
+                f"ECB mode needs a multiple of 16 bytes, not {src.size}; use a stream mode"
+            )
+        op = cipher.decrypt_blocks if decrypt else cipher.encrypt_blocks
+        op(src.reshape(-1, BLOCKSIZE_BYTES), out=dst.reshape(-1, BLOCKSIZE_BYTES))
+        return
+    if mode not in ("ctr", "cfb", "ofb"):
+        raise ValueError(f"`mode` must be 'ecb', 'ctr', 'cfb', or 'ofb', not {mode!r}")
+    if iv is None:
+        raise ValueError(f"{mode.upper()} mode requires an `iv`")
+    _check_iv(iv)
+    # One tile at a time, written straight into `dst`.  CTR tiles start
+    # from their block offset; OFB and CFB tiles carry on from the last
+    # keystream or ciphertext block of the tile before.
+    tile = BLOCKSIZE_BYTES * cipher.tile_blocks
+    for lo in range(0, src.size, tile):
+        n = min(tile, src.size - lo)
+        part, into = src[lo : lo + n], dst[lo : lo + n]
+        if mode == "ctr":
+            stream = ctr_keystream(cipher, iv, lo // BLOCKSIZE_BYTES, -(-n // BLOCKSIZE_BYTES))
+            np.bitwise_xor(part, stream.reshape(-1)[:n], out=into)
+        elif mode == "ofb":
+            stream = ofb_keystream(cipher, iv, -(-n // BLOCKSIZE_BYTES))
+            np.bitwise_xor(part, stream.reshape(-1)[:n], out=into)
+            iv = stream[-1].tobytes()
+        elif decrypt:
+            last = part[-BLOCKSIZE_BYTES:].tobytes()  # Read before `into` overwrites it
+            into[:] = cfb_decrypt(cipher, part.data, iv)
+            iv = last
+        else:
+            into[:] = cfb_encrypt(cipher, part.data, iv)
+            iv = into[-BLOCKSIZE_BYTES:].tobytes()
+
+
+@_metered("encrypt_array")
+def encrypt_array(
+    cipher: AES,
+    arr: np.ndarray,
+    *,
+    mode: Mode = "ecb",
+    iv: bytes | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """Encrypt the bytes of a C-contiguous array of any dtype.
+
+    Returns an array of the same shape and dtype holding the
+    ciphertext (`.data` or `.tobytes()` is the raw ciphertext), or
+    `out`, any writeable C-contiguous array of the same size in bytes.
+    `out` may be `arr` to encrypt in place.  ECB needs a multiple of 16
+    bytes; CTR, CFB and OFB take any size and a 16-byte `iv`.
+    """
+    src = _bytes_of(arr, "arr")
+    dst = _output(arr, out)
+    _crypt(cipher, src, _bytes_of(dst, "out"), mode, iv, decrypt=False)
+    return dst
+
+
+@_metered("decrypt_array")
+def decrypt_array(
+    cipher: AES,
+    data: np.ndarray | Buffer,
+    *,
+    mode: Mode = "ecb",
+    iv: bytes | None = None,
+    dtype: DTypeLike | None = None,
+    shape: int | tuple[int, ...] | None = None,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """Inverse of `encrypt_array()`.
+
+    `data` is the array it returned, or its raw ciphertext as any
+    buffer.  The result has the shape and dtype of `data` unless
+    `dtype` and/or `shape` are given (a raw buffer is otherwise
+    decrypted to a flat uint8 array).  `out` is as for `encrypt_array()`.
+    """
+    arr = data if isinstance(data, np.ndarray) else np.frombuffer(memoryview(data), dtype=uint8)
+    src = _bytes_of(arr, "data")
+    if dtype is not None or shape is not None:
+        dt = arr.dtype if dtype is None else np.dtype(dtype)
+        if src.size % dt.itemsize:
+            raise ValueError(f"{src.size} bytes is not a whole number of {dt} items")
+        arr = src.view(dt).reshape(-1 if shape is None else shape)
+    dst = _output(arr, out)
+    _crypt(cipher, src, _bytes_of(dst, "out"), mode, iv, decrypt=True)
+    return dst
@@ -0,0 +1,461 @@
+"""Pluggable block-cipher engines ("backends") and automatic selection.
+
+Every backend implements the same pair of operations on a batch of
+blocks:
+
+    encrypt_blocks(blocks, schedule, out=None)
+    decrypt_blocks(blocks, schedule, out=None)
+
+`blocks` is an (n, 16) uint8 array, one row per block, in input byte
+order (see `npaes.bytes_to_blocks()`).  `schedule` is the stack of
+round keys from `npaes.key_schedule()`, shape (Nr + 1, 4, 4), or one
+such stack per block, shape (n, Nr + 1, 4, 4).  The result is written
+into `out` (allocated if not given), which may be `blocks` itself.
+
+Registered backends:
+
+ - "reference": loops over the blocks calling `encrypt_raw()` and
+   `decrypt_raw()`.  This is the oracle the other engines are tested
+   against.  It is slow and "auto" never chooses it.
+
+ - "vectorized": the same FIPS197 round functions (`sub_bytes()`,
+   `shift_rows()`, `mix_columns()`, ...) applied to the whole
+   (n, 4, 4) stack of States at once, so the Python loop is over
+   rounds rather than blocks.
+
+ - "ttable": the 32-bit table formulation from section 5.2.1 of the
+   Rijndael submission, where SubBytes, ShiftRows and MixColumns of
+   one round collapse into four table lookups and XORs per column.
+   The tables are built on first use.
+
+`AES(key, backend="auto")` picks a backend per call by the number of
+blocks, using crossover thresholds measured once by `calibrate()` and
+cached on disk as JSON.  The cache lives in $NPAES_CACHE_DIR if set,
+else $XDG_CACHE_HOME/npaes (default ~/.cache/npaes), and is keyed on
+the npaes, NumPy and Python versions and the set of registered
+backends, so an upgrade triggers a fresh measurement.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "AUTO",
+    "Backend",
+    "available_backends",
+    "calibrate",
+    "get_backend",
+    "register_backend",
+    "select_backend",
+    "thresholds",
+)
+
+import functools
+import os
+import platform
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import arange, uint8, uint32
+from numpy import bitwise_xor as xor
+
+import npaes
+from npaes import (
+    INVSBOX,
+    NB,
+    SBOX,
+    UInt8Array,
+    decrypt_raw,
+    encrypt_raw,
+    gf_multiply,
+    inv_mix_columns,
+    inv_shift_rows,
+    inv_sub_bytes,
+    key_schedule,
+    mix_columns,
+    shift_rows,
+    sub_bytes,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+AUTO = "auto"
+
+# Batch sizes (in blocks) timed by `calibrate()`
+CALIBRATION_SIZES = (1, 4, 16, 64, 256, 1024)
+
+_NK_FROM_NR = {10: 4, 12: 6, 14: 8}
+
+
+class Backend:
+    """Base class for a block-cipher engine.
+
+    Subclasses set `name` and implement `encrypt_blocks()` and
+    `decrypt_blocks()`.  Backends hold no per-key state; everything
+    key-dependent is derived from `schedule` on each call.
+    """
+
+    name: str = ""
+
+    def encrypt_blocks(
+        self, blocks: UInt8Array, schedule: UInt8Array, out: UInt8Array | None = None
+    ) -> UInt8Array:
+        raise NotImplementedError
+
+    def decrypt_blocks(
+        self, blocks: UInt8Array, schedule: UInt8Array, out: UInt8Array | None = None
+    ) -> UInt8Array:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name!r}>"
+
+
+def _prepare_out(blocks: UInt8Array, out: UInt8Array | None) -> UInt8Array:
+    """Copy `blocks` into `out` (allocating it if needed) and return `out`."""
+    if out is None:
+        return blocks.copy()
+    if out.shape != blocks.shape or out.dtype != uint8:
+        raise ValueError(f"`out` must be uint8 with shape {blocks.shape}, not {out.shape}")
+    if out is not blocks:
+        out[...] = blocks
+    return out
+
+
+def _as_states(blocks: UInt8Array) -> UInt8Array:
+    """(n, 4, 4) view of (n, 16) `blocks` in FIPS197 column ordering."""
+    return blocks.reshape(-1, NB, 4).swapaxes(1, 2)
+
+
+def _round_key_bytes(schedule: UInt8Array) -> UInt8Array:
+    """Round keys in input byte order, shape (Nr + 1, [n,] 16).
+
+    The round axis is moved to the front so `rk[i]` broadcasts against
+    (n, 16) blocks for both a shared and a per-block schedule.
+    """
+    rk = np.ascontiguousarray(schedule.swapaxes(-1, -2))
+    rk = rk.reshape(*schedule.shape[:-2], 16)
+    return np.moveaxis(rk, -2, 0)
+
+
+# ---------------------------------------------------------------------
+# "reference": per-block loop over encrypt_raw()/decrypt_raw()
+
+
+def _schedule_to_key(schedule: UInt8Array) -> UInt8Array:
+    """Recover the cipher key, shape ([n,] 4, Nk), from a schedule.
+
+    The first Nk words of the expanded key are the cipher key itself.
+    """
+    nr = schedule.shape[-3] - 1
+    w = schedule.swapaxes(-3, -2).reshape(*schedule.shape[:-3], 4, NB * (nr + 1))
+    return w[..., : _NK_FROM_NR[nr]]
+
+
+class ReferenceBackend(Backend):
+    name = "reference"
+
+    def _run(self, func, blocks, schedule, out):
+        key = _schedule_to_key(schedule)
+        out = _prepare_out(blocks, out)
+        states = _as_states(out)
+        for i in range(len(states)):
+            # encrypt_raw() modifies its (contiguous) input in-place
+            state = states[i].copy()
+            states[i] = func(state, key if key.ndim == 2 else key[i])
+        return out
+
+    def encrypt_blocks(self, blocks, schedule, out=None):
+        return self._run(encrypt_raw, blocks, schedule, out)
+
+    def decrypt_blocks(self, blocks, schedule, out=None):
+        return self._run(decrypt_raw, blocks, schedule, out)
+
+
+# ---------------------------------------------------------------------
+# "vectorized": round functions over the whole stack of States
+
+
+class VectorizedBackend(Backend):
+    name = "vectorized"
+
+    def encrypt_blocks(self, blocks, schedule, out=None):
+        out = _prepare_out(blocks, out)
+        state = _as_states(out)  # A view; writes land in `out`
+        exkeys = np.moveaxis(schedule, -3, 0)
+        nr = len(exkeys) - 1
+        xor(state, exkeys[0], out=state)
+        for ek in exkeys[1:nr]:
+            sub_bytes(state, out=state)
+            shift_rows(state, out=state)
+            mix_columns(state, out=state)
+            xor(state, ek, out=state)
+        sub_bytes(state, out=state)
+        shift_rows(state, out=state)
+        xor(state, exkeys[nr], out=state)
+        return out
+
+    def decrypt_blocks(self, blocks, schedule, out=None):
+        out = _prepare_out(blocks, out)
+        state = _as_states(out)
+        exkeys = np.moveaxis(schedule, -3, 0)
+        nr = len(exkeys) - 1
+        xor(state, exkeys[nr], out=state)
+        inv_shift_rows(state, out=state)
+        inv_sub_bytes(state, out=state)
+        for ek in exkeys[nr - 1 : 0 : -1]:
+            xor(state, ek, out=state)
+            inv_mix_columns(state, out=state)
+            inv_shift_rows(state, out=state)
+            inv_sub_bytes(state, out=state)
+        xor(state, exkeys[0], out=state)
+        return out
+
+
+# ---------------------------------------------------------------------
+# "ttable": 32-bit lookup tables combining SubBytes/ShiftRows/MixColumns
+#
+# Blocks are viewed as (n, 4) little-endian words, one per column, so
+# byte r of a word is row r.  Te[r][x] is the column that MixColumns
+# produces from S-box output S[x] sitting in row r; Td likewise for
+# InvMixColumns and the inverse S-box.  Te[r] is Te[0] rotated left by
+# 8 * r bits (and the same for Td).
+
+# _SHIFT[c, r] is the input column that ShiftRows moves into column c, row r
+_ROWS = np.tile(arange(4), (4, 1))
+_SHIFT = (arange(4)[:, None] + arange(4)) % 4
+_INVSHIFT = (arange(4)[:, None] - arange(4)) % 4
+for _index in (_ROWS, _SHIFT, _INVSHIFT):
+    _index.flags.writeable = False  # Shared by all threads
+del _index
+
+
+def _column_table(sbox: UInt8Array, coefs: tuple[int, int, int, int]) -> np.ndarray:
+    """Stack of 4 tables, shape (4, 256), for one column of a (Inv)MixColumns."""
+    mul = [gf_multiply(sbox, np.full(256, c, dtype=uint8)).astype(uint32) for c in coefs]
+    t0 = mul[0] | mul[1] << 8 | mul[2] << 16 | mul[3] << 24
+    table = np.stack([t0] + [t0 << 8 * r | t0 >> (32 - 8 * r) for r in range(1, 4)])
+    table.flags.writeable = False
+    return table
+
+
+@functools.cache
+def _te() -> np.ndarray:
+    return _column_table(SBOX, (0x02, 0x01, 0x01, 0x03))
+
+
+@functools.cache
+def _td() -> np.ndarray:
+    return _column_table(INVSBOX, (0x0E, 0x09, 0x0D, 0x0B))
+
+
+def _table_round(state: UInt8Array, table: np.ndarray, shift: np.ndarray) -> np.ndarray:
+    """One full round (minus AddRoundKey) over (n, 16) `state`, as (n, 4) words."""
+    shifted = state.reshape(-1, NB, 4)[:, shift, _ROWS]
+    return np.ascontiguousarray(xor.reduce(table[_ROWS, shifted], axis=-1), dtype="<u4")
+
+
+class TTableBackend(Backend):
+    name = "ttable"
+
+    def encrypt_blocks(self, blocks, schedule, out=None):
+        te = _te()
+        rk = _round_key_bytes(schedule)
+        rkw = rk.view("<u4")
+        nr = len(rk) - 1
+        state = xor(blocks, rk[0])
+        for i in range(1, nr):
+            words = _table_round(state, te, _SHIFT)
+            xor(words, rkw[i], out=words)
+            state = words.view(uint8).reshape(-1, 16)
+        last = SBOX[state.reshape(-1, NB, 4)[:, _SHIFT, _ROWS]].reshape(-1, 16)
+        if out is None:
+            out = np.empty_like(blocks)
+        return xor(last, rk[nr], out=out)
+
+    def decrypt_blocks(self, blocks, schedule, out=None):
+        td = _td()
+        rk = _round_key_bytes(schedule)
+        nr = len(rk) - 1
+        # Equivalent Inverse Cipher (FIPS197 section 5.3.5): the middle
+        # round keys go through InvMixColumns.  Td[r][S[x]] is exactly
+        # InvMixColumns of byte x in row r.
+        mid = rk[1:nr]
+        dkw = xor.reduce(td[arange(4), SBOX[mid.reshape(*mid.shape[:-1], NB, 4)]], axis=-1)
+        state = xor(blocks, rk[nr])
+        for i in range(nr - 1, 0, -1):
+            words = _table_round(state, td, _INVSHIFT)
+            xor(words, dkw[i - 1], out=words)
+            state = words.view(uint8).reshape(-1, 16)
+        last = INVSBOX[state.reshape(-1, NB, 4)[:, _INVSHIFT, _ROWS]].reshape(-1, 16)
+        if out is None:
+            out = np.empty_like(blocks)
+        return xor(last, rk[0], out=out)
+
+
+# ---------------------------------------------------------------------
+# Registry
+
+_registry: dict[str, Backend] = {}
+_auto_names: list[str] = []
+_lock = threading.Lock()
+_thresholds: list[tuple[int, str]] | None = None
+
+
+def register_backend(backend: Backend, *, auto: bool = True) -> Backend:
+    """Add `backend` to the registry under `backend.name`.
+
+    With `auto=False` the backend can be requested by name but is never
+    picked by "auto".  Registering invalidates the in-memory thresholds.
+    """
+    global _thresholds
+    if not backend.name or backend.name == AUTO:
+        raise ValueError(f"Invalid backend name: {backend.name!r}")
+    with _lock:
+        _registry[backend.name] = backend
+        if auto and backend.name not in _auto_names:
+            _auto_names.append(backend.name)
+        elif not auto and backend.name in _auto_names:
+            _auto_names.remove(backend.name)
+        _thresholds = None
+    return backend
+
+
+def get_backend(name: str) -> Backend:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown backend {name!r}; expected 'auto' or one of {available_backends()}"
+        ) from None
+
+
+def available_backends() -> tuple[str, ...]:
+    return tuple(_registry)
+
+
+def select_backend(nblocks: int, name: str = AUTO) -> Backend:
+    """Return the backend `name`, resolving "auto" by batch size."""
+    if name != AUTO:
+        return get_backend(name)
+    choice = _auto_names[0]
+    for start, backend_name in thresholds():
+        if nblocks < start:
+            break
+        choice = backend_name
+    return _registry[choice]
+
+
+# ---------------------------------------------------------------------
+# Calibration and on-disk cache
+
+
+# json and pathlib are imported inside the functions below, which only
+# run on the first "auto" selection, to keep `import npaes` cheap.
+
+
+def cache_path() -> Path:
+    from pathlib import Path
+
+    root = os.environ.get("NPAES_CACHE_DIR")
+    if root is None:
+        xdg = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        root = Path(xdg) / "npaes"
+    return Path(root) / "thresholds.json"
+
+
+def _fingerprint() -> str:
+    return "-".join(
+        (
+            f"npaes{npaes.__version__}",
+            f"numpy{np.__version__}",
+            platform.python_implementation(),
+            platform.python_version(),
+            platform.machine(),
+            ",".join(sorted(_auto_names)),
+        )
+    )
+
+
+def calibrate(
+    sizes: tuple[int, ...] = CALIBRATION_SIZES, repeat: int = 3, *, save: bool = True
+) -> list[tuple[int, str]]:
+    """Time each "auto" backend at each batch size and derive crossovers.
+
+    Returns (and installs) a list of (min_blocks, backend_name) pairs in
+    ascending order: a batch of n blocks goes to the last entry whose
+    min_blocks <= n.  Only encryption is timed; decryption uses the same
+    thresholds.  With `save=True` the result is written to `cache_path()`.
+    """
+    import json
+
+    global _thresholds
+    schedule = key_schedule(bytes(16))
+    rng = np.random.default_rng(0)
+    result: list[tuple[int, str]] = []
+    for n in sizes:
+        blocks = rng.integers(0, 256, (n, 16), dtype=uint8)
+        out = np.empty_like(blocks)
+        best: dict[str, float] = {}
+        for name in _auto_names:
+            backend = _registry[name]
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                backend.encrypt_blocks(blocks, schedule, out=out)
+                elapsed = time.perf_counter() - t0
+                best[name] = min(best.get(name, elapsed), elapsed)
+        winner = min(best, key=best.__getitem__)
+        if not result:
+            result.append((0, winner))
+        elif result[-1][1] != winner:
+            result.append((n, winner))
+    if save:
+        path = cache_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps({"fingerprint": _fingerprint(), "thresholds": result}))
+        except OSError:
+            pass  # A read-only home directory is no reason to fail encryption
+    _thresholds = result
+    return result
+
+
+def _load_thresholds() -> list[tuple[int, str]] | None:
+    import json
+
+    try:
+        cached = json.loads(cache_path().read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("fingerprint") != _fingerprint():
+        return None
+    try:
+        result = [(int(start), str(name)) for start, name in cached["thresholds"]]
+    except (KeyError, TypeError, ValueError):
+        return None  # A malformed cache is a miss: calibrate again
+    if not result or any(name not in _auto_names for _, name in result):
+        return None
+    return result
+
+
+def thresholds() -> list[tuple[int, str]]:
+    """Crossover thresholds for "auto", loaded from disk or measured once."""
+    global _thresholds
+    result = _thresholds
+    if result is None:
+        # Held while calibrating, so that threads arriving together
+        # measure once and not all at the same time
+        with _lock:
+            result = _thresholds
+            if result is None:
+                result = _thresholds = _load_thresholds()
+            if result is None:
+                result = calibrate()
+    return result
+
+
+register_backend(ReferenceBackend(), auto=False)
+register_backend(VectorizedBackend())
+register_backend(TTableBackend())
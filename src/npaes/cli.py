@@ -0,0 +1,392 @@
+"""Streaming encryption from the command line: ``python -m npaes``.
+
+    tar c data | python -m npaes encrypt --key-file backup.key > data.tar.npaes
+    python -m npaes decrypt --key-file backup.key -i data.tar.npaes | tar x
+
+Input is read and written one chunk at a time, so memory stays at a few
+chunks per worker however large the stream is.  When it finishes, the
+tool prints the throughput and the peak resident set size to stderr.
+
+Given a directory, it encrypts the whole tree into the output directory,
+one stream per file, on a process pool (see `npaes.tree`):
+
+    python -m npaes encrypt --key-file backup.key -i exports -o exports.enc
+
+The stream format is a fixed header followed by the chunks:
+
+    magic "NPAESTRM", version (1 byte), mode (1 byte: 0 CTR, 1 GCM),
+    chunk size (4 bytes, little-endian), nonce (16 bytes for CTR,
+    8 for GCM)
+
+- GCM (the default): chunk i of the plaintext (every chunk is full-size
+  but the last, which is empty only for empty input) is sealed as its
+  own GCM message with nonce = salt || i (32-bit, big-endian) and
+  associated data header || final, where final is 1 for the last chunk and 0 otherwise.
+  Each is stored as ciphertext || 16-byte tag.  Reordered, altered or
+  dropped chunks, and a stream cut off at a chunk boundary, all fail
+  authentication.  Decryption writes each chunk as soon as it verifies,
+  so on failure the output holds the plaintext up to the bad chunk and
+  the tool exits with status 1.
+- CTR: the plaintext XORed with the CTR keystream from the IV in the
+  header.  Not authenticated.
+
+`encrypt_stream()` and `decrypt_stream()` do the same for any pair of
+binary file objects.
+"""
+
+from __future__ import annotations
+
+__all__ = ("CHUNK_SIZE", "decrypt_stream", "encrypt_stream", "main")
+
+import argparse
+import contextlib
+import os
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Literal
+
+from npaes import AES, ALLOWED_KEYLENGTH_BYTES
+from npaes.aead import gcm_decrypt, gcm_encrypt
+from npaes.modes import ctr_xor
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+MAGIC = b"NPAESTRM"
+VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+TAG_BYTES = 16
+SALT_BYTES = 8
+_HEADER = struct.Struct("<8sBBI")  # Magic, version, mode, chunk size
+_MODES = ("ctr", "gcm")
+_SUFFIXES = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+StreamMode = Literal["ctr", "gcm"]
+
+
+def _read_full(src: BinaryIO, n: int) -> bytes:
+    """Up to `n` bytes, fewer only at end of stream (pipes return short reads)."""
+    parts = []
+    while n:
+        part = src.read(n)
+        if not part:
+            break
+        parts.append(part)
+        n -= len(part)
+    return b"".join(parts)
+
+
+def _chunks(src: BinaryIO, size: int) -> Iterator[tuple[int, bytes, bool]]:
+    """(index, chunk, is_last) for each `size`-byte chunk; the last may be short or empty."""
+    current = _read_full(src, size)
+    index = 0
+    while True:
+        following = _read_full(src, size) if len(current) == size else b""
+        last = not following
+        yield index, current, last
+        if last:
+            return
+        current = following
+        index += 1
+
+
+def _pipeline(
+    jobs: Iterable[tuple[int, bytes, bool]],
+    func: Callable[[int, bytes, bool], bytes | memoryview],
+    dst: BinaryIO,
+    workers: int,
+) -> tuple[int, int]:
+    """Write func(*job) for each job, in order, running up to `workers` at a time.
+
+    Returns the number of jobs and the total size of their chunks.
+    """
+    njobs = total = 0
+    if workers == 1:
+        for job in jobs:
+            njobs, total = njobs + 1, total + len(job[1])
+            dst.write(func(*job))
+        return njobs, total
+    with ThreadPoolExecutor(workers) as pool:
+        pending = deque()
+        for job in jobs:
+            njobs, total = njobs + 1, total + len(job[1])
+            pending.append(pool.submit(func, *job))
+            # Bounded read-ahead keeps memory at a few chunks per worker
+            if len(pending) >= 2 * workers:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+    return njobs, total
+
+
+def _gcm_nonce(salt: bytes, index: int) -> bytes:
+    if index >= 1 << 32:
+        raise ValueError("Stream has more than 2**32 chunks; use a larger chunk size")
+    return salt + index.to_bytes(4, "big")
+
+
+def encrypt_stream(
+    src: BinaryIO,
+    dst: BinaryIO,
+    cipher: AES,
+    *,
+    mode: StreamMode = "gcm",
+    chunk_size: int = CHUNK_SIZE,
+    workers: int = 1,
+) -> int:
+    """Encrypt `src` into `dst` in the stream format; return the plaintext size."""
+    if mode not in _MODES:
+        raise ValueError(f"`mode` must be 'ctr' or 'gcm', not {mode!r}")
+    if not 1 <= chunk_size < 1 << 32:
+        raise ValueError(f"`chunk_size` must be from 1 byte to 4 GiB, not {chunk_size}")
+    if workers < 1:
+        raise ValueError(f"`workers` must be at least 1, not {workers}")
+    nonce = os.urandom(16 if mode == "ctr" else SALT_BYTES)
+    header = _HEADER.pack(MAGIC, VERSION, _MODES.index(mode), chunk_size) + nonce
+    dst.write(header)
+
+    def seal(index: int, chunk: bytes, last: bool) -> bytes | memoryview:
+        if mode == "ctr":
+            return ctr_xor(cipher, chunk, nonce, index * chunk_size).data
+        return gcm_encrypt(cipher, _gcm_nonce(nonce, index), chunk, header + bytes([last]))
+
+    return _pipeline(_chunks(src, chunk_size), seal, dst, workers)[1]
+
+
+def _read_header(src: BinaryIO) -> tuple[bytes, StreamMode, int]:
+    """Read and check a stream header; return it with the mode and chunk size."""
+    fixed = _read_full(src, _HEADER.size)
+    if len(fixed) < _HEADER.size or not fixed.startswith(MAGIC):
+        raise ValueError("Not an npaes stream")
+    _, version, mode_id, chunk_size = _HEADER.unpack(fixed)
+    if version != VERSION:
+        raise ValueError(f"Unsupported npaes stream version {version}")
+    if mode_id >= len(_MODES) or not chunk_size:
+        raise ValueError("Corrupt npaes stream header")
+    mode = _MODES[mode_id]
+    nonce_bytes = 16 if mode == "ctr" else SALT_BYTES
+    nonce = _read_full(src, nonce_bytes)
+    if len(nonce) < nonce_bytes:
+        raise ValueError("Truncated npaes stream header")
+    return fixed + nonce, mode, chunk_size
+
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO, cipher: AES, *, workers: int = 1) -> int:
+    """Inverse of `encrypt_stream()`; return the plaintext size.
+
+    Raises ValueError if the stream is malformed or fails authentication.
+    """
+    if workers < 1:
+        raise ValueError(f"`workers` must be at least 1, not {workers}")
+    header, mode, chunk_size = _read_header(src)
+    nonce = header[_HEADER.size :]
+
+    def open_(index: int, record: bytes, last: bool) -> bytes | memoryview:
+        if mode == "ctr":
+            return ctr_xor(cipher, record, nonce, index * chunk_size).data
+        if len(record) < TAG_BYTES:
+            raise ValueError("Truncated npaes stream")
+        try:
+            return gcm_decrypt(cipher, _gcm_nonce(nonce, index), record, header + bytes([last]))
+        except ValueError:
+            raise ValueError(f"Chunk {index} of the stream failed authentication") from None
+
+    tag_bytes = TAG_BYTES if mode == "gcm" else 0
+    nrecords, total = _pipeline(_chunks(src, chunk_size + tag_bytes), open_, dst, workers)
+    return total - tag_bytes * nrecords
+
+
+def _size(text: str) -> int:
+    """Positive byte count with an optional K, M or G suffix (powers of 1024)."""
+    scale = _SUFFIXES.get(text[-1:].lower(), 1)
+    try:
+        size = int(text[:-1] if scale > 1 else text) * scale
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}") from None
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"size must be at least 1 byte, not {text!r}")
+    return size
+
+
+def _chunk_size(text: str) -> int:
+    """`_size()` that also fits the 4-byte chunk size field of the header."""
+    size = _size(text)
+    if size >= 1 << 32:
+        raise argparse.ArgumentTypeError(f"chunk size must be less than 4 GiB, not {text!r}")
+    return size
+
+
+def _workers(text: str) -> int:
+    try:
+        workers = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid worker count: {text!r}") from None
+    if workers < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {workers}")
+    return workers
+
+
+def _peak_rss() -> int | None:
+    """Peak resident set size of this process or its largest worker, in bytes, where available."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(
+        resource.getrusage(who).ru_maxrss
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _read_key(args: argparse.Namespace) -> bytes:
+    if args.key_file is not None:
+        key = Path(args.key_file).read_bytes()
+    else:
+        value = os.environ.get(args.key_env)
+        if value is None:
+            raise ValueError(f"Environment variable {args.key_env} is not set")
+        try:
+            key = bytes.fromhex(value.strip())
+        except ValueError:
+            raise ValueError(f"{args.key_env} must hold the key in hex") from None
+    if len(key) not in ALLOWED_KEYLENGTH_BYTES:
+        raise ValueError(f"The key must be 16, 24, or 32 bytes, not {len(key)}")
+    return key
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m npaes",
+        description="Encrypt or decrypt a stream with AES-GCM or AES-CTR, one chunk at a time.",
+    )
+    parser.add_argument("command", choices=["encrypt", "decrypt"])
+    key = parser.add_mutually_exclusive_group(required=True)
+    key.add_argument("--key-file", metavar="PATH", help="file holding the raw 16/24/32-byte key")
+    key.add_argument("--key-env", metavar="VAR", help="environment variable holding the key in hex")
+    parser.add_argument(
+        "-i", "--input", default="-", help="input file or directory (default: stdin)"
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="output file or directory (default: stdout)"
+    )
+    parser.add_argument(
+        "--mode", choices=_MODES, default="gcm", help="encrypt only (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=_chunk_size,
+        default=CHUNK_SIZE,
+        metavar="BYTES",
+        help="encrypt only; e.g. 64K or 4M (default: 1M)",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=_size,
+        metavar="BYTES",
+        help="directories only; files larger than this are split across workers (default: 16M)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=_workers,
+        help="chunks (threads) or jobs (processes, for a directory) run in parallel"
+        " (default: 1, or one per CPU for a directory)",
+    )
+    parser.add_argument("--backend", default="auto", help="block cipher engine (default: auto)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print statistics")
+    return parser
+
+
+def _crypt_tree(args: argparse.Namespace, cipher: AES) -> tuple[int, int]:
+    """Encrypt or decrypt the directory `args.input`; see `npaes.tree`."""
+    from npaes.tree import TILE_BYTES, decrypt_tree, encrypt_tree
+
+    tile_bytes = TILE_BYTES if args.tile_size is None else args.tile_size
+    if args.command == "decrypt":
+        return decrypt_tree(
+            args.input, args.output, cipher, tile_bytes=tile_bytes, workers=args.workers
+        )
+    return encrypt_tree(
+        args.input,
+        args.output,
+        cipher,
+        mode=args.mode,
+        chunk_size=args.chunk_size,
+        tile_bytes=tile_bytes,
+        workers=args.workers,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.input != "-" and Path(args.input).is_dir():
+        if args.output == "-":
+            parser.error("a directory needs an output directory (-o DIR)")
+        return _main_tree(parser, args)
+    with contextlib.ExitStack() as files:
+        try:
+            cipher = AES(_read_key(args), args.backend)
+            src = (
+                sys.stdin.buffer
+                if args.input == "-"
+                else files.enter_context(Path(args.input).open("rb"))
+            )
+            dst = (
+                sys.stdout.buffer
+                if args.output == "-"
+                else files.enter_context(Path(args.output).open("wb"))
+            )
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        start = time.perf_counter()
+        try:
+            if args.command == "encrypt":
+                total = encrypt_stream(
+                    src,
+                    dst,
+                    cipher,
+                    mode=args.mode,
+                    chunk_size=args.chunk_size,
+                    workers=args.workers or 1,
+                )
+            else:
+                total = decrypt_stream(src, dst, cipher, workers=args.workers or 1)
+            dst.flush()
+        except (OSError, ValueError) as e:
+            print(f"{parser.prog}: error: {e}", file=sys.stderr)
+            return 1
+    if not args.quiet:
+        _report(args.command, "", total, time.perf_counter() - start)
+    return 0
+
+
+def _main_tree(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    try:
+        cipher = AES(_read_key(args), args.backend)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    try:
+        nfiles, total = _crypt_tree(args, cipher)
+    except (OSError, ValueError) as e:
+        print(f"{parser.prog}: error: {e}", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        _report(args.command, f"{nfiles} files, ", total, time.perf_counter() - start)
+    return 0
+
+
+def _report(command: str, prefix: str, total: int, seconds: float) -> None:
+    """Print throughput and peak memory to stderr."""
+    rss = _peak_rss()
+    print(
+        f"{command}ed {prefix}{total / 1e6:.1f} MB in {seconds:.2f} s"
+        f" ({total / 1e6 / max(seconds, 1e-9):.1f} MB/s)"
+        + ("" if rss is None else f", peak RSS {rss / 1e6:.1f} MB"),
+        file=sys.stderr,
+    )
@@ -0,0 +1,238 @@
+"""AES CTR_DRBG (NIST SP 800-90A Rev. 1, section 10.2.1).
+
+A deterministic random bit generator: the same seed material gives the
+same byte stream, on any machine and with any backend.  The state is an
+AES key and a 128-bit counter V.  Each Generate request encrypts
+V + 1, V + 2, ... -- the whole request as one batched CTR keystream
+(`npaes.modes.ctr_keystream()`) rather than 16 bytes at a time -- and
+then refreshes the key and V with the Update function.
+
+SP 800-90A caps a request at 2^19 bits, so `generate()` splits larger
+reads into 64 KiB requests.  For many small reads, `prefetch=` keeps a
+buffer filled by one request of that size; the bytes returned are then
+the concatenation of those requests, which differs from the stream
+without a buffer but is just as deterministic.
+
+With the derivation function (the default) the entropy input, nonce and
+personalization string may have any length.  Without it, the entropy
+input must be exactly seedlen (key length + 16) bytes of full entropy
+and there is no nonce.
+
+A generator may be shared between threads: `generate()` and `reseed()`
+hold a per-instance lock, so no two callers ever receive the same
+bytes.  Its internal keys change on every request and are kept out of
+the `AES` schedule cache.
+
+This generator does not gather entropy itself: pass `os.urandom()`
+output as `entropy` for secrets, or a fixed seed for reproducible data.
+"""
+
+from __future__ import annotations
+
+__all__ = ("CTRDRBG", "MAX_REQUEST_BYTES", "RESEED_INTERVAL")
+
+import threading
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, ALLOWED_KEYLENGTH_BYTES, BLOCKSIZE_BYTES, UInt8Array, key_schedule
+from npaes.modes import ctr_keystream
+
+MAX_REQUEST_BYTES = 2**16  # max_number_of_bits_per_request = 2^19
+RESEED_INTERVAL = 2**48
+_MAX_INPUT_BYTES = 2**32  # max_length for inputs to the derivation function
+
+
+def _blocks_for(n: int) -> int:
+    return -(-n // BLOCKSIZE_BYTES)
+
+
+def _check_bytes(**inputs: bytes) -> None:
+    for name, value in inputs.items():
+        if not isinstance(value, bytes):
+            raise TypeError(f"`{name}` must be bytes, not {type(value)}")
+
+
+class CTRDRBG:
+    """AES CTR_DRBG.
+
+    Parameters
+    ----------
+    entropy: entropy input (or a fixed seed, for reproducible output).
+    nonce: nonce for the derivation function; must be empty without it.
+    personalization: optional personalization string.
+    key_bytes: AES key length, 16, 24 or 32 (default 32, AES-256).
+    derivation: use the block cipher derivation function (default True).
+    reseed_interval: Generate requests allowed between reseeds.
+    prefetch: size in bytes of the read-ahead buffer, 0 for none.
+    backend: block-cipher backend, as for `AES`.
+
+    Example
+    -------
+    >>> rng = CTRDRBG(b"fixed seed for test data", prefetch=4096)
+    >>> rng.generate(10)
+    """
+
+    def __init__(
+        self,
+        entropy: bytes,
+        nonce: bytes = b"",
+        personalization: bytes = b"",
+        *,
+        key_bytes: int = 32,
+        derivation: bool = True,
+        reseed_interval: int = RESEED_INTERVAL,
+        prefetch: int = 0,
+        backend: str = "auto",
+    ) -> None:
+        if key_bytes not in ALLOWED_KEYLENGTH_BYTES:
+            raise ValueError(f"`key_bytes` must be 16, 24, or 32, not {key_bytes}")
+        if not 1 <= reseed_interval <= RESEED_INTERVAL:
+            raise ValueError(
+                f"`reseed_interval` must be between 1 and 2**48, not {reseed_interval}"
+            )
+        if not 0 <= prefetch <= MAX_REQUEST_BYTES:
+            raise ValueError(
+                f"`prefetch` must be between 0 and {MAX_REQUEST_BYTES}, not {prefetch}"
+            )
+        _check_bytes(entropy=entropy, nonce=nonce, personalization=personalization)
+        if not derivation and nonce:
+            raise ValueError("A nonce is only used with the derivation function")
+        self.key_bytes = key_bytes
+        self.seedlen = key_bytes + BLOCKSIZE_BYTES
+        self.derivation = derivation
+        self.reseed_interval = reseed_interval
+        self.prefetch = prefetch
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._set_state(bytes(key_bytes), bytes(BLOCKSIZE_BYTES))
+        self._update(self._seed_material(entropy + nonce, personalization))
+        self.reseed_counter = 1
+        self._buffer = np.empty(0, dtype=uint8)
+
+    def _set_state(self, key: bytes, v: bytes) -> None:
+        # Single-use keys: expand directly rather than through the cache
+        self._cipher = AES.from_schedule(key_schedule(key), backend=self.backend)
+        self._v = v
+
+    def _seed_material(self, entropy: bytes, additional: bytes) -> UInt8Array:
+        if self.derivation:
+            return self._derive(entropy + additional)
+        if len(entropy) != self.seedlen:
+            raise ValueError(
+                f"Without derivation, len(entropy) must be {self.seedlen} bytes, not {len(entropy)}"
+            )
+        return np.bitwise_xor(self._pad(entropy), self._pad(additional))
+
+    def _additional(self, additional: bytes) -> UInt8Array:
+        return self._derive(additional) if self.derivation else self._pad(additional)
+
+    def _pad(self, additional: bytes) -> UInt8Array:
+        """`additional` zero-padded to seedlen bytes (no derivation function)."""
+        if len(additional) > self.seedlen:
+            raise ValueError(
+                f"Without derivation, inputs are at most {self.seedlen} bytes, not {len(additional)}"
+            )
+        out = np.zeros(self.seedlen, dtype=uint8)
+        out[: len(additional)] = np.frombuffer(additional, dtype=uint8)
+        return out
+
+    def _derive(self, data: bytes) -> UInt8Array:
+        """Block_Cipher_df (section 10.3.2) returning seedlen bytes.
+
+        The BCC chains for the seedlen bytes of intermediate key and X
+        differ only in their first block, so they run side by side.
+        """
+        if len(data) > _MAX_INPUT_BYTES:
+            raise ValueError("Input to the derivation function exceeds 2**32 bytes")
+        s = len(data).to_bytes(4, "big") + self.seedlen.to_bytes(4, "big") + data + b"\x80"
+        s += bytes(-len(s) % BLOCKSIZE_BYTES)
+        nchains = _blocks_for(self.seedlen)
+        chains = np.zeros((nchains, BLOCKSIZE_BYTES + len(s)), dtype=uint8)
+        chains[:, :4] = np.arange(nchains, dtype=">u4").view(uint8).reshape(nchains, 4)
+        chains[:, BLOCKSIZE_BYTES:] = np.frombuffer(s, dtype=uint8)
+        chains = chains.reshape(nchains, -1, BLOCKSIZE_BYTES)
+        bcc = AES(bytes(range(self.key_bytes)), backend=self.backend)
+        state = np.zeros((nchains, BLOCKSIZE_BYTES), dtype=uint8)
+        for j in range(chains.shape[1]):
+            state ^= chains[:, j]
+            bcc.encrypt_blocks(state, out=state)
+        temp = state.reshape(-1)
+        cipher = AES.from_schedule(key_schedule(temp[: self.key_bytes].tobytes()), self.backend)
+        x = temp[self.key_bytes : self.seedlen].reshape(1, BLOCKSIZE_BYTES).copy()
+        out = np.empty((nchains, BLOCKSIZE_BYTES), dtype=uint8)
+        for i in range(nchains):
+            out[i] = cipher.encrypt_blocks(x, out=x)[0]
+        return out.reshape(-1)[: self.seedlen]
+
+    def _keystream(self, nbytes: int) -> UInt8Array:
+        """E(Key, V + 1) || E(Key, V + 2) || ..., advancing V."""
+        nblocks = _blocks_for(nbytes)
+        stream = ctr_keystream(self._cipher, self._v, 1, nblocks)
+        self._v = ((int.from_bytes(self._v, "big") + nblocks) % 2**128).to_bytes(
+            BLOCKSIZE_BYTES, "big"
+        )
+        return stream.reshape(-1)[:nbytes]
+
+    def _update(self, provided: UInt8Array) -> None:
+        """CTR_DRBG_Update (section 10.2.1.2)."""
+        temp = np.bitwise_xor(self._keystream(self.seedlen), provided)
+        self._set_state(temp[: self.key_bytes].tobytes(), temp[self.key_bytes :].tobytes())
+
+    def _request(self, out: UInt8Array, additional: UInt8Array | None) -> None:
+        """One Generate request (section 10.2.1.5) writing len(out) bytes."""
+        if self.reseed_counter > self.reseed_interval:
+            raise RuntimeError("CTR_DRBG reseed required: call reseed() with fresh entropy")
+        if additional is None:
+            additional = np.zeros(self.seedlen, dtype=uint8)
+        else:
+            self._update(additional)
+        out[:] = self._keystream(len(out))
+        self._update(additional)
+        self.reseed_counter += 1
+
+    def reseed(self, entropy: bytes, additional_input: bytes = b"") -> None:
+        """Reseed with fresh `entropy`.  Any prefetched bytes are discarded."""
+        _check_bytes(entropy=entropy, additional_input=additional_input)
+        with self._lock:
+            self._update(self._seed_material(entropy, additional_input))
+            self.reseed_counter = 1
+            self._buffer = self._buffer[:0]
+
+    def generate(self, n: int, additional_input: bytes = b"") -> bytes:
+        """Return `n` pseudorandom bytes.
+
+        Reads of at most `prefetch` bytes without additional input are
+        served from the read-ahead buffer.  Anything else is generated
+        directly, in requests of at most 64 KiB, and discards the buffer
+        so that the additional input affects all output that follows.
+        """
+        return self.generate_array(n, additional_input).tobytes()
+
+    def generate_array(self, n: int, additional_input: bytes = b"") -> UInt8Array:
+        """As `generate()`, but return a 1d uint8 array."""
+        _check_bytes(additional_input=additional_input)
+        if n < 0:
+            raise ValueError(f"`n` must be non-negative, not {n}")
+        out = np.empty(n, dtype=uint8)
+        with self._lock:
+            if n <= self.prefetch and not additional_input:
+                self._read_buffered(out)
+                return out
+            self._buffer = self._buffer[:0]
+            additional = self._additional(additional_input) if additional_input else None
+            for start in range(0, n, MAX_REQUEST_BYTES):
+                self._request(out[start : start + MAX_REQUEST_BYTES], additional)
+        return out
+
+    def _read_buffered(self, out: UInt8Array) -> None:
+        filled = 0
+        while filled < len(out):
+            if not self._buffer.size:
+                self._buffer = np.empty(self.prefetch, dtype=uint8)
+                self._request(self._buffer, None)
+            take = min(len(out) - filled, self._buffer.size)
+            out[filled : filled + take] = self._buffer[:take]
+            self._buffer = self._buffer[take:]
+            filled += take
@@ -0,0 +1,148 @@
+"""File objects that encrypt transparently.
+
+`EncryptedFile` wraps a binary file holding CTR-mode ciphertext and
+presents the plaintext through the `io.RawIOBase` interface.  CTR is
+length-preserving, so plaintext offset X is ciphertext offset X, and
+the keystream for [X, X + n) can be computed without touching anything
+before X.  A `seek()` followed by a small `read()` therefore costs a
+handful of block encryptions regardless of the file's size.
+
+Wrap it in `io.BufferedReader`/`io.BufferedWriter` for many tiny
+sequential reads or writes, as with any raw file.
+"""
+
+from __future__ import annotations
+
+__all__ = ("EncryptedFile",)
+
+import io
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import uint8
+
+from npaes.modes import _check_iv, ctr_xor
+
+if TYPE_CHECKING:
+    from typing_extensions import Buffer
+
+    from npaes import AES
+
+
+class EncryptedFile(io.RawIOBase):
+    """Random-access CTR encryption layer over a binary file.
+
+    Parameters
+    ----------
+    raw: binary file object holding the ciphertext.  It must be seekable;
+        it must also be readable and/or writable for `read()`/`write()`.
+    cipher: `AES` instance for the key.
+    iv: 16-byte initial counter block for byte 0 of the file.
+    closefd: close `raw` when this object is closed (default True).
+
+    Example
+    -------
+    >>> with EncryptedFile(open("blob.enc", "rb"), AES(key), iv) as f:
+    ...     f.seek(3_000_000_000)
+    ...     chunk = f.read(4096)
+    """
+
+    def __init__(
+        self,
+        raw: io.RawIOBase | io.BufferedIOBase,
+        cipher: AES,
+        iv: bytes,
+        *,
+        closefd: bool = True,
+    ) -> None:
+        _check_iv(iv)
+        if not raw.seekable():
+            raise ValueError("`raw` must be seekable")
+        self.raw = raw
+        self.cipher = cipher
+        self.iv = iv
+        self.closefd = closefd
+        self._pos = raw.tell()
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+    def readable(self) -> bool:
+        return self.raw.readable()
+
+    def writable(self) -> bool:
+        return self.raw.writable()
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        self._check_open()
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._check_open()
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.raw.seek(0, io.SEEK_END) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer: Buffer) -> int | None:
+        """Read and decrypt up to len(buffer) bytes at the current position.
+
+        Returns None, like the raw stream, if a non-blocking read has no
+        bytes ready, and 0 at end of file.
+        """
+        self._check_open()
+        self.raw.seek(self._pos)
+        n = self.raw.readinto(buffer)
+        if n is None:
+            return None
+        if not n:
+            return 0
+        view = memoryview(buffer).cast("B")[:n]
+        np.frombuffer(view, dtype=uint8)[:] = ctr_xor(self.cipher, view, self.iv, self._pos)
+        self._pos += n
+        return n
+
+    def write(self, data: Buffer) -> int | None:
+        """Encrypt `data` and write it at the current position.
+
+        Returns None, without moving the position, if a non-blocking raw
+        stream could not accept any bytes.
+        """
+        self._check_open()
+        src = memoryview(data).cast("B")
+        self.raw.seek(self._pos)
+        n = self.raw.write(ctr_xor(self.cipher, src, self.iv, self._pos).data)
+        if n is None:
+            return None
+        self._pos += n
+        return n
+
+    def truncate(self, size: int | None = None) -> int:
+        self._check_open()
+        return self.raw.truncate(self._pos if size is None else size)
+
+    def flush(self) -> None:
+        if not self.closed:
+            self.raw.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            super().close()
+            if self.closefd:
+                self.raw.close()
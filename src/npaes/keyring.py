@@ -0,0 +1,298 @@
+"""Many expanded key schedules in one contiguous array.
+
+A `Keyring` holds up to `capacity` key schedules of one key length as a
+single (capacity, Nr + 1, 4, 4) uint8 array, addressed by integer key id
+(the row).  Keys are inserted and evicted in bulk: `insert()` expands a
+whole (n, 16|24|32) stack of keys with one call to `key_schedules()`,
+so there is no per-key Python expansion loop.
+
+The array can live in ordinary memory, in a memory-mapped file
+(`path=`), or in a named `multiprocessing.shared_memory` block
+(`shared_memory=`).  In the latter two cases every process that opens
+the same file or name sees the same schedules, so worker processes on
+a host expand each tenant's key once between them rather than once
+each.  A 16-byte header records the key length and capacity, and
+opening an existing ring with different ones fails.  A one-byte flag
+per id, stored after the schedules, marks which ids are present.  Inserts and evictions are not locked: have a single
+process write, or coordinate writers yourself.
+
+`cipher(key_id)` returns an `AES` for one key without re-expanding it.
+`encrypt_blocks(key_ids, blocks)` encrypts each block under its own
+tenant's key in one batched engine call per tile.
+"""
+
+from __future__ import annotations
+
+__all__ = ("Keyring",)
+
+import os
+import struct
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory as shm
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, ALLOWED_KEYLENGTH_BYTES, _engine, _tile_blocks, key_schedules
+
+if TYPE_CHECKING:
+    from numpy.typing import ArrayLike
+
+    from npaes import UInt8Array
+
+_MAGIC = b"NPKR"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBxxQ")  # Magic, version, key bytes, capacity
+
+
+def _open_shared(name: str, size: int) -> tuple[shm.SharedMemory, bool]:
+    """Create or attach to shared memory `name`, leaving its lifetime to `unlink()`.
+
+    Returns the block and whether this call created it.
+
+    Before Python 3.13, every process that opens a block registers it
+    with the resource tracker, which destroys it when that process
+    exits, pulling the keys out from under every other worker.
+    """
+    untracked = {"track": False} if sys.version_info >= (3, 13) else {}
+    try:
+        block = shm.SharedMemory(name, create=True, size=size, **untracked)
+        created = True
+    except FileExistsError:
+        block = shm.SharedMemory(name, **untracked)
+        created = False
+    if sys.version_info < (3, 13):
+        resource_tracker.unregister(block._name, "shared_memory")  # ty: ignore[unresolved-attribute]
+    return block, created
+
+
+class Keyring:
+    """A fixed-capacity store of key schedules addressed by key id.
+
+    Parameters
+    ----------
+    capacity: number of key ids, 0 through capacity - 1.
+    key_bytes: key length of every key in the ring, 16, 24 or 32.
+    path: back the ring with this memory-mapped file.  It is created
+        (with no keys) if it does not exist.
+    shared_memory: back the ring with the named shared memory block,
+        creating it (with no keys) if it does not exist.  Call
+        `unlink()` from one process when the ring is no longer needed.
+    backend, tile_blocks, max_memory: as for `AES`.
+
+    Example
+    -------
+    >>> ring = Keyring(10_000, shared_memory="tenant-keys")
+    >>> ring.insert(tenant_ids, tenant_keys)  # once, in any one process
+    >>> ring.cipher(42).encrypt(data, mode="ctr", iv=iv)  # in every worker
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        key_bytes: int = 16,
+        *,
+        path: str | os.PathLike[str] | None = None,
+        shared_memory: str | None = None,
+        backend: str = "auto",
+        tile_blocks: int | None = None,
+        max_memory: int | None = None,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError(f"`capacity` must be at least 1, not {capacity}")
+        if key_bytes not in ALLOWED_KEYLENGTH_BYTES:
+            raise ValueError(f"`key_bytes` must be 16, 24, or 32, not {key_bytes}")
+        if path is not None and shared_memory is not None:
+            raise ValueError("Pass at most one of `path` and `shared_memory`")
+        if backend != "auto":
+            _engine(0, backend)  # Raises early on an unknown name
+        self.capacity = capacity
+        self.key_bytes = key_bytes
+        self.backend = backend
+        self.tile_blocks = _tile_blocks(tile_blocks, max_memory)
+        nrounds = key_bytes // 4 + 6
+        schedule_bytes = 16 * (nrounds + 1)
+        size = _HEADER.size + capacity * (schedule_bytes + 1)
+        header = _HEADER.pack(_MAGIC, _VERSION, key_bytes, capacity)
+        self.closed = False
+        self._shm: shm.SharedMemory | None = None
+        if shared_memory is not None:
+            block, created = _open_shared(shared_memory, size)
+            self._shm = block
+            try:
+                if not created:
+                    self._check_header(
+                        np.ndarray((_HEADER.size,), dtype=uint8, buffer=block.buf).tobytes(),
+                        f"Shared memory {shared_memory!r}",
+                    )
+                # The OS may round the block up to a whole number of pages
+                if block.size < size:
+                    raise ValueError(
+                        f"Shared memory {shared_memory!r} is too small for this keyring"
+                    )
+            except ValueError:
+                block.close()
+                raise
+            buf = np.ndarray((size,), dtype=uint8, buffer=block.buf)
+        elif path is not None:
+            file = Path(path)
+            exists = file.exists()
+            if exists:
+                with file.open("rb") as f:
+                    self._check_header(f.read(_HEADER.size), repr(os.fspath(path)))
+                if file.stat().st_size != size:
+                    raise ValueError(
+                        f"{os.fspath(path)!r} holds {file.stat().st_size} bytes;"
+                        f" this keyring needs {size}"
+                    )
+            buf = np.memmap(path, dtype=uint8, mode="r+" if exists else "w+", shape=(size,))
+            created = not exists
+        else:
+            buf = np.zeros(size, dtype=uint8)
+            created = True
+        if created:
+            buf[: _HEADER.size] = np.frombuffer(header, dtype=uint8)
+        self._buf = buf
+        body = buf[_HEADER.size :]
+        self.schedules = body[: capacity * schedule_bytes].reshape(capacity, nrounds + 1, 4, 4)
+        self._present = body[capacity * schedule_bytes :]
+
+    def _check_header(self, header: bytes, where: str) -> None:
+        """Raise ValueError unless `header` describes a ring shaped like this one."""
+        if len(header) < _HEADER.size or not header.startswith(_MAGIC):
+            raise ValueError(f"{where} is not an npaes keyring")
+        _, version, key_bytes, capacity = _HEADER.unpack(header)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported npaes keyring version {version}")
+        if (capacity, key_bytes) != (self.capacity, self.key_bytes):
+            raise ValueError(
+                f"{where} holds {capacity} keys of {key_bytes} bytes,"
+                f" not {self.capacity} of {self.key_bytes}"
+            )
+
+    def __enter__(self) -> Keyring:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._present))
+
+    def __contains__(self, key_id: int) -> bool:
+        return not self.closed and 0 <= key_id < self.capacity and bool(self._present[key_id])
+
+    def ids(self) -> np.ndarray:
+        """The key ids currently present, in increasing order."""
+        return np.flatnonzero(self._present)
+
+    def _check_ids(self, key_ids: ArrayLike) -> np.ndarray:
+        if self.closed:
+            raise ValueError("Operation on a closed keyring")
+        ids = np.asarray(key_ids)
+        if ids.dtype.kind not in "iu":
+            raise TypeError(f"Key ids must be integers, not {ids.dtype}")
+        if ids.size and (ids.min() < 0 or ids.max() >= self.capacity):
+            raise ValueError(f"Key ids must be in [0, {self.capacity})")
+        return ids
+
+    def _check_present(self, ids: np.ndarray) -> None:
+        missing = ids[self._present[ids] == 0]
+        if missing.size:
+            raise KeyError(f"Key id {int(missing.flat[0])} is not in the keyring")
+
+    def insert(self, key_ids: ArrayLike, keys: UInt8Array) -> None:
+        """Expand `keys`, shape (n, key_bytes), and store them under `key_ids`.
+
+        Existing keys with the same ids are replaced.
+        """
+        ids = self._check_ids(key_ids).reshape(-1)
+        keys = np.asarray(keys, dtype=uint8)
+        if keys.shape != (len(ids), self.key_bytes):
+            raise ValueError(
+                f"`keys` must have shape ({len(ids)}, {self.key_bytes}), not {keys.shape}"
+            )
+        if not ids.size:
+            return
+        self.schedules[ids] = key_schedules(keys)
+        self._present[ids] = 1
+
+    def evict(self, key_ids: ArrayLike) -> None:
+        """Remove `key_ids`, zeroing their schedules.  Absent ids are ignored."""
+        ids = self._check_ids(key_ids)
+        self._present[ids] = 0
+        self.schedules[ids] = 0
+
+    def schedule(self, key_id: int) -> UInt8Array:
+        """Copy of the schedule for `key_id`, shape (Nr + 1, 4, 4)."""
+        ids = self._check_ids([key_id])
+        self._check_present(ids)
+        return self.schedules[key_id].copy()
+
+    def cipher(self, key_id: int) -> AES:
+        """`AES` for `key_id`, built from the stored schedule."""
+        return AES.from_schedule(self.schedule(key_id), self.backend, tile_blocks=self.tile_blocks)
+
+    def encrypt_blocks(
+        self, key_ids: ArrayLike, blocks: UInt8Array, out: UInt8Array | None = None
+    ) -> UInt8Array:
+        """Encrypt block i of an (n, 16) array under key `key_ids[i]`.
+
+        The schedules are gathered and the engine run one tile at a
+        time.  `out` may be `blocks` itself.
+        """
+        return self._run("encrypt_blocks", key_ids, blocks, out)
+
+    def decrypt_blocks(
+        self, key_ids: ArrayLike, blocks: UInt8Array, out: UInt8Array | None = None
+    ) -> UInt8Array:
+        """Inverse of `encrypt_blocks()`."""
+        return self._run("decrypt_blocks", key_ids, blocks, out)
+
+    def _run(
+        self, op: str, key_ids: ArrayLike, blocks: UInt8Array, out: UInt8Array | None
+    ) -> UInt8Array:
+        ids = self._check_ids(key_ids)
+        if ids.shape != (len(blocks),) or blocks.ndim != 2 or blocks.shape[1] != 16:
+            raise ValueError(
+                f"`blocks` must have shape (n, 16) and `key_ids` shape (n,),"
+                f" not {blocks.shape} and {ids.shape}"
+            )
+        self._check_present(ids)
+        if out is None:
+            out = np.empty_like(blocks)
+        elif out.shape != blocks.shape:
+            raise ValueError(f"`out` must have shape {blocks.shape}, not {out.shape}")
+        tile = self.tile_blocks
+        func = getattr(_engine(min(len(blocks), tile), self.backend), op)
+        for start in range(0, len(blocks), tile):
+            part = slice(start, start + tile)
+            func(blocks[part], self.schedules[ids[part]], out=out[part])
+        return out
+
+    def close(self) -> None:
+        """Release the backing file or shared memory (the keys stay in it)."""
+        if self.closed:
+            return
+        self.closed = True
+        if isinstance(self._buf, np.memmap):
+            self._buf.flush()
+        # Views into shared memory must go before it can be closed
+        empty = np.zeros(0, dtype=uint8)
+        self._buf = self._present = empty
+        self.schedules = empty.reshape(0, *self.schedules.shape[1:])
+        if self._shm is not None:
+            self._shm.close()
+
+    def unlink(self) -> None:
+        """Close and destroy the shared memory, once every process is done with it."""
+        if self._shm is None:
+            raise ValueError("Keyring is not backed by shared memory")
+        self.close()
+        if sys.version_info < (3, 13):
+            # Balances the unregister() in `SharedMemory.unlink()`
+            resource_tracker.register(self._shm._name, "shared_memory")  # ty: ignore[unresolved-attribute]
+        self._shm.unlink()
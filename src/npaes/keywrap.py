@@ -0,0 +1,194 @@
+"""AES key wrap (RFC 3394) and key wrap with padding (RFC 5649).
+
+Wrapping an n * 8-byte key is 6 * n encryptions, each of which depends
+on the one before through the 64-bit integrity register A, so a single
+wrap is serial.  Wrapping many keys under the same key-encryption key
+is not: the `*_keys` functions take a (K, L) stack of keys and run step
+s of all K wraps as one `encrypt_blocks()` call with the KEK's cached
+schedule, i.e. 6 * n batched calls in total whatever K is.
+
+Unwrapping checks the integrity register of every key and raises
+ValueError if any of them fails, without saying which.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "unwrap_key",
+    "unwrap_key_with_padding",
+    "unwrap_keys",
+    "unwrap_keys_with_padding",
+    "wrap_key",
+    "wrap_key_with_padding",
+    "wrap_keys",
+    "wrap_keys_with_padding",
+)
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, BLOCKSIZE_BYTES, UInt8Array, _metered
+
+_SEMIBLOCK = 8
+DEFAULT_IV = bytes.fromhex("a6a6a6a6a6a6a6a6")  # RFC 3394, section 2.2.3.1
+_AIV_PREFIX = bytes.fromhex("a65959a6")  # RFC 5649, section 3
+
+
+def _t(t: int) -> UInt8Array:
+    return np.array(t, dtype=">u8").reshape(1).view(uint8)
+
+
+def _as_key_stack(keys: UInt8Array, what: str) -> UInt8Array:
+    keys = np.asarray(keys)
+    if keys.dtype != uint8 or keys.ndim != 2:
+        raise ValueError(f"`{what}` must be a (K, L) uint8 array, not {keys.dtype} {keys.shape}")
+    return keys
+
+
+def _wrap(cipher: AES, iv: UInt8Array, plain: UInt8Array) -> UInt8Array:
+    """W(S) of RFC 3394 section 2.2.1 for (K, n, 8) `plain` under (K, 8) `iv`."""
+    k, n = plain.shape[:2]
+    out = np.empty((k, n + 1, _SEMIBLOCK), dtype=uint8)
+    out[:, 1:] = plain
+    work = np.empty((k, BLOCKSIZE_BYTES), dtype=uint8)
+    work[:, :_SEMIBLOCK] = iv
+    for j in range(6):
+        for i in range(1, n + 1):
+            work[:, _SEMIBLOCK:] = out[:, i]
+            cipher.encrypt_blocks(work, out=work)
+            work[:, :_SEMIBLOCK] ^= _t(n * j + i)
+            out[:, i] = work[:, _SEMIBLOCK:]
+    out[:, 0] = work[:, :_SEMIBLOCK]
+    return out.reshape(k, -1)
+
+
+def _unwrap(cipher: AES, wrapped: UInt8Array) -> tuple[UInt8Array, UInt8Array]:
+    """W^-1(C): the recovered integrity registers (K, 8) and keys (K, n * 8)."""
+    k = len(wrapped)
+    n = wrapped.shape[1] // _SEMIBLOCK - 1
+    plain = wrapped.reshape(k, n + 1, _SEMIBLOCK)[:, 1:].copy()
+    work = np.empty((k, BLOCKSIZE_BYTES), dtype=uint8)
+    work[:, :_SEMIBLOCK] = wrapped[:, :_SEMIBLOCK]
+    for j in reversed(range(6)):
+        for i in reversed(range(1, n + 1)):
+            work[:, :_SEMIBLOCK] ^= _t(n * j + i)
+            work[:, _SEMIBLOCK:] = plain[:, i - 1]
+            cipher.decrypt_blocks(work, out=work)
+            plain[:, i - 1] = work[:, _SEMIBLOCK:]
+    return work[:, :_SEMIBLOCK], plain.reshape(k, -1)
+
+
+def _one(b: bytes, what: str) -> UInt8Array:
+    if not isinstance(b, bytes):
+        raise TypeError(f"`{what}` must be bytes, not {type(b)}")
+    return np.frombuffer(b, dtype=uint8)[None]
+
+
+def _check_integrity(ok: np.ndarray) -> None:
+    if not ok.all():
+        bad = np.count_nonzero(~ok)
+        raise ValueError(f"Key unwrap integrity check failed ({bad} of {len(ok)} keys)")
+
+
+@_metered("keywrap.wrap_keys", "kw")
+def wrap_keys(cipher: AES, keys: UInt8Array) -> UInt8Array:
+    """Wrap a (K, L) uint8 stack of keys under `cipher`'s key (RFC 3394).
+
+    L must be a multiple of 8 and at least 16.  Returns (K, L + 8).
+    """
+    keys = _as_key_stack(keys, "keys")
+    if keys.shape[1] < 2 * _SEMIBLOCK or keys.shape[1] % _SEMIBLOCK:
+        raise ValueError(f"Key length must be a multiple of 8 and at least 16, not {keys.shape[1]}")
+    if not len(keys):
+        return np.empty((0, keys.shape[1] + _SEMIBLOCK), dtype=uint8)
+    iv = np.frombuffer(DEFAULT_IV, dtype=uint8)
+    return _wrap(cipher, iv, keys.reshape(len(keys), -1, _SEMIBLOCK))
+
+
+@_metered("keywrap.unwrap_keys", "kw")
+def unwrap_keys(cipher: AES, wrapped: UInt8Array) -> UInt8Array:
+    """Inverse of `wrap_keys()`: (K, L + 8) to (K, L)."""
+    wrapped = _as_key_stack(wrapped, "wrapped")
+    if wrapped.shape[1] < 3 * _SEMIBLOCK or wrapped.shape[1] % _SEMIBLOCK:
+        raise ValueError(
+            f"Wrapped length must be a multiple of 8 and at least 24, not {wrapped.shape[1]}"
+        )
+    if not len(wrapped):
+        return np.empty((0, wrapped.shape[1] - _SEMIBLOCK), dtype=uint8)
+    a, plain = _unwrap(cipher, wrapped)
+    _check_integrity((a == np.frombuffer(DEFAULT_IV, dtype=uint8)).all(axis=1))
+    return plain
+
+
+@_metered("keywrap.wrap_keys_with_padding", "kwp")
+def wrap_keys_with_padding(cipher: AES, keys: UInt8Array) -> UInt8Array:
+    """Wrap a (K, L) uint8 stack of keys of any length L >= 1 (RFC 5649)."""
+    keys = _as_key_stack(keys, "keys")
+    k, length = keys.shape
+    if not 1 <= length < 2**32:
+        raise ValueError(f"Key length must be between 1 and 2**32 - 1 bytes, not {length}")
+    n = -(-length // _SEMIBLOCK)
+    aiv = np.frombuffer(_AIV_PREFIX + length.to_bytes(4, "big"), dtype=uint8)
+    padded = np.zeros((k, n * _SEMIBLOCK), dtype=uint8)
+    padded[:, :length] = keys
+    if n == 1:
+        # A single semiblock is one ECB encryption of AIV | P
+        block = np.empty((k, BLOCKSIZE_BYTES), dtype=uint8)
+        block[:, :_SEMIBLOCK] = aiv
+        block[:, _SEMIBLOCK:] = padded
+        return cipher.encrypt_blocks(block, out=block)
+    return _wrap(cipher, aiv, padded.reshape(k, n, _SEMIBLOCK))
+
+
+@_metered("keywrap.unwrap_keys_with_padding", "kwp")
+def unwrap_keys_with_padding(
+    cipher: AES, wrapped: UInt8Array, length: int | None = None
+) -> UInt8Array:
+    """Inverse of `wrap_keys_with_padding()`.
+
+    Every key in the stack must have the same length, which is read
+    from the first key's integrity register unless given as `length`.
+    """
+    wrapped = _as_key_stack(wrapped, "wrapped")
+    k, size = wrapped.shape
+    if size < 2 * _SEMIBLOCK or size % _SEMIBLOCK:
+        raise ValueError(f"Wrapped length must be a multiple of 8 and at least 16, not {size}")
+    if size == BLOCKSIZE_BYTES:
+        block = cipher.decrypt_blocks(wrapped)
+        a, padded = block[:, :_SEMIBLOCK], block[:, _SEMIBLOCK:]
+    else:
+        a, padded = _unwrap(cipher, wrapped)
+    mli = a[:, 4:].copy().view(">u4").reshape(-1).astype(np.intp)
+    if length is None:
+        length = int(mli[0]) if k else 0
+    n = padded.shape[1] // _SEMIBLOCK
+    ok = (a[:, :4] == np.frombuffer(_AIV_PREFIX, dtype=uint8)).all(axis=1)
+    ok &= (mli == length) & (_SEMIBLOCK * (n - 1) < length) & (length <= _SEMIBLOCK * n)
+    if ok.all():
+        ok &= (padded[:, length:] == 0).all(axis=1)
+    _check_integrity(ok)
+    return padded[:, :length]
+
+
+@_metered("keywrap.wrap_key", "kw")
+def wrap_key(cipher: AES, key: bytes) -> bytes:
+    """Wrap one key under `cipher`'s key (RFC 3394)."""
+    return wrap_keys(cipher, _one(key, "key")).tobytes()
+
+
+@_metered("keywrap.unwrap_key", "kw")
+def unwrap_key(cipher: AES, wrapped: bytes) -> bytes:
+    """Unwrap one RFC 3394 wrapped key."""
+    return unwrap_keys(cipher, _one(wrapped, "wrapped")).tobytes()
+
+
+@_metered("keywrap.wrap_key_with_padding", "kwp")
+def wrap_key_with_padding(cipher: AES, key: bytes) -> bytes:
+    """Wrap one key of any length under `cipher`'s key (RFC 5649)."""
+    return wrap_keys_with_padding(cipher, _one(key, "key")).tobytes()
+
+
+@_metered("keywrap.unwrap_key_with_padding", "kwp")
+def unwrap_key_with_padding(cipher: AES, wrapped: bytes) -> bytes:
+    """Unwrap one RFC 5649 wrapped key."""
+    return unwrap_keys_with_padding(cipher, _one(wrapped, "wrapped")).tobytes()
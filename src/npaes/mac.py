@@ -0,0 +1,148 @@
+"""AES-CMAC (NIST SP 800-38B, RFC 4493).
+
+CMAC is CBC-MAC with a zero IV, where the final block is first XORed
+with one of two subkeys: K1 if the message fills its last block, or K2
+if the last block had to be completed with 10* padding.  The subkeys
+are derived from the encryption of the zero block and are kept on the
+`AES` instance, so they are computed once per key.
+
+Within one message the chain is serial: block i cannot be encrypted
+before block i - 1.  Across independent messages it is not, so
+`cmac_batch()` runs step i of every message that has an i-th block as
+one `encrypt_blocks()` call: m messages of at most n blocks take n
+batched calls rather than m * n single-block ones.  The same chaining
+core serves CCM's CBC-MAC and GCM's GHASH in `npaes.aead`.
+"""
+
+from __future__ import annotations
+
+__all__ = ("cmac", "cmac_batch", "cmac_subkeys", "cmac_verify")
+
+import hmac
+from collections.abc import Callable, Sequence
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES, BLOCKSIZE_BYTES, UInt8Array, _metered
+from npaes.ragged import run_starts, scatter_runs
+
+_RB = 0x87  # x^7 + x^2 + x + 1, for the 128-bit block size
+_MASK128 = (1 << 128) - 1
+
+
+def _double(block: int) -> int:
+    out = (block << 1) & _MASK128
+    return out ^ _RB if block >> 127 else out
+
+
+def _double_blocks(blocks: UInt8Array) -> UInt8Array:
+    """`_double()` of each row of an (m, 16) array."""
+    words = blocks.view(">u8")
+    hi, lo = words[:, 0], words[:, 1]
+    out = np.empty_like(words)
+    out[:, 0] = hi << np.uint64(1) | lo >> np.uint64(63)
+    out[:, 1] = lo << np.uint64(1) ^ (hi >> np.uint64(63)) * np.uint64(_RB)
+    return out.view(uint8)
+
+
+def cmac_subkeys(cipher: AES) -> UInt8Array:
+    """The CMAC subkeys K1 and K2 for `cipher`'s key, shape (2, 16).
+
+    Computed on first use and cached on `cipher`.
+    """
+    subkeys = cipher._derived.get("cmac")
+    if subkeys is None:
+        zero = np.zeros((1, BLOCKSIZE_BYTES), dtype=uint8)
+        k1 = _double(int.from_bytes(cipher.encrypt_blocks(zero).tobytes(), "big"))
+        k2 = _double(k1)
+        raw = k1.to_bytes(BLOCKSIZE_BYTES, "big") + k2.to_bytes(BLOCKSIZE_BYTES, "big")
+        subkeys = np.frombuffer(raw, dtype=uint8).reshape(2, BLOCKSIZE_BYTES)
+        cipher._derived["cmac"] = subkeys
+    return subkeys
+
+
+def _chain(
+    blocks: UInt8Array,
+    starts: np.ndarray,
+    nblocks: np.ndarray,
+    step: Callable[[UInt8Array], object],
+) -> UInt8Array:
+    """Run X_j = step(X_{j-1} ^ B_j), X_0 = 0, over many block runs.
+
+    Chain i covers blocks[starts[i] : starts[i] + nblocks[i]]; each has
+    at least one block.  `step` transforms an (k, 16) array in place.
+    The chains are sorted longest first, so those still running at step
+    j are state[:active[j]], and step j of all of them is one call.
+    Returns the final X of each chain, shape (len(starts), 16).
+    """
+    m = len(starts)
+    order = np.argsort(-nblocks, kind="stable")
+    sorted_starts = starts[order]
+    steps = np.arange(int(nblocks.max(initial=0)))
+    active = m - np.searchsorted(np.sort(nblocks), steps, side="right")
+    state = np.zeros((m, BLOCKSIZE_BYTES), dtype=uint8)
+    for j, count in enumerate(active):
+        chain = state[:count]
+        chain ^= blocks[sorted_starts[:count] + j]
+        step(chain)
+    out = np.empty_like(state)
+    out[order] = state
+    return out
+
+
+def _cbc_mac(
+    cipher: AES, blocks: UInt8Array, starts: np.ndarray, nblocks: np.ndarray
+) -> UInt8Array:
+    """CBC-MAC with a zero IV over many block runs (see `_chain()`)."""
+    return _chain(blocks, starts, nblocks, lambda chain: cipher.encrypt_blocks(chain, out=chain))
+
+
+def _cmac(cipher: AES, joined: UInt8Array, lengths: np.ndarray) -> UInt8Array:
+    """CMAC tags of the consecutive runs of `joined`, of `lengths` bytes."""
+    # An empty message is one padded block
+    nblocks = np.maximum(-(-lengths // BLOCKSIZE_BYTES), 1)
+    starts = run_starts(nblocks)
+
+    # Lay the messages out block-aligned in one buffer: message i fills
+    # blocks [starts[i], starts[i] + nblocks[i])
+    blocks = np.zeros((int(nblocks.sum()), BLOCKSIZE_BYTES), dtype=uint8)
+    flat = blocks.reshape(-1)
+    scatter_runs(flat, starts * BLOCKSIZE_BYTES, joined, lengths)
+
+    # 10* padding and the subkey on each final block
+    complete = (lengths > 0) & (lengths % BLOCKSIZE_BYTES == 0)
+    partial = np.flatnonzero(~complete)
+    flat[starts[partial] * BLOCKSIZE_BYTES + lengths[partial]] = 0x80
+    last = starts + nblocks - 1
+    blocks[last] ^= cmac_subkeys(cipher)[np.where(complete, 0, 1)]
+    return _cbc_mac(cipher, blocks, starts, nblocks)
+
+
+@_metered("mac.cmac_batch", "cmac")
+def cmac_batch(cipher: AES, messages: Sequence[bytes]) -> UInt8Array:
+    """CMAC tags of many independent messages, shape (len(messages), 16).
+
+    Row i is the tag of messages[i].  The messages may have any lengths.
+    """
+    lengths = np.fromiter(map(len, messages), dtype=np.intp, count=len(messages))
+    return _cmac(cipher, np.frombuffer(b"".join(messages), dtype=uint8), lengths)
+
+
+@_metered("mac.cmac", "cmac")
+def cmac(cipher: AES, message: bytes) -> bytes:
+    """The 16-byte CMAC tag of `message`."""
+    if not isinstance(message, bytes):
+        raise TypeError(f"`message` must be bytes, not {type(message)}")
+    return cmac_batch(cipher, [message])[0].tobytes()
+
+
+def cmac_verify(cipher: AES, message: bytes, tag: bytes) -> bool:
+    """Whether `tag` is the CMAC of `message`, compared in constant time.
+
+    `tag` may be the full tag truncated to its leading bytes, down to
+    the 8 that SP 800-38B recommends as a minimum for most uses.
+    """
+    if not 8 <= len(tag) <= BLOCKSIZE_BYTES:
+        raise ValueError(f"len(tag) must be between 8 and 16 bytes, not {len(tag)}")
+    return hmac.compare_digest(cmac(cipher, message)[: len(tag)], tag)
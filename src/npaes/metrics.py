@@ -0,0 +1,154 @@
+"""Opt-in counters and latency histograms for npaes's entry points.
+
+Metering is off by default.  While it is off, each metered call costs
+one check of a module global and nothing is recorded, so it can stay
+in production code and be turned on when you need to see where the
+crypto CPU goes:
+
+    >>> from npaes import metrics
+    >>> metrics.enable()
+    >>> ...
+    >>> metrics.snapshot()["series"]
+    [{'entry': 'AES.encrypt', 'mode': 'ctr', 'backend': 'auto', 'key_bits': 128,
+      'calls': 3, 'blocks': 192, 'bytes': 3072, ...}, ...]
+
+Each series is one combination of entry point, mode, backend and key
+size, and holds the number of calls, blocks and bytes, cumulative wall
+and CPU (calling thread) time, and a histogram of call latencies.  The
+metered entry points are `AES.encrypt`/`AES.decrypt`, the public modes
+in `npaes.modes` (CTR, CFB, OFB and XTS), CCM, GCM and SIV in
+`npaes.aead`, CMAC in `npaes.mac`, key wrapping in `npaes.keywrap`,
+`encrypt_array`/`decrypt_array`, the offloaded path of `npaes.aio`
+(as `aio.encrypt`/`aio.decrypt`, with wall time only), and
+`AES.encrypt_blocks`/`AES.decrypt_blocks`.  The last pair is where the engine runs, and is
+the only one whose `backend` is the engine actually used rather than
+the one requested (often "auto").  Entry points nest (`AES.encrypt` in
+CTR mode calls `modes.ctr_xor`, which calls `AES.encrypt_blocks`, and
+`aead.gcm_encrypt` calls `aead.gcm_encrypt_batch`), so add up series
+of one level only.
+
+`snapshot()` returns plain dicts and lists, ready to hand to a
+Prometheus (or any other) exporter.  The histogram buckets are
+cumulative, as in Prometheus, keyed by upper bound in seconds.
+"""
+
+from __future__ import annotations
+
+__all__ = ("LATENCY_BUCKETS", "Registry", "disable", "enable", "is_enabled", "reset", "snapshot")
+
+import bisect
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+import npaes
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (1e-5, 3e-5, 1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 0.1, 0.3, 1.0, 3.0, 10.0)
+
+_LABELS = ("entry", "mode", "backend", "key_bits")
+
+
+class _Series:
+    __slots__ = ("blocks", "buckets", "bytes", "calls", "cpu", "wall")
+
+    def __init__(self) -> None:
+        self.calls = self.blocks = self.bytes = 0
+        self.wall = self.cpu = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+
+class Registry:
+    """Thread-safe store of metering series, keyed by label tuple."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str, str, int], _Series] = {}
+
+    def call(
+        self,
+        labels: tuple[str, str, str, int],
+        nbytes: int,
+        func: Callable[..., Any],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """Run func(*args, **kwargs) and record it under `labels`."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.record(labels, nbytes, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def record(
+        self, labels: tuple[str, str, str, int], nbytes: int, wall: float, cpu: float
+    ) -> None:
+        """Add one call of `nbytes` bytes that took `wall`/`cpu` seconds."""
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, wall)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = _Series()
+            series.calls += 1
+            series.blocks += -(-nbytes // npaes.BLOCKSIZE_BYTES)
+            series.bytes += nbytes
+            series.wall += wall
+            series.cpu += cpu
+            series.buckets[bucket] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """Copy of every series as plain dicts."""
+        bounds = [f"{b:g}" for b in LATENCY_BUCKETS] + ["+Inf"]
+        out = []
+        with self._lock:
+            for labels, s in sorted(self._series.items()):
+                cumulative, total = {}, 0
+                for bound, count in zip(bounds, s.buckets, strict=True):
+                    total += count
+                    cumulative[bound] = total
+                out.append(
+                    {
+                        **dict(zip(_LABELS, labels, strict=True)),
+                        "calls": s.calls,
+                        "blocks": s.blocks,
+                        "bytes": s.bytes,
+                        "wall_seconds": s.wall,
+                        "cpu_seconds": s.cpu,
+                        "latency_seconds": cumulative,
+                    }
+                )
+        return {"enabled": is_enabled(), "series": out}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+_registry = Registry()
+
+
+def enable() -> None:
+    """Start recording metered calls."""
+    npaes._metrics = _registry
+
+
+def disable() -> None:
+    """Stop recording.  What has been recorded is kept until `reset()`."""
+    npaes._metrics = None
+
+
+def is_enabled() -> bool:
+    return npaes._metrics is not None
+
+
+def snapshot() -> dict[str, Any]:
+    """Everything recorded so far: {"enabled": bool, "series": [dict, ...]}."""
+    return _registry.snapshot()
+
+
+def reset() -> None:
+    """Discard everything recorded so far."""
+    _registry.reset()
@@ -0,0 +1,472 @@
+"""Block cipher modes of operation, built on `AES.encrypt_blocks()`.
+
+CTR (NIST SP 800-38A, section 6.5): the 16-byte `iv` is the initial
+counter block, and block i of the keystream is the encryption of
+(iv + i) mod 2^128, with the counter block read as a big-endian
+integer.  Because block i depends only on i, any byte range of the
+stream can be produced directly: `ctr_xor(cipher, data, iv, offset)`
+computes just the counter blocks covering [offset, offset + len(data)).
+Encryption and decryption are the same operation.  `ctr_xor_batch()`
+does the same for many messages at once, each with its own initial
+counter block, stored back to back with Arrow-style offsets (see
+`npaes.ragged`): the counter blocks of every message are generated in
+one vectorized step and encrypted in one call.
+
+CFB-128 and OFB (SP 800-38A, sections 6.3 and 6.4): both feed the
+previous output block back into the cipher, so encryption is a serial
+chain of single-block calls.  CFB decryption is not: every cipher input
+(the IV, then ciphertext blocks 0 .. n - 2) is already known, so
+`cfb_decrypt()` encrypts them all in one batched call.  The OFB
+keystream depends only on the key and IV, so `OFBKeystream` can build
+it before the data arrives -- on demand, with `precompute()` at a
+convenient time, or in a background thread -- after which encrypting
+or decrypting is a single XOR.  As with CTR, a final partial block just
+uses the leading bytes of its keystream block.
+
+XTS (IEEE 1619, NIST SP 800-38E): `XTS` encrypts fixed-size data units
+("sectors") with two keys.  The sector number, as a 128-bit
+little-endian integer, is encrypted under the second key to give the
+tweak T for block 0; block j uses T * alpha^j in GF(2^128).  Rather than
+stepping through j one block at a time, `xts_tweaks()` fills the tweak
+table by doubling: once blocks [0, k) are known for every sector, blocks
+[k, 2k) are those times alpha^k, which is a shift of the 128-bit value
+plus an XOR of the bits shifted out (times x^7 + x^2 + x + 1) -- one
+vectorized step over all sectors.  A 4 KiB sector takes 8 such steps.
+The cipher itself then runs over every block of every sector in one
+call.  A sector whose size is not a multiple of 16 bytes uses
+ciphertext stealing for its last two blocks.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "XTS",
+    "OFBKeystream",
+    "cfb_decrypt",
+    "cfb_encrypt",
+    "counter_blocks",
+    "ctr_keystream",
+    "ctr_xor",
+    "ctr_xor_batch",
+    "ofb_keystream",
+    "ofb_xor",
+    "xts_tweaks",
+)
+
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+
+import numpy as np
+from numpy import bitwise_xor as xor
+from numpy import uint8, uint64
+
+from npaes import AES, BLOCKSIZE_BYTES, UInt8Array, _metered
+from npaes.ragged import check_offsets, gather_runs, run_starts
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from numpy.typing import ArrayLike
+    from typing_extensions import Buffer
+
+_MASK64 = (1 << 64) - 1
+
+
+def _check_iv(iv: bytes) -> None:
+    if not isinstance(iv, bytes):
+        raise TypeError(f"`iv` must be bytes, not {type(iv)}")
+    if len(iv) != BLOCKSIZE_BYTES:
+        raise ValueError(f"len(iv) must be 16 bytes, not {len(iv)}")
+
+
+def counter_blocks(iv: bytes, start: int, nblocks: int) -> UInt8Array:
+    """Counter blocks iv + start, ..., iv + start + nblocks - 1, shape (nblocks, 16).
+
+    The 128-bit addition is done as two 64-bit halves, with the carry
+    out of the low half detected by unsigned wraparound.
+    """
+    _check_iv(iv)
+    base = (int.from_bytes(iv, "big") + start) & ((1 << 128) - 1)
+    hi, lo = base >> 64, base & _MASK64
+    low = np.arange(nblocks, dtype=uint64)
+    low += uint64(lo)  # Wraps mod 2^64
+    out = np.empty((nblocks, 2), dtype=">u8")
+    out[:, 1] = low
+    out[:, 0] = uint64(hi)
+    out[:, 0] += low < uint64(lo)  # Carry into the high half
+    return out.view(uint8)
+
+
+def ctr_keystream(cipher: AES, iv: bytes, start: int, nblocks: int) -> UInt8Array:
+    """Keystream blocks start, ..., start + nblocks - 1, shape (nblocks, 16)."""
+    blocks = counter_blocks(iv, start, nblocks)
+    return cipher.encrypt_blocks(blocks, out=blocks)
+
+
+@_metered("modes.ctr_xor", "ctr")
+def ctr_xor(cipher: AES, data: Buffer, iv: bytes, offset: int = 0) -> UInt8Array:
+    """XOR `data` with the CTR keystream starting at byte `offset`.
+
+    Returns a 1d uint8 array of len(data) bytes.  Only the keystream
+    blocks overlapping [offset, offset + len(data)) are computed, and
+    the result is written over that keystream buffer rather than into a
+    new one.
+    """
+    src = np.frombuffer(memoryview(data), dtype=uint8)
+    first, skip = divmod(offset, BLOCKSIZE_BYTES)
+    nblocks = -(-(skip + src.size) // BLOCKSIZE_BYTES)
+    stream = ctr_keystream(cipher, iv, first, nblocks).reshape(-1)[skip : skip + src.size]
+    return xor(stream, src, out=stream)
+
+
+def _ragged_counter_blocks(ivs: UInt8Array, nblocks: np.ndarray) -> UInt8Array:
+    """Counter blocks ivs[i] + j, j < nblocks[i], for every i, shape (sum(nblocks), 16)."""
+    total = int(nblocks.sum())
+    words = np.ascontiguousarray(ivs).view(">u8")
+    low = np.repeat(words[:, 1], nblocks)
+    start = low.copy()
+    low += (np.arange(total) - np.repeat(run_starts(nblocks), nblocks)).astype(uint64)
+    out = np.empty((total, 2), dtype=">u8")
+    out[:, 1] = low
+    out[:, 0] = np.repeat(words[:, 0], nblocks)
+    out[:, 0] += low < start  # Carry into the high half
+    return out.view(uint8)
+
+
+@_metered("modes.ctr_xor_batch", "ctr")
+def ctr_xor_batch(cipher: AES, data: Buffer, offsets: ArrayLike, ivs: UInt8Array) -> UInt8Array:
+    """CTR-mode XOR of many messages stored back to back.
+
+    Message i is data[offsets[i] : offsets[i + 1]] and starts from the
+    initial counter block ivs[i]; `ivs` has shape (m, 16) for m + 1
+    offsets.  Returns one uint8 array of len(data) bytes laid out with
+    the same offsets.
+    """
+    src = np.frombuffer(memoryview(data), dtype=uint8)
+    lengths = check_offsets(offsets, src.size)
+    ivs = np.asarray(ivs)
+    if ivs.dtype != uint8 or ivs.shape != (len(lengths), BLOCKSIZE_BYTES):
+        raise ValueError(
+            f"`ivs` must be a ({len(lengths)}, 16) uint8 array, not {ivs.dtype} {ivs.shape}"
+        )
+    nblocks = -(-lengths // BLOCKSIZE_BYTES)
+    blocks = _ragged_counter_blocks(ivs, nblocks)
+    stream = cipher.encrypt_blocks(blocks, out=blocks).reshape(-1)
+    out = gather_runs(stream, run_starts(nblocks) * BLOCKSIZE_BYTES, lengths)
+    return xor(out, src, out=out)
+
+
+# ---------------------------------------------------------------------
+# CFB and OFB
+
+
+def _blocks_of(data: Buffer) -> tuple[UInt8Array, UInt8Array]:
+    """`data` as a 1d uint8 array, and its whole blocks as an (n, 16) view.
+
+    The view includes a final partial block, zero-padded in a copy.
+    """
+    src = np.frombuffer(memoryview(data), dtype=uint8)
+    if src.size % BLOCKSIZE_BYTES:
+        padded = np.zeros(-(-src.size // BLOCKSIZE_BYTES) * BLOCKSIZE_BYTES, dtype=uint8)
+        padded[: src.size] = src
+        return src, padded.reshape(-1, BLOCKSIZE_BYTES)
+    return src, src.reshape(-1, BLOCKSIZE_BYTES)
+
+
+@_metered("modes.cfb_encrypt", "cfb")
+def cfb_encrypt(cipher: AES, data: Buffer, iv: bytes) -> UInt8Array:
+    """CFB-128 encryption of `data` (any length), as a 1d uint8 array."""
+    _check_iv(iv)
+    src, blocks = _blocks_of(data)
+    out = np.empty_like(blocks)
+    feedback = np.frombuffer(iv, dtype=uint8).reshape(1, BLOCKSIZE_BYTES)
+    for i in range(len(blocks)):
+        feedback = xor(cipher.encrypt_blocks(feedback), blocks[i], out=out[i : i + 1])
+    return out.reshape(-1)[: src.size]
+
+
+@_metered("modes.cfb_decrypt", "cfb")
+def cfb_decrypt(cipher: AES, data: Buffer, iv: bytes) -> UInt8Array:
+    """CFB-128 decryption, with all block encryptions in one batched call."""
+    _check_iv(iv)
+    src, blocks = _blocks_of(data)
+    inputs = np.empty_like(blocks)
+    if len(blocks):
+        inputs[0] = np.frombuffer(iv, dtype=uint8)
+        inputs[1:] = blocks[:-1]
+    stream = cipher.encrypt_blocks(inputs, out=inputs).reshape(-1)[: src.size]
+    return xor(stream, src, out=stream)
+
+
+def ofb_keystream(cipher: AES, iv: bytes, nblocks: int) -> UInt8Array:
+    """The first `nblocks` OFB output blocks, shape (nblocks, 16)."""
+    _check_iv(iv)
+    return _ofb_chain(cipher, np.frombuffer(iv, dtype=uint8).reshape(1, BLOCKSIZE_BYTES), nblocks)
+
+
+def _ofb_chain(cipher: AES, block: UInt8Array, nblocks: int) -> UInt8Array:
+    """`nblocks` successive encryptions of `block`, a (1, 16) array."""
+    out = np.empty((nblocks, BLOCKSIZE_BYTES), dtype=uint8)
+    for i in range(nblocks):
+        block = cipher.encrypt_blocks(block, out=out[i : i + 1])
+    return out
+
+
+@_metered("modes.ofb_xor", "ofb")
+def ofb_xor(cipher: AES, data: Buffer, iv: bytes) -> UInt8Array:
+    """OFB encryption or decryption of `data` (the same operation)."""
+    src = np.frombuffer(memoryview(data), dtype=uint8)
+    stream = ofb_keystream(cipher, iv, -(-src.size // BLOCKSIZE_BYTES)).reshape(-1)[: src.size]
+    return xor(stream, src, out=stream)
+
+
+class OFBKeystream:
+    """The OFB keystream for one (key, IV), generated ahead of the data.
+
+    `xor()` consumes the keystream in order, so successive calls
+    encrypt (or decrypt) consecutive pieces of one message.  Keystream
+    comes from a buffer that is filled
+
+    - on demand, by `xor()` itself, if nothing is buffered;
+    - by `precompute(nbytes)`, e.g. while waiting for input; or
+    - with `background=True`, by a daemon thread that keeps up to
+      `ahead` bytes ready.  Call `close()` (or use a `with` block) to
+      stop it.
+
+    Producing OFB output is a chain of single-block encryptions and so
+    mostly holds the GIL; the thread helps when the data path would
+    otherwise sit idle (waiting on I/O, say), not by adding throughput.
+
+    Example
+    -------
+    >>> with OFBKeystream(AES(key), iv, background=True) as ofb:
+    ...     ct1 = ofb.xor(packet1)  # keystream already computed
+    ...     ct2 = ofb.xor(packet2)
+    """
+
+    chunk_blocks = 64
+
+    def __init__(
+        self, cipher: AES, iv: bytes, *, ahead: int = 1 << 16, background: bool = False
+    ) -> None:
+        _check_iv(iv)
+        if ahead < BLOCKSIZE_BYTES:
+            raise ValueError(f"`ahead` must be at least 16 bytes, not {ahead}")
+        self.cipher = cipher
+        self.ahead = ahead
+        self._last = np.frombuffer(iv, dtype=uint8).reshape(1, BLOCKSIZE_BYTES)
+        self._chunks: deque[UInt8Array] = deque()
+        self._buffered = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        if background:
+            self._thread = threading.Thread(target=self._fill, name="npaes-ofb", daemon=True)
+            self._thread.start()
+
+    def __enter__(self) -> OFBKeystream:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def buffered(self) -> int:
+        """Bytes of keystream computed and not yet used."""
+        return self._buffered
+
+    def _generate(self, nblocks: int) -> None:
+        """Append `nblocks` keystream blocks.  Only one thread calls this."""
+        chunk = _ofb_chain(self.cipher, self._last, nblocks)
+        self._last = chunk[-1:]
+        with self._cond:
+            self._chunks.append(chunk.reshape(-1))
+            self._buffered += chunk.size
+            self._cond.notify_all()
+
+    def _fill(self) -> None:
+        while True:
+            with self._cond:
+                while self._buffered >= self.ahead and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            self._generate(self.chunk_blocks)
+
+    def precompute(self, nbytes: int) -> None:
+        """Compute keystream now until at least `nbytes` are buffered."""
+        if self._thread is not None:
+            raise ValueError("precompute() is not used with background=True")
+        missing = nbytes - self._buffered
+        if missing > 0:
+            self._generate(-(-missing // BLOCKSIZE_BYTES))
+
+    def xor(self, data: Buffer) -> bytes:
+        """XOR `data` with the next len(data) bytes of keystream."""
+        src = np.frombuffer(memoryview(data), dtype=uint8)
+        out = np.empty_like(src)
+        filled = 0
+        while filled < src.size:
+            if self._thread is None and not self._chunks:
+                self.precompute(src.size - filled)
+            with self._cond:
+                while not self._chunks:
+                    if self._closed:
+                        raise ValueError("OFBKeystream is closed")
+                    self._cond.wait()
+                chunk = self._chunks[0]
+                take = min(src.size - filled, chunk.size)
+                xor(chunk[:take], src[filled : filled + take], out=out[filled : filled + take])
+                if take == chunk.size:
+                    self._chunks.popleft()
+                else:
+                    self._chunks[0] = chunk[take:]
+                self._buffered -= take
+                filled += take
+                self._cond.notify_all()
+        return out.tobytes()
+
+    def close(self) -> None:
+        """Stop the background thread, if any."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# ---------------------------------------------------------------------
+# XTS
+
+
+def _mul_alpha_pow(words: np.ndarray, s: int) -> np.ndarray:
+    """Multiply 128-bit little-endian values, (..., 2) uint64, by alpha^s.
+
+    `s` is at most 32 here (57 would do), so the reduction of the s bits shifted out of the
+    top (times x^7 + x^2 + x + 1) fits in the low word.
+    """
+    lo, hi = words[..., 0], words[..., 1]
+    s64, r64 = uint64(s), uint64(64 - s)
+    carry = hi >> r64
+    out = np.empty_like(words)
+    out[..., 1] = hi << s64 | lo >> r64
+    out[..., 0] = lo << s64 ^ carry ^ carry << uint64(1) ^ carry << uint64(2) ^ carry << uint64(7)
+    return out
+
+
+def xts_tweaks(tweak_cipher: AES, first_sector: int, nsectors: int, nblocks: int) -> UInt8Array:
+    """Per-block tweaks for consecutive sectors, shape (nsectors, nblocks, 16).
+
+    Sector numbers are 128-bit, so [first_sector, first_sector + nsectors)
+    must lie in [0, 2**128).
+    """
+    if first_sector < 0 or first_sector + nsectors > 1 << 128:
+        raise ValueError(
+            f"XTS sector numbers must be in [0, 2**128), not {first_sector}"
+            f" to {first_sector + nsectors - 1}"
+        )
+    lo, hi = first_sector & 0xFFFF_FFFF_FFFF_FFFF, first_sector >> 64
+    sectors = np.empty((nsectors, 2), dtype="<u8")
+    # The low words wrap modulo 2**64; each that did carries into its high word
+    sectors[:, 0] = np.arange(nsectors, dtype=uint64) + uint64(lo)
+    sectors[:, 1] = uint64(hi)
+    sectors[:, 1] += sectors[:, 0] < uint64(lo)
+    t0 = tweak_cipher.encrypt_blocks(sectors.view(uint8))
+    table = np.empty((nsectors, nblocks, 2), dtype="<u8")
+    table[:, 0] = t0.view("<u8")
+    filled = 1
+    while filled < nblocks:
+        step = min(filled, nblocks - filled)
+        block = table[:, :step]
+        for s in [32] * (filled // 32) + [filled % 32]:
+            if s:
+                block = _mul_alpha_pow(block, s)
+        table[:, filled : filled + step] = block
+        filled += step
+    return table.view(uint8).reshape(nsectors, nblocks, BLOCKSIZE_BYTES)
+
+
+def _xex(func: Callable[..., UInt8Array], blocks: UInt8Array, tweaks: UInt8Array) -> UInt8Array:
+    """func(blocks ^ tweaks) ^ tweaks over (n, 16) arrays, via one buffer."""
+    work = xor(blocks, tweaks)
+    func(work, out=work)
+    return xor(work, tweaks, out=work)
+
+
+class XTS:
+    """AES-XTS over fixed-size data units.
+
+    `key` is 32 bytes (AES-128-XTS) or 64 bytes (AES-256-XTS): the data
+    key followed by the tweak key, which must differ.  A data unit is at
+    least 16 bytes and need not be a multiple of 16.
+    """
+
+    def __init__(self, key: bytes, backend: str = "auto") -> None:
+        if not isinstance(key, bytes):
+            raise TypeError(f"`key` must be bytes, not {type(key)}")
+        if len(key) not in (32, 64):
+            raise ValueError(f"len(key) must be 32 or 64 bytes, not {len(key)}")
+        half = len(key) // 2
+        if key[:half] == key[half:]:
+            raise ValueError("The data and tweak halves of an XTS key must differ")
+        self.data_cipher = AES(key[:half], backend=backend)
+        self.tweak_cipher = AES(key[half:], backend=backend)
+
+    def encrypt(self, data: bytes, sector: int) -> bytes:
+        """Encrypt one data unit with sequence number `sector`."""
+        return self.encrypt_sectors(data, len(data), sector)
+
+    def decrypt(self, data: bytes, sector: int) -> bytes:
+        """Decrypt one data unit with sequence number `sector`."""
+        return self.decrypt_sectors(data, len(data), sector)
+
+    @_metered("XTS.encrypt_sectors", "xts", cipher="data_cipher")
+    def encrypt_sectors(self, data: bytes, sector_size: int = 4096, first_sector: int = 0) -> bytes:
+        """Encrypt consecutive sectors, numbered from `first_sector`, in one pass."""
+        return self._run(data, sector_size, first_sector, encrypt=True)
+
+    @_metered("XTS.decrypt_sectors", "xts", cipher="data_cipher")
+    def decrypt_sectors(self, data: bytes, sector_size: int = 4096, first_sector: int = 0) -> bytes:
+        """Decrypt consecutive sectors, numbered from `first_sector`, in one pass."""
+        return self._run(data, sector_size, first_sector, encrypt=False)
+
+    def _run(self, data: bytes, sector_size: int, first_sector: int, *, encrypt: bool) -> bytes:
+        if not isinstance(data, bytes):
+            raise TypeError(f"`data` must be bytes, not {type(data)}")
+        if sector_size < BLOCKSIZE_BYTES:
+            raise ValueError(f"XTS data units must be at least 16 bytes, not {sector_size}")
+        if len(data) % sector_size != 0:
+            raise ValueError(f"len(data) must be a multiple of sector_size ({sector_size})")
+        nsectors = len(data) // sector_size
+        m, b = divmod(sector_size, BLOCKSIZE_BYTES)
+        src = np.frombuffer(data, dtype=uint8).reshape(nsectors, sector_size)
+        out = np.empty_like(src)
+        tweaks = xts_tweaks(self.tweak_cipher, first_sector, nsectors, m + (b > 0))
+        func = self.data_cipher.encrypt_blocks if encrypt else self.data_cipher.decrypt_blocks
+        full = src[:, : m * BLOCKSIZE_BYTES].reshape(nsectors, m, BLOCKSIZE_BYTES)
+        if not b:
+            res = _xex(func, full.reshape(-1, BLOCKSIZE_BYTES), tweaks.reshape(-1, BLOCKSIZE_BYTES))
+            out[:] = res.reshape(nsectors, sector_size)
+            return out.tobytes()
+
+        # Ciphertext stealing.  Encryption processes all m full blocks
+        # and then re-encrypts block m - 1 combined with the partial tail.
+        # Decryption must undo block m - 1 with tweak m first, then the
+        # reassembled block with tweak m - 1.
+        tail = src[:, m * BLOCKSIZE_BYTES :]
+        if encrypt:
+            heads = tweaks[:, :m]
+        else:
+            heads = np.concatenate([tweaks[:, : m - 1], tweaks[:, m:]], axis=1)
+        res = _xex(func, full.reshape(-1, BLOCKSIZE_BYTES), heads.reshape(-1, BLOCKSIZE_BYTES))
+        res = res.reshape(nsectors, m, BLOCKSIZE_BYTES)
+        last = res[:, m - 1].copy()
+        # `last` is CC (encrypt) or PP (decrypt): its first b bytes are the
+        # output tail, and the rest is stolen to complete the input tail
+        stolen = np.concatenate([tail, last[:, b:]], axis=1)
+        k = m if encrypt else m - 1
+        res[:, m - 1] = _xex(func, stolen, tweaks[:, k])
+        out[:, : m * BLOCKSIZE_BYTES] = res.reshape(nsectors, -1)
+        out[:, m * BLOCKSIZE_BYTES :] = last[:, :b]
+        return out.tobytes()
@@ -0,0 +1,80 @@
+"""PKCS#7 padding (RFC 5652, section 6.3) on preallocated buffers.
+
+Padding appends k bytes of value k, 1 <= k <= 16, so that the total is
+a multiple of the block size; a full block of padding is added if the
+input is already aligned.
+
+These work on NumPy buffers rather than concatenating `bytes`: the
+caller allocates the padded output once, `pad_into()` fills it, and the
+cipher then runs in-place on that same buffer.  Validation on the way
+back is vectorized and accepts the final blocks of many messages at
+once, shape (m, 16).
+
+This module depends only on NumPy so that `npaes` can import it
+without a cycle.
+"""
+
+from __future__ import annotations
+
+__all__ = ("PKCS7", "pad_into", "padded_size", "pkcs7_pad_lengths", "pkcs7_valid")
+
+from typing import Literal, TypeAlias
+
+import numpy as np
+from numpy import uint8
+from numpy.typing import NDArray
+
+PKCS7 = "pkcs7"
+Padding: TypeAlias = Literal["pkcs7"] | None
+
+_BLOCK = 16
+_POSITIONS = np.arange(_BLOCK)
+_POSITIONS.flags.writeable = False
+
+
+def padded_size(n: int) -> int:
+    """Length in bytes of `n` bytes of input after PKCS#7 padding."""
+    return (n // _BLOCK + 1) * _BLOCK
+
+
+def pad_into(data: bytes, out: NDArray[uint8] | None = None) -> NDArray[uint8]:
+    """Copy `data` into `out` and write the padding after it.
+
+    `out` must be a 1d uint8 buffer of `padded_size(len(data))` bytes;
+    it is allocated if not given.  This is the only copy of `data` made.
+    """
+    n = len(data)
+    size = padded_size(n)
+    if out is None:
+        out = np.empty(size, dtype=uint8)
+    elif out.shape != (size,):
+        raise ValueError(f"`out` must have shape ({size},), not {out.shape}")
+    out[:n] = np.frombuffer(data, dtype=uint8)
+    out[n:] = size - n
+    return out
+
+
+def _check(last_blocks: NDArray[uint8]) -> tuple[NDArray[np.intp], NDArray[np.bool_]]:
+    last = np.asarray(last_blocks).reshape(-1, _BLOCK)
+    pad = last[:, -1].astype(np.intp)
+    covered = _BLOCK - pad[:, None] <= _POSITIONS
+    ok = (pad >= 1) & (pad <= _BLOCK) & ((last == pad[:, None]) | ~covered).all(axis=1)
+    return pad, ok
+
+
+def pkcs7_valid(last_blocks: NDArray[uint8]) -> NDArray[np.bool_]:
+    """Whether each final block, shape (m, 16) or (16,), is validly padded."""
+    return _check(last_blocks)[1]
+
+
+def pkcs7_pad_lengths(last_blocks: NDArray[uint8]) -> NDArray[np.intp]:
+    """Number of padding bytes to strip from each message.
+
+    `last_blocks` holds the final decrypted block of each message, shape
+    (m, 16) or (16,).  Raises ValueError if any of them is invalid.
+    """
+    pad, ok = _check(last_blocks)
+    if not ok.all():
+        bad = np.count_nonzero(~ok)
+        raise ValueError(f"Invalid PKCS#7 padding ({bad} of {len(ok)} messages)")
+    return pad
@@ -0,0 +1,228 @@
+"""Per-stage timing of the round pipeline.
+
+`profiling()` is a context manager that, while active, replaces the
+stage functions in `npaes` and `npaes.backends` with timing wrappers
+and restores the originals on exit.  Nothing is patched outside it, so
+profiling costs nothing when it is not in use.  The stages are:
+
+    key_expansion  expand_key(), key_schedule(), key_schedules()
+    input_layout   plaintext_to_3darray(), bytes_to_blocks(), and the
+                   backends' copy into the output buffer and State view
+    sub_bytes      sub_bytes(), inv_sub_bytes()
+    shift_rows     shift_rows(), inv_shift_rows()
+    mix_columns    mix_columns(), inv_mix_columns()
+    t_table_round  the "ttable" engine's fused SubBytes/ShiftRows/MixColumns
+    add_round_key  the XOR with each round key
+    output_layout  array_to_bytes(), and `tobytes()` in `profile_encrypt()`
+
+Only the outermost stage of a nested call is timed (the XORs inside
+key expansion count as key expansion).  Time spent outside every stage
+(the Python round loops, engine setup) is reported as "other".
+
+`profile_encrypt()` runs one engine on a batch and returns the
+breakdown.  "reference" is the per-block path (`encrypt_raw()` on each
+block, which expands the key for every block); "vectorized" and
+"ttable" are the batched paths.  `breakdown_table()` formats a grid of
+engines and batch sizes, as printed by `benchmarks/bench_stages.py`.
+
+The wrappers are module globals, so while a `profiling()` block is
+open the profile includes the stages run by every thread, not only the
+one that opened it.  The nesting depth is kept per thread, so
+concurrent calls are each timed once.  Only one `profiling()` block may
+be open at a time; opening a second raises RuntimeError.
+"""
+
+from __future__ import annotations
+
+__all__ = ("STAGES", "StageProfile", "breakdown_table", "profile_encrypt", "profiling")
+
+import contextlib
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+import npaes
+from npaes import backends
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Iterable
+
+# Stage -> names of the functions timed as that stage, wherever they
+# appear in the globals of `npaes` and `npaes.backends`
+STAGES: dict[str, tuple[str, ...]] = {
+    "key_expansion": ("expand_key", "key_schedule", "key_schedules"),
+    "input_layout": ("plaintext_to_3darray", "bytes_to_blocks", "_prepare_out", "_as_states"),
+    "sub_bytes": ("sub_bytes", "inv_sub_bytes"),
+    "shift_rows": ("shift_rows", "inv_shift_rows"),
+    "mix_columns": ("mix_columns", "inv_mix_columns"),
+    "t_table_round": ("_table_round",),
+    "add_round_key": ("xor",),
+    "output_layout": ("array_to_bytes",),
+}
+
+
+class _Timed:
+    """Times calls of `func` as `stage`, and forwards other attributes (e.g. `xor.reduce`)."""
+
+    def __init__(self, profile: StageProfile, stage: str, func: Callable[..., Any]) -> None:
+        self.profile = profile
+        self.stage = stage
+        self.func = func
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        local = self.profile._local
+        if getattr(local, "depth", 0):
+            return self.func(*args, **kwargs)
+        local.depth = 1
+        start = time.perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            self.profile._add(self.stage, time.perf_counter() - start)
+            local.depth = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.func, name)
+
+
+class StageProfile:
+    """Seconds and call counts per stage, accumulated while profiling."""
+
+    def __init__(self) -> None:
+        self.seconds: defaultdict[str, float] = defaultdict(float)
+        self.calls: Counter[str] = Counter()
+        self.total = 0.0  # Wall time of the profiled runs, set by `profile_encrypt()`
+        self.runs = 0
+        self._local = threading.local()  # Nesting depth of the calling thread
+        self._lock = threading.Lock()
+
+    def _add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def wrap(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        return _Timed(self, stage, func)
+
+    @contextlib.contextmanager
+    def stage(self, stage: str) -> Generator[None]:
+        """Time the body of a `with` block as `stage`."""
+        local = self._local
+        local.depth = getattr(local, "depth", 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(stage, time.perf_counter() - start)
+            local.depth -= 1
+
+    def breakdown(self) -> dict[str, float]:
+        """Seconds per run for each stage, plus "other" and "total"."""
+        runs = max(self.runs, 1)
+        out = {stage: self.seconds[stage] / runs for stage in STAGES}
+        out["other"] = max(self.total - sum(self.seconds.values()), 0.0) / runs
+        out["total"] = self.total / runs
+        return out
+
+
+# Held while the module globals are patched or restored
+_lock = threading.Lock()
+_active = False
+
+
+@contextlib.contextmanager
+def profiling() -> Generator[StageProfile]:
+    """Time every stage called, by any thread, inside the `with` block."""
+    global _active
+    profile = StageProfile()
+    saved: list[tuple[object, str, object]] = []
+    with _lock:
+        if _active:
+            raise RuntimeError("profiling() is already active")
+        _active = True
+        for module in (npaes, backends):
+            namespace = vars(module)
+            for stage, names in STAGES.items():
+                for name in names:
+                    if name in namespace:
+                        saved.append((module, name, namespace[name]))
+                        setattr(module, name, profile.wrap(stage, namespace[name]))
+    try:
+        yield profile
+    finally:
+        with _lock:
+            for module, name, func in reversed(saved):
+                setattr(module, name, func)
+            _active = False
+
+
+def profile_encrypt(
+    nblocks: int,
+    backend: str = "vectorized",
+    *,
+    key_bytes: int = 16,
+    decrypt: bool = False,
+    repeat: int = 3,
+    seed: int = 0,
+) -> StageProfile:
+    """Profile the full pipeline on `nblocks` random blocks, `repeat` times.
+
+    Each run expands the key, converts the input, runs the engine and
+    converts the output back to bytes.  The per-block path converts
+    with `plaintext_to_3darray()`/`array_to_bytes()` block by block, as
+    `encrypt_raw()` callers do; the batched paths use the zero-copy
+    (n, 16) layout.
+    """
+    rng = np.random.default_rng(seed)
+    key = rng.bytes(key_bytes)
+    data = rng.bytes(16 * nblocks)
+    engine = backends.get_backend(backend)
+    func = engine.decrypt_blocks if decrypt else engine.encrypt_blocks
+    # Build lookup tables and the like outside the timed runs
+    func(npaes.bytes_to_blocks(data[:16]), npaes.key_schedule(key))
+    with profiling() as profile:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            schedule = npaes.key_schedule(key)
+            if backend == "reference":
+                with profile.stage("input_layout"):
+                    states = npaes.plaintext_to_3darray(data)
+                    blocks = np.ascontiguousarray(states.swapaxes(1, 2)).reshape(-1, 16)
+                out = func(blocks, schedule)
+                with profile.stage("output_layout"):
+                    for state in backends._as_states(out):
+                        npaes.array_to_bytes(state)
+            else:
+                out = func(npaes.bytes_to_blocks(data), schedule)
+                with profile.stage("output_layout"):
+                    out.tobytes()
+            profile.total += time.perf_counter() - start
+            profile.runs += 1
+    return profile
+
+
+def breakdown_table(
+    sizes: Iterable[int] = (1, 16, 256, 4096),
+    engines: Iterable[str] = ("reference", "vectorized", "ttable"),
+    *,
+    key_bytes: int = 16,
+    decrypt: bool = False,
+    repeat: int = 3,
+) -> str:
+    """Percentage of time per stage for each engine and batch size, as text."""
+    columns = [*STAGES, "other"]
+    header = f"{'engine':>10} {'blocks':>6} {'us/block':>9} " + " ".join(
+        f"{c[:13]:>13}" for c in columns
+    )
+    lines = [header, "-" * len(header)]
+    for name in engines:
+        for n in sizes:
+            b = profile_encrypt(n, name, key_bytes=key_bytes, decrypt=decrypt, repeat=repeat)
+            times = b.breakdown()
+            total = times["total"] or 1.0
+            cells = " ".join(f"{100 * times[c] / total:12.1f}%" for c in columns)
+            lines.append(f"{name:>10} {n:>6} {times['total'] / n * 1e6:9.1f} {cells}")
+    return "\n".join(lines)
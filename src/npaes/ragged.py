@@ -0,0 +1,88 @@
+"""Ragged batches: many variable-length runs stored back to back.
+
+The batch APIs in `npaes.modes`, `npaes.mac` and `npaes.aead` keep a
+batch of messages as one contiguous uint8 buffer plus run lengths, in
+the style of Apache Arrow's variable-size binary layout: message i
+occupies buffer[offsets[i] : offsets[i + 1]].  Moving bytes between
+such layouts (into block-aligned slots, say) is one fancy-index
+operation over the whole batch instead of a Python loop per message.
+
+Like `npaes.padding`, this module depends only on NumPy.
+"""
+
+from __future__ import annotations
+
+__all__ = (
+    "check_offsets",
+    "gather_runs",
+    "join",
+    "lengths_of",
+    "run_starts",
+    "scatter_runs",
+    "split",
+)
+
+from collections.abc import Sequence
+
+import numpy as np
+from numpy import uint8
+from numpy.typing import ArrayLike, NDArray
+
+
+def run_starts(lengths: NDArray[np.intp]) -> NDArray[np.intp]:
+    """Exclusive cumulative sum: where each of the runs `lengths` begins."""
+    starts = np.zeros(len(lengths), dtype=np.intp)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    return starts
+
+
+def scatter_runs(
+    flat: NDArray[uint8], dest: NDArray[np.intp], joined: NDArray[uint8], lengths: NDArray[np.intp]
+) -> None:
+    """Copy the consecutive runs of `joined`, of `lengths` bytes, to flat[dest[i]:].
+
+    One fancy-index assignment: each byte moves by its run's offset
+    from its position in `joined`.
+    """
+    shift = np.repeat(dest - run_starts(lengths), lengths)
+    flat[np.arange(joined.size) + shift] = joined
+
+
+def gather_runs(
+    flat: NDArray[uint8], src: NDArray[np.intp], lengths: NDArray[np.intp]
+) -> NDArray[uint8]:
+    """The runs flat[src[i] : src[i] + lengths[i]], concatenated."""
+    return flat[np.arange(int(lengths.sum())) + np.repeat(src - run_starts(lengths), lengths)]
+
+
+def lengths_of(items: Sequence[bytes]) -> NDArray[np.intp]:
+    """len() of each item, as an array."""
+    return np.fromiter(map(len, items), dtype=np.intp, count=len(items))
+
+
+def join(items: Sequence[bytes]) -> NDArray[uint8]:
+    """The items concatenated into one read-only uint8 buffer."""
+    return np.frombuffer(b"".join(items), dtype=uint8)
+
+
+def split(buf: bytes, lengths: NDArray[np.intp]) -> list[bytes]:
+    """Cut `buf` into consecutive pieces of `lengths` bytes."""
+    ends = np.cumsum(lengths).tolist()
+    return [buf[end - n : end] for end, n in zip(ends, lengths.tolist(), strict=True)]
+
+
+def check_offsets(offsets: ArrayLike, size: int) -> NDArray[np.intp]:
+    """Validate Arrow-style `offsets` for a `size`-byte buffer; return the run lengths.
+
+    `offsets` has one more entry than there are messages, starts at 0,
+    ends at `size` and never decreases.
+    """
+    offsets = np.asarray(offsets)
+    if offsets.ndim != 1 or offsets.size == 0 or not np.issubdtype(offsets.dtype, np.integer):
+        raise ValueError("`offsets` must be a nonempty 1d integer array")
+    if offsets[0] != 0 or offsets[-1] != size:
+        raise ValueError(f"`offsets` must start at 0 and end at len(data) ({size})")
+    lengths = np.diff(offsets).astype(np.intp)
+    if (lengths < 0).any():
+        raise ValueError("`offsets` must be nondecreasing")
+    return lengths
@@ -0,0 +1,490 @@
+"""Encrypt or decrypt a whole directory tree on a process pool.
+
+Each file under the source directory becomes a file at the same relative
+path under the destination, in the stream format of `npaes.cli`, so
+``python -m npaes decrypt`` can read any one of them on its own.  Empty
+directories are recreated; symbolic links to directories are not
+followed.
+
+The work is planned by file size so that neither many small files nor a
+few huge ones leave cores idle:
+
+- Files of at most `tile_bytes` are packed into batches of up to
+  `batch_files` files and about `tile_bytes` bytes.  A worker reads a
+  batch and encrypts the chunks of all its files with one
+  `gcm_encrypt_batch()` (or `ctr_xor_batch()`) call, so the per-call
+  overhead is paid once per batch rather than once per file.
+- Larger files are cut into tiles of whole chunks, about `tile_bytes`
+  each.  Every chunk's offset in the output is fixed by the format, so
+  the parent writes the header and sets the output's size, and any
+  worker can then read, encrypt and write any tile on its own.
+
+The jobs are sorted largest first and handed to the pool a few at a
+time: whichever worker is free takes the next one.  The tiles of one
+huge file are therefore spread over every worker, and the small batches
+at the end fill in around the last tiles.
+
+Outputs are written in place.  If a job fails, the error names the file,
+and other outputs may already be written.
+"""
+
+from __future__ import annotations
+
+__all__ = ("BATCH_FILES", "TILE_BYTES", "TreeStats", "decrypt_tree", "encrypt_tree")
+
+import io
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy as np
+from numpy import uint8
+
+from npaes import AES
+from npaes.aead import gcm_decrypt, gcm_decrypt_batch, gcm_encrypt_batch
+from npaes.cli import (
+    _HEADER,
+    _MODES,
+    CHUNK_SIZE,
+    MAGIC,
+    SALT_BYTES,
+    TAG_BYTES,
+    VERSION,
+    StreamMode,
+    _gcm_nonce,
+    _read_full,
+    _read_header,
+    decrypt_stream,
+)
+from npaes.modes import ctr_xor, ctr_xor_batch
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+    from typing_extensions import Buffer
+
+    from npaes import UInt8Array
+
+    Job = tuple[int, Callable[..., int], tuple]  # Plaintext bytes, function, arguments
+
+TILE_BYTES = 16 * 1024 * 1024
+BATCH_FILES = 1024
+
+
+class TreeStats(NamedTuple):
+    files: int
+    bytes: int  # Plaintext bytes
+
+
+# ---------------------------------------------------------------------
+# Stream layout (see `npaes.cli`)
+
+
+def _chunk_lengths(
+    size: int, chunk_size: int, first: int = 0, stop: int | None = None
+) -> list[int]:
+    """Plaintext lengths of chunks first, ..., stop - 1 of a `size`-byte stream."""
+    nchunks = max(1, -(-size // chunk_size))
+    stop = nchunks if stop is None else min(stop, nchunks)
+    return [min(chunk_size, size - i * chunk_size) for i in range(first, stop)]
+
+
+def _plaintext_size(stored: int, header: bytes, mode: StreamMode, chunk_size: int) -> int:
+    """Plaintext size of a `stored`-byte stream with this header."""
+    body = stored - len(header)
+    if mode == "ctr":
+        return body
+    record = chunk_size + TAG_BYTES
+    nchunks = -(-body // record)
+    last = body - (nchunks - 1) * record
+    if not body or last < TAG_BYTES:
+        raise ValueError("Truncated npaes stream")
+    if last == TAG_BYTES and nchunks > 1:  # Only the first chunk may be empty
+        raise ValueError(f"Chunk {nchunks - 1} of the stream failed authentication")
+    return body - TAG_BYTES * nchunks
+
+
+def _new_header(mode: StreamMode, chunk_size: int) -> bytes:
+    nonce = os.urandom(16 if mode == "ctr" else SALT_BYTES)
+    return _HEADER.pack(MAGIC, VERSION, _MODES.index(mode), chunk_size) + nonce
+
+
+def _split(out: UInt8Array, sizes: list[int]) -> list[memoryview]:
+    ends = itertools.accumulate(sizes)
+    return [out[end - n : end].data for n, end in zip(sizes, ends, strict=True)]
+
+
+# ---------------------------------------------------------------------
+# Jobs, which run in the workers.  Each takes the cipher first and
+# returns the number of plaintext bytes it handled.
+
+
+def _ctr(cipher: AES, data: Sequence[Buffer], headers: Sequence[bytes]) -> list[memoryview]:
+    """CTR-XOR whole streams, each from the IV in its header, in one batched call."""
+    sizes = [memoryview(d).nbytes for d in data]
+    offsets = np.zeros(len(data) + 1, dtype=np.intp)
+    np.cumsum(sizes, out=offsets[1:])
+    ivs = np.frombuffer(b"".join(h[_HEADER.size :] for h in headers), dtype=uint8)
+    return _split(ctr_xor_batch(cipher, b"".join(data), offsets, ivs.reshape(-1, 16)), sizes)
+
+
+def _gcm(
+    cipher: AES,
+    decrypt: bool,
+    data: Buffer,
+    lengths: list[int],
+    chunks: list[tuple[bytes, int, bool]],
+) -> UInt8Array:
+    """Seal (or open) GCM chunks stored back to back as stream records.
+
+    Chunk j holds lengths[j] bytes of plaintext, and chunks[j] is its
+    (stream header, index, is_last).  A sealed chunk is ciphertext || tag.
+    """
+    m = len(lengths)
+    offsets = np.zeros(m + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+    tag_starts = offsets[1:] + TAG_BYTES * np.arange(m)
+    is_text = np.ones(offsets[-1] + TAG_BYTES * m, dtype=bool)
+    is_text[tag_starts[:, None] + np.arange(TAG_BYTES)] = False
+    nonces = b"".join(_gcm_nonce(header[-SALT_BYTES:], i) for header, i, _ in chunks)
+    aad = b"".join(header + bytes([last]) for header, _, last in chunks)
+    nonce_array = np.frombuffer(nonces, dtype=uint8).reshape(m, -1)
+    ad_offsets = np.arange(m + 1) * (len(aad) // m)  # GCM headers all have the same size
+    if decrypt:
+        sealed = np.frombuffer(memoryview(data), dtype=uint8)
+        tags = sealed[~is_text].reshape(m, TAG_BYTES)
+        return gcm_decrypt_batch(
+            cipher, sealed[is_text], offsets, nonce_array, tags, aad, ad_offsets
+        )
+    text, tags = gcm_encrypt_batch(cipher, data, offsets, nonce_array, aad, ad_offsets)
+    out = np.empty(is_text.size, dtype=uint8)
+    out[is_text] = text
+    out[~is_text] = tags.reshape(-1)
+    return out
+
+
+def _encrypt_files(
+    cipher: AES, src: Path, dst: Path, names: list[str], mode: StreamMode, chunk_size: int
+) -> int:
+    """Encrypt whole files, all in one batched call."""
+    data = [(src / name).read_bytes() for name in names]
+    headers = [_new_header(mode, chunk_size) for _ in names]
+    if mode == "ctr":
+        bodies = _ctr(cipher, data, headers)
+    else:
+        lengths: list[int] = []
+        chunks: list[tuple[bytes, int, bool]] = []
+        sizes = []
+        for d, header in zip(data, headers, strict=True):
+            file_lengths = _chunk_lengths(len(d), chunk_size)
+            n = len(file_lengths)
+            lengths += file_lengths
+            chunks += [(header, i, i == n - 1) for i in range(n)]
+            sizes.append(len(d) + TAG_BYTES * n)
+        bodies = _split(_gcm(cipher, False, b"".join(data), lengths, chunks), sizes)
+    for name, header, body in zip(names, headers, bodies, strict=True):
+        with (dst / name).open("wb") as f:
+            f.write(header)
+            f.write(body)
+    return sum(map(len, data))
+
+
+def _decrypt_files(cipher: AES, src: Path, dst: Path, names: list[str]) -> int:
+    """Decrypt whole files: the CTR ones in one batched call, the GCM ones in another."""
+    blobs = [(src / name).read_bytes() for name in names]
+    ctr: dict[int, tuple[memoryview, bytes]] = {}
+    gcm: dict[int, tuple[memoryview, int]] = {}
+    lengths: list[int] = []
+    chunks: list[tuple[bytes, int, bool]] = []
+    for i, (name, blob) in enumerate(zip(names, blobs, strict=True)):
+        try:
+            header, mode, chunk_size = _read_header(io.BytesIO(blob))
+            size = _plaintext_size(len(blob), header, mode, chunk_size)
+        except ValueError as e:
+            raise ValueError(f"{src / name}: {e}") from None
+        body = memoryview(blob)[len(header) :]
+        if mode == "ctr":
+            ctr[i] = body, header
+            continue
+        gcm[i] = body, size
+        file_lengths = _chunk_lengths(size, chunk_size)
+        n = len(file_lengths)
+        lengths += file_lengths
+        chunks += [(header, j, j == n - 1) for j in range(n)]
+    plain: dict[int, memoryview] = {}
+    if ctr:
+        bodies, headers = zip(*ctr.values(), strict=True)
+        plain.update(zip(ctr, _ctr(cipher, bodies, headers), strict=True))
+    if gcm:
+        bodies, sizes = zip(*gcm.values(), strict=True)
+        try:
+            out = _gcm(cipher, True, b"".join(bodies), lengths, chunks)
+        except ValueError:
+            for i in gcm:  # Find the file that failed, for the message
+                try:
+                    decrypt_stream(io.BytesIO(blobs[i]), io.BytesIO(), cipher)
+                except ValueError as e:
+                    raise ValueError(f"{src / names[i]}: {e}") from None
+            raise
+        plain.update(zip(gcm, _split(out, list(sizes)), strict=True))
+    for i, name in enumerate(names):
+        (dst / name).write_bytes(plain[i])
+    return sum(len(p) for p in plain.values())
+
+
+def _crypt_tile(
+    cipher: AES,
+    decrypt: bool,
+    src: Path,
+    dst: Path,
+    header: bytes,
+    size: int,
+    first: int,
+    stop: int,
+) -> int:
+    """Encrypt or decrypt chunks first, ..., stop - 1 of a `size`-byte file in place."""
+    _, _, mode_id, chunk_size = _HEADER.unpack_from(header)
+    mode = _MODES[mode_id]
+    tag_bytes = TAG_BYTES if mode == "gcm" else 0
+    lengths = _chunk_lengths(size, chunk_size, first, stop)
+    plain_at = first * chunk_size
+    sealed_at = len(header) + first * (chunk_size + tag_bytes)
+    nbytes = sum(lengths)
+    if decrypt:
+        read_at, nread, write_at = sealed_at, nbytes + tag_bytes * len(lengths), plain_at
+    else:
+        read_at, nread, write_at = plain_at, nbytes, sealed_at
+    with src.open("rb") as f:
+        f.seek(read_at)
+        data = _read_full(f, nread)
+    if len(data) < nread:
+        raise ValueError(f"{src}: the file changed size while being read")
+    if mode == "ctr":
+        out = ctr_xor(cipher, data, header[_HEADER.size :], plain_at)
+    else:
+        nchunks = max(1, -(-size // chunk_size))
+        indices = range(first, first + len(lengths))
+        chunks = [(header, i, i == nchunks - 1) for i in indices]
+        try:
+            out = _gcm(cipher, decrypt, data, lengths, chunks)
+        except ValueError:
+            if decrypt:
+                _check_records(cipher, src, data, lengths, chunks)
+            raise
+    with dst.open("r+b") as f:
+        f.seek(write_at)
+        f.write(out.data)
+    return nbytes
+
+
+def _check_records(
+    cipher: AES, src: Path, data: bytes, lengths: list[int], chunks: list[tuple[bytes, int, bool]]
+) -> None:
+    """Raise an error naming the first record of a tile that fails authentication."""
+    start = 0
+    for n, (header, i, last) in zip(lengths, chunks, strict=True):
+        record = data[start : start + n + TAG_BYTES]
+        try:
+            gcm_decrypt(cipher, _gcm_nonce(header[-SALT_BYTES:], i), record, header + bytes([last]))
+        except ValueError:
+            raise ValueError(f"{src}: Chunk {i} of the stream failed authentication") from None
+        start += len(record)
+
+
+# ---------------------------------------------------------------------
+# Scheduling, in the parent
+
+_worker_cipher: AES | None = None
+
+
+def _init_worker(key: bytes, backend: str, tile_blocks: int) -> None:
+    global _worker_cipher
+    _worker_cipher = AES(key, backend, tile_blocks=tile_blocks)
+
+
+def _in_worker(func: Callable[..., int], *args: object) -> int:
+    assert _worker_cipher is not None
+    return func(_worker_cipher, *args)
+
+
+def _scan(root: Path) -> Iterator[tuple[str, int | None]]:
+    """(relative path, size) for every file under `root`, and (path, None) for every directory."""
+    stack = [""]
+    while stack:
+        prefix = stack.pop()
+        yield prefix, None
+        with os.scandir(root / prefix) as entries:
+            for entry in entries:
+                name = f"{prefix}/{entry.name}" if prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file():
+                    yield name, entry.stat().st_size
+
+
+def _check_args(src: Path, dst: Path, tile_bytes: int, batch_files: int, workers: int) -> None:
+    if not src.is_dir():
+        raise ValueError(f"{src} is not a directory")
+    if dst.resolve().is_relative_to(src.resolve()):
+        raise ValueError("The destination must not be inside the source directory")
+    if tile_bytes < 1:
+        raise ValueError(f"`tile_bytes` must be at least 1, not {tile_bytes}")
+    if batch_files < 1:
+        raise ValueError(f"`batch_files` must be at least 1, not {batch_files}")
+    if workers < 1:
+        raise ValueError(f"`workers` must be at least 1, not {workers}")
+
+
+def _plan(
+    src: Path,
+    dst: Path,
+    tile_bytes: int,
+    batch_files: int,
+    small: Callable[[list[str], int], Job],
+    large: Callable[[str, int], list[Job]],
+) -> tuple[list[Job], int]:
+    """Create the destination directories and cut the work into jobs, largest first."""
+    jobs: list[Job] = []
+    batch: list[str] = []
+    batch_bytes = nfiles = 0
+    for name, size in _scan(src):
+        if size is None:
+            (dst / name).mkdir(parents=True, exist_ok=True)
+            continue
+        nfiles += 1
+        if size > tile_bytes:
+            jobs += large(name, size)
+            continue
+        batch.append(name)
+        batch_bytes += size
+        if len(batch) == batch_files or batch_bytes >= tile_bytes:
+            jobs.append(small(batch, batch_bytes))
+            batch, batch_bytes = [], 0
+    if batch:
+        jobs.append(small(batch, batch_bytes))
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    return jobs, nfiles
+
+
+def _run(jobs: list[Job], cipher: AES, workers: int) -> int:
+    """Run the jobs, at most `workers` at a time; return their total bytes."""
+    if workers == 1:
+        return sum(func(cipher, *args) for _, func, args in jobs)
+    total = 0
+    pending = iter(jobs)
+    with ProcessPoolExecutor(
+        workers,
+        initializer=_init_worker,
+        initargs=(cipher.key, cipher.backend, cipher.tile_blocks),
+    ) as pool:
+        # A couple of jobs queued per worker, so none waits on the parent
+        running = {
+            pool.submit(_in_worker, func, *args)
+            for _, func, args in itertools.islice(pending, 2 * workers)
+        }
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                total += future.result()
+            for _, func, args in itertools.islice(pending, len(done)):
+                running.add(pool.submit(_in_worker, func, *args))
+    return total
+
+
+def encrypt_tree(
+    src: str | os.PathLike[str],
+    dst: str | os.PathLike[str],
+    key: bytes | AES,
+    *,
+    mode: StreamMode = "gcm",
+    chunk_size: int = CHUNK_SIZE,
+    tile_bytes: int = TILE_BYTES,
+    batch_files: int = BATCH_FILES,
+    workers: int | None = None,
+) -> TreeStats:
+    """Encrypt every file under `src` into the same relative path under `dst`.
+
+    Each output is a `npaes.cli` stream with the given `mode` and
+    `chunk_size`.  `workers` processes run the jobs (default: one per
+    CPU; 1 runs them in this process).  Returns the number of files and
+    plaintext bytes.
+    """
+    root, target = Path(src), Path(dst)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    _check_args(root, target, tile_bytes, batch_files, workers)
+    if mode not in _MODES:
+        raise ValueError(f"`mode` must be 'ctr' or 'gcm', not {mode!r}")
+    if not 1 <= chunk_size < 1 << 32:
+        raise ValueError(f"`chunk_size` must be from 1 byte to 4 GiB, not {chunk_size}")
+    cipher = key if isinstance(key, AES) else AES(key)
+    tag_bytes = TAG_BYTES if mode == "gcm" else 0
+    tile_chunks = max(1, tile_bytes // chunk_size)
+
+    def small(names: list[str], size: int) -> Job:
+        return size, _encrypt_files, (root, target, names, mode, chunk_size)
+
+    def large(name: str, size: int) -> list[Job]:
+        header = _new_header(mode, chunk_size)
+        nchunks = -(-size // chunk_size)
+        with (target / name).open("wb") as f:
+            f.write(header)
+            f.truncate(len(header) + size + tag_bytes * nchunks)
+        return [
+            (
+                min(tile_chunks * chunk_size, size - first * chunk_size),
+                _crypt_tile,
+                (False, root / name, target / name, header, size, first, first + tile_chunks),
+            )
+            for first in range(0, nchunks, tile_chunks)
+        ]
+
+    jobs, nfiles = _plan(root, target, tile_bytes, batch_files, small, large)
+    return TreeStats(nfiles, _run(jobs, cipher, workers))
+
+
+def decrypt_tree(
+    src: str | os.PathLike[str],
+    dst: str | os.PathLike[str],
+    key: bytes | AES,
+    *,
+    tile_bytes: int = TILE_BYTES,
+    batch_files: int = BATCH_FILES,
+    workers: int | None = None,
+) -> TreeStats:
+    """Inverse of `encrypt_tree()`; returns the number of files and plaintext bytes.
+
+    Raises ValueError, naming the file, if a file is not an npaes stream
+    or fails authentication.
+    """
+    root, target = Path(src), Path(dst)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    _check_args(root, target, tile_bytes, batch_files, workers)
+    cipher = key if isinstance(key, AES) else AES(key)
+
+    def small(names: list[str], size: int) -> Job:
+        return size, _decrypt_files, (root, target, names)
+
+    def large(name: str, stored: int) -> list[Job]:
+        try:
+            with (root / name).open("rb") as f:
+                header, mode, chunk_size = _read_header(f)
+            size = _plaintext_size(stored, header, mode, chunk_size)
+        except ValueError as e:
+            raise ValueError(f"{root / name}: {e}") from None
+        with (target / name).open("wb") as f:
+            f.truncate(size)
+        tile_chunks = max(1, tile_bytes // chunk_size)
+        nchunks = max(1, -(-size // chunk_size))
+        return [
+            (
+                min(tile_chunks * chunk_size, size - first * chunk_size),
+                _crypt_tile,
+                (True, root / name, target / name, header, size, first, first + tile_chunks),
+            )
+            for first in range(0, nchunks, tile_chunks)
+        ]
+
+    jobs, nfiles = _plan(root, target, tile_bytes, batch_files, small, large)
+    return TreeStats(nfiles, _run(jobs, cipher, workers))
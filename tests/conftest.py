@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _npaes_cache_dir(tmp_path_factory):
+    """Keep backend calibration results out of the user's real cache."""
+    mp = pytest.MonkeyPatch()
+    mp.setenv("NPAES_CACHE_DIR", str(tmp_path_factory.mktemp("npaes-cache")))
+    yield
+    mp.undo()
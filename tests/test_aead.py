@@ -0,0 +1,291 @@
+import numpy as np
+import pytest
+
+from npaes import AES, aead
+from npaes.aead import (
+    SIV,
+    ccm_decrypt,
+    ccm_decrypt_batch,
+    ccm_encrypt,
+    ccm_encrypt_batch,
+    gcm_decrypt,
+    gcm_decrypt_batch,
+    gcm_encrypt,
+    gcm_encrypt_batch,
+)
+
+SP800_38C_KEY = bytes.fromhex("404142434445464748494a4b4c4d4e4f")
+
+
+@pytest.mark.parametrize(
+    ("key", "nonce", "aad", "plaintext", "tag_length", "expected"),
+    [
+        # NIST SP 800-38C, Appendix C, examples 1 and 2
+        (
+            "404142434445464748494a4b4c4d4e4f",
+            "10111213141516",
+            "0001020304050607",
+            "20212223",
+            4,
+            "7162015b4dac255d",
+        ),
+        (
+            "404142434445464748494a4b4c4d4e4f",
+            "1011121314151617",
+            "000102030405060708090a0b0c0d0e0f",
+            "202122232425262728292a2b2c2d2e2f",
+            6,
+            "d2a1f0e051ea5f62081a7792073d593d1fc64fbfaccd",
+        ),
+        # RFC 3610, packet vector #1
+        (
+            "c0c1c2c3c4c5c6c7c8c9cacbcccdcecf",
+            "00000003020100a0a1a2a3a4a5",
+            "0001020304050607",
+            "08090a0b0c0d0e0f101112131415161718191a1b1c1d1e",
+            8,
+            "588c979a61c663d2f066d0c2c0f989806d5f6b61dac38417e8d12cfdf926e0",
+        ),
+    ],
+)
+def test_ccm_vectors(key, nonce, aad, plaintext, tag_length, expected):
+    cipher = AES(bytes.fromhex(key))
+    nonce, aad, pt = bytes.fromhex(nonce), bytes.fromhex(aad), bytes.fromhex(plaintext)
+    ct = ccm_encrypt(cipher, nonce, pt, aad, tag_length)
+    assert ct.hex() == expected
+    assert ccm_decrypt(cipher, nonce, ct, aad, tag_length) == pt
+
+
+@pytest.mark.parametrize("nonce_size", [7, 12, 13])
+def test_ccm_batch_matches_single(nonce_size):
+    cipher = AES(SP800_38C_KEY)
+    rng = np.random.default_rng(nonce_size)
+    nonces = [rng.bytes(nonce_size) for _ in range(60)]
+    plaintexts = [rng.bytes(int(n)) for n in rng.integers(0, 100, 60)]
+    aads = [rng.bytes(int(n)) for n in rng.integers(0, 40, 60)]
+    cts = ccm_encrypt_batch(cipher, nonces, plaintexts, aads, tag_length=12)
+    for nonce, pt, aad, ct in zip(nonces, plaintexts, aads, cts, strict=True):
+        assert len(ct) == len(pt) + 12
+        assert ccm_encrypt(cipher, nonce, pt, aad, 12) == ct
+    assert ccm_decrypt_batch(cipher, nonces, cts, aads, tag_length=12) == plaintexts
+    assert ccm_encrypt_batch(cipher, [], []) == []
+
+
+def test_ccm_long_associated_data():
+    # 65280 bytes and up switch to the 6-byte length encoding
+    cipher = AES(SP800_38C_KEY)
+    nonces = [bytes(12)] * 2
+    aads = [bytes(0xFEFF), bytes(0xFF00)]
+    cts = ccm_encrypt_batch(cipher, nonces, [b"payload"] * 2, aads)
+    assert cts[0] != cts[1]
+    assert ccm_decrypt_batch(cipher, nonces, cts, aads) == [b"payload"] * 2
+
+
+def test_ccm_authentication_failure():
+    cipher = AES(SP800_38C_KEY)
+    nonces = [bytes(12)] * 4
+    cts = ccm_encrypt_batch(cipher, nonces, [b"a", b"bb", b"", b"dddd"], [b"x", b"", b"", b""])
+    tampered = [cts[0], cts[1][:-1] + bytes([cts[1][-1] ^ 1]), cts[2], cts[3]]
+    with pytest.raises(ValueError, match="1 of 4 messages"):
+        ccm_decrypt_batch(cipher, nonces, tampered, [b"x", b"", b"", b""])
+    with pytest.raises(ValueError, match="authentication failed"):
+        ccm_decrypt(cipher, bytes(12), cts[0], b"y")
+    with pytest.raises(ValueError, match="include its 16-byte tag"):
+        ccm_decrypt(cipher, bytes(12), bytes(15))
+
+
+def test_tag_checks_are_constant_time(monkeypatch):
+    expected = np.zeros((4, 16), dtype=np.uint8)
+    received = expected.copy()
+    received[1, 0] = 1
+    received[2, 15] = 0x80
+    assert aead._tags_match(expected, received).tolist() == [True, False, False, True]
+    calls, tags_match = [], aead._tags_match
+
+    def spy(expected, received):
+        calls.append(received.shape)
+        return tags_match(expected, received)
+
+    monkeypatch.setattr(aead, "_tags_match", spy)
+    cipher = AES(SP800_38C_KEY)
+    ccm_decrypt(
+        cipher, bytes(12), ccm_encrypt(cipher, bytes(12), b"ccm", tag_length=8), tag_length=8
+    )
+    gcm_decrypt(cipher, bytes(12), gcm_encrypt(cipher, bytes(12), b"gcm"))
+    siv = SIV(bytes(32))
+    siv.decrypt(siv.encrypt(b"siv"))
+    assert calls == [(1, 8), (1, 16), (1, 16)]
+
+
+def test_ccm_errors():
+    cipher = AES(SP800_38C_KEY)
+    with pytest.raises(ValueError, match="`tag_length`"):
+        ccm_encrypt(cipher, bytes(12), b"", tag_length=5)
+    with pytest.raises(ValueError, match="between 7 and 13"):
+        ccm_encrypt(cipher, bytes(6), b"")
+    with pytest.raises(ValueError, match="same length"):
+        ccm_encrypt_batch(cipher, [bytes(12), bytes(13)], [b"", b""])
+    with pytest.raises(ValueError, match="same length"):
+        ccm_encrypt_batch(cipher, [bytes(12)], [b"", b""])
+    with pytest.raises(ValueError, match="limits messages to 2\\*\\*16"):
+        ccm_encrypt(cipher, bytes(13), bytes(2**16))
+    with pytest.raises(TypeError, match="`plaintext` must be bytes"):
+        ccm_encrypt(cipher, bytes(12), "text")  # ty: ignore[invalid-argument-type]
+
+
+GCM_SPEC_PLAINTEXT = bytes.fromhex(
+    "d9313225f88406e5a55909c5aff5269a86a7a9531534f7da2e4c303d8a318a72"
+    "1c3c0c95956809532fcf0e2449a6b525b16aedf5aa0de657ba637b391aafd255"
+)
+
+
+@pytest.mark.parametrize(
+    ("key", "nonce", "aad", "plaintext", "expected"),
+    [
+        # The GCM specification (McGrew and Viega), test cases 1-4
+        ("00" * 16, "00" * 12, "", b"", "58e2fccefa7e3061367f1d57a4e7455a"),
+        (
+            "00" * 16,
+            "00" * 12,
+            "",
+            bytes(16),
+            "0388dace60b6a392f328c2b971b2fe78ab6e47d42cec13bdf53a67b21257bddf",
+        ),
+        (
+            "feffe9928665731c6d6a8f9467308308",
+            "cafebabefacedbaddecaf888",
+            "",
+            GCM_SPEC_PLAINTEXT,
+            "42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e"
+            "21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091473f5985"
+            "4d5c2af327cd64a62cf35abd2ba6fab4",
+        ),
+        (
+            "feffe9928665731c6d6a8f9467308308",
+            "cafebabefacedbaddecaf888",
+            "feedfacedeadbeeffeedfacedeadbeefabaddad2",
+            GCM_SPEC_PLAINTEXT[:60],
+            "42831ec2217774244b7221b784d0d49ce3aa212f2c02a4e035c17e2329aca12e"
+            "21d514b25466931c7d8f6a5aac84aa051ba30b396a0aac973d58e091"
+            "5bc94fbc3221a5db94fae95ae7121a47",
+        ),
+    ],
+)
+def test_gcm_vectors(key, nonce, aad, plaintext, expected):
+    cipher = AES(bytes.fromhex(key))
+    nonce, aad = bytes.fromhex(nonce), bytes.fromhex(aad)
+    ct = gcm_encrypt(cipher, nonce, plaintext, aad)
+    assert ct.hex() == expected
+    assert gcm_decrypt(cipher, nonce, ct, aad) == plaintext
+    assert gcm_encrypt(cipher, nonce, plaintext, aad, tag_length=12) == ct[:-4]
+
+
+def test_gcm_batch_matches_single():
+    cipher = AES(bytes(range(32)))
+    rng = np.random.default_rng(7)
+    lengths, ad_lengths = rng.integers(0, 90, 50), rng.integers(0, 30, 50)
+    plaintexts = [rng.bytes(int(n)) for n in lengths]
+    aads = [rng.bytes(int(n)) for n in ad_lengths]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    ad_offsets = np.concatenate([[0], np.cumsum(ad_lengths)])
+    nonces = rng.integers(0, 256, (50, 12), dtype=np.uint8)
+    data, aad = b"".join(plaintexts), b"".join(aads)
+    ct, tags = gcm_encrypt_batch(cipher, data, offsets, nonces, aad, ad_offsets)
+    assert ct.shape == (len(data),)
+    assert tags.shape == (50, 16)
+    for i in range(50):
+        single = gcm_encrypt(cipher, nonces[i].tobytes(), plaintexts[i], aads[i])
+        assert single == ct[offsets[i] : offsets[i + 1]].tobytes() + tags[i].tobytes()
+    out = gcm_decrypt_batch(cipher, ct, offsets, nonces, tags, aad, ad_offsets)
+    assert out.tobytes() == data
+    # No associated data at all
+    ct, tags = gcm_encrypt_batch(cipher, data, offsets, nonces)
+    assert (
+        ct[: offsets[1]].tobytes()
+        == gcm_encrypt(cipher, nonces[0].tobytes(), plaintexts[0])[: offsets[1]]
+    )
+
+
+def test_gcm_errors():
+    cipher = AES(bytes(16))
+    nonces = np.zeros((2, 12), dtype=np.uint8)
+    ct, tags = gcm_encrypt_batch(cipher, bytes(10), [0, 4, 10], nonces)
+    tags[1, 0] ^= 1
+    with pytest.raises(ValueError, match="1 of 2 messages"):
+        gcm_decrypt_batch(cipher, ct, [0, 4, 10], nonces, tags)
+    with pytest.raises(ValueError, match="authentication failed"):
+        gcm_decrypt(cipher, bytes(12), gcm_encrypt(cipher, bytes(12), b"abc"), b"ad")
+    with pytest.raises(ValueError, match="`nonces` must be a \\(2, 12\\)"):
+        gcm_encrypt_batch(cipher, bytes(10), [0, 4, 10], nonces[:1])
+    with pytest.raises(ValueError, match="`ad_offsets` is required"):
+        gcm_encrypt_batch(cipher, bytes(10), [0, 4, 10], nonces, b"ad")
+    with pytest.raises(ValueError, match="same number of messages"):
+        gcm_encrypt_batch(cipher, bytes(10), [0, 4, 10], nonces, b"ad", [0, 2])
+    with pytest.raises(ValueError, match="`tags` must be"):
+        gcm_decrypt_batch(cipher, ct, [0, 4, 10], nonces, tags[:, :5])
+    with pytest.raises(ValueError, match="`tag_length`"):
+        gcm_encrypt(cipher, bytes(12), b"", tag_length=10)
+    with pytest.raises(ValueError, match="len\\(nonce\\) must be 12"):
+        gcm_encrypt(cipher, bytes(8), b"")
+    with pytest.raises(ValueError, match="include its 16-byte tag"):
+        gcm_decrypt(cipher, bytes(12), bytes(15))
+
+
+def test_siv_rfc5297_deterministic():
+    # RFC 5297, Appendix A.1
+    siv = SIV(bytes.fromhex("fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0f0f1f2f3f4f5f6f7f8f9fafbfcfdfeff"))
+    ad = bytes.fromhex("101112131415161718191a1b1c1d1e1f2021222324252627")
+    pt = bytes.fromhex("112233445566778899aabbccddee")
+    ct = siv.encrypt(pt, ad)
+    assert ct.hex() == "85632d07c6e8f37f950acd320a2ecc9340c02b9690c4dc04daef7f6afe5c"
+    assert siv.decrypt(ct, ad) == pt
+
+
+def test_siv_rfc5297_nonce_based():
+    # RFC 5297, Appendix A.2: two associated-data components and a nonce
+    siv = SIV(bytes.fromhex("7f7e7d7c7b7a79787776757473727170404142434445464748494a4b4c4d4e4f"))
+    ad1 = bytes.fromhex(
+        "00112233445566778899aabbccddeeffdeaddadadeaddadaffeeddccbbaa99887766554433221100"
+    )
+    ad2 = bytes.fromhex("102030405060708090a0")
+    nonce = bytes.fromhex("09f911029d74e35bd84156c5635688c0")
+    pt = b"this is some plaintext to encrypt using SIV-AES"
+    ct = siv.encrypt(pt, ad1, ad2, nonce)
+    assert ct.hex() == (
+        "7bdb6e3b432667eb06f4d14bff2fbd0fcb900f2fddbe404326601965c889bf17"
+        "dba77ceb094fa663b7a3f748ba8af829ea64ad544a272e9c485b62a3fd5c0d"
+    )
+    assert siv.decrypt(ct, ad1, ad2, nonce) == pt
+
+
+@pytest.mark.parametrize("components", [0, 1, 2])
+def test_siv_batch_matches_single(components):
+    siv = SIV(bytes(range(64)))
+    rng = np.random.default_rng(components)
+    plaintexts = [rng.bytes(int(n)) for n in rng.integers(0, 50, 80)]
+    columns = [[rng.bytes(int(n)) for n in rng.integers(0, 30, 80)] for _ in range(components)]
+    cts = siv.encrypt_batch(plaintexts, *columns)
+    for i, (pt, ct) in enumerate(zip(plaintexts, cts, strict=True)):
+        assert siv.encrypt(pt, *[column[i] for column in columns]) == ct
+    assert siv.decrypt_batch(cts, *columns) == plaintexts
+    # Deterministic: equal records encrypt equally
+    assert siv.encrypt_batch([b"key", b"key"]) == [siv.encrypt(b"key")] * 2
+
+
+def test_siv_errors():
+    siv = SIV(bytes(range(32)))
+    cts = siv.encrypt_batch([b"a", b"b", b"c"], [b"x", b"y", b"z"])
+    with pytest.raises(ValueError, match="1 of 3 records"):
+        siv.decrypt_batch(cts, [b"x", b"y", b"Z"])
+    with pytest.raises(ValueError, match="authentication failed"):
+        siv.decrypt(cts[0])
+    with pytest.raises(ValueError, match="16-byte IV"):
+        siv.decrypt(bytes(15))
+    with pytest.raises(ValueError, match="one entry per record"):
+        siv.encrypt_batch([b"a", b"b"], [b"x"])
+    with pytest.raises(ValueError, match="At most 126"):
+        siv.encrypt(b"", *[b""] * 127)
+    with pytest.raises(ValueError, match="32, 48, or 64"):
+        SIV(bytes(16))
+    with pytest.raises(TypeError, match="`plaintext` must be bytes"):
+        siv.encrypt("a")  # ty: ignore[invalid-argument-type]
@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.aio import CTRStreamReader, CTRStreamWriter, decrypt, encrypt
+
+KEY = bytes(range(16))
+IV = bytes(range(100, 116))
+# Small tiles so that a few KiB exercise the tiled paths
+TILING = {"inline_bytes": 256, "tile_bytes": 1024}
+
+
+@pytest.mark.parametrize(
+    ("mode", "padding", "iv", "size"),
+    [
+        ("ecb", None, None, 5008),
+        ("ecb", "pkcs7", None, 5000),
+        ("ctr", None, IV, 5001),
+        ("cfb", None, IV, 5003),
+        ("ofb", None, IV, 5005),
+        ("ecb", None, None, 96),
+    ],
+)
+def test_matches_sync(mode, padding, iv, size):
+    cipher = AES(KEY)
+    plaintext = np.random.default_rng(size).bytes(size)
+    expected = cipher.encrypt(plaintext, padding, mode=mode, iv=iv)
+
+    async def main():
+        ct = await encrypt(cipher, plaintext, padding, mode=mode, iv=iv, **TILING)
+        pt = await decrypt(cipher, ct, padding, mode=mode, iv=iv, **TILING)
+        return ct, pt
+
+    ct, pt = asyncio.run(main())
+    assert ct == expected
+    assert pt == plaintext
+
+
+def test_methods():
+    cipher = AES(KEY)
+    plaintext = bytes(200_000)
+
+    async def main():
+        ct = await cipher.encrypt_async(plaintext, mode="ctr", iv=IV)
+        return ct, await cipher.decrypt_async(ct, mode="ctr", iv=IV)
+
+    ct, pt = asyncio.run(main())
+    assert ct == cipher.encrypt(plaintext, mode="ctr", iv=IV)
+    assert pt == plaintext
+
+
+def test_errors():
+    cipher = AES(KEY)
+    with pytest.raises(ValueError, match="multiple of 16"):
+        asyncio.run(encrypt(cipher, bytes(1000), **TILING))
+    with pytest.raises(ValueError, match="`tile_bytes`"):
+        asyncio.run(encrypt(cipher, bytes(1024), inline_bytes=0, tile_bytes=10))
+    with pytest.raises(ValueError, match="Invalid PKCS#7"):
+        asyncio.run(decrypt(cipher, bytes(1024), "pkcs7", **TILING))
+    # Inputs above `inline_bytes` are checked as the sync methods check them
+    with pytest.raises(TypeError, match="`plaintext` must be bytes"):
+        asyncio.run(encrypt(cipher, bytearray(1024), **TILING))  # ty: ignore[invalid-argument-type]
+    with pytest.raises(TypeError, match="`ciphertext` must be bytes"):
+        asyncio.run(decrypt(cipher, memoryview(bytes(1024)), **TILING))  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match=r"len\(iv\) must be 16 bytes"):
+        asyncio.run(encrypt(cipher, bytes(1024), mode="ctr", iv=bytes(8), **TILING))
+    with pytest.raises(ValueError, match=r"len\(iv\) must be 16 bytes"):
+        asyncio.run(decrypt(cipher, bytes(1024), mode="cfb", iv=bytes(17), **TILING))
+    with pytest.raises(ValueError, match="does not use padding"):
+        asyncio.run(encrypt(cipher, bytes(1024), "pkcs7", mode="ctr", iv=IV, **TILING))
+    with pytest.raises(ValueError, match="`mode` must be"):
+        asyncio.run(decrypt(cipher, bytes(1024), mode="xts", **TILING))  # ty: ignore[invalid-argument-type]
+
+
+def test_stream_loopback():
+    cipher = AES(KEY)
+    chunks = [np.random.default_rng(i).bytes(n) for i, n in enumerate((1, 15, 300, 4000, 7))]
+    plaintext = b"".join(chunks)
+
+    async def main():
+        received = asyncio.get_running_loop().create_future()
+
+        async def handle(reader, writer):
+            r = CTRStreamReader(reader, cipher, IV, inline_bytes=256)
+            first = await r.readexactly(100)
+            received.set_result(first + await r.read())
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            w = CTRStreamWriter(writer, cipher, IV, inline_bytes=256)
+            for chunk in chunks:
+                await w.write(chunk)
+            w.close()
+            await w.wait_closed()
+            return await received
+
+    assert asyncio.run(main()) == plaintext
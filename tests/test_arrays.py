@@ -0,0 +1,249 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+import npaes
+from npaes import AES, arrays, metrics
+from npaes.arrays import (
+    TAG_BYTES,
+    decrypt_array,
+    encrypt_array,
+    load_encrypted,
+    save_encrypted,
+)
+
+KEY = bytes(range(16))
+
+ARRAYS = {
+    "float64": np.random.default_rng(0).random((300, 7)),
+    "int16-3d": np.arange(2 * 50 * 3, dtype=np.int16).reshape(50, 2, 3),
+    "fortran": np.asfortranarray(np.arange(60, dtype=np.uint32).reshape(12, 5)),
+    "structured": np.array([(i, i / 2) for i in range(40)], dtype=[("a", "<i4"), ("b", ">f8")]),
+    "0d": np.array(3.5),
+    "empty": np.zeros((0, 4)),
+    "empty-rows": np.zeros((3, 0)),
+}
+
+
+@pytest.mark.parametrize("name", ARRAYS)
+@pytest.mark.parametrize("mode", ["gcm", "ctr"])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_roundtrip(tmp_path, name, mode, mmap):
+    arr = ARRAYS[name]
+    path = tmp_path / "x.npaes"
+    save_encrypted(path, arr, KEY, mode=mode, chunk_bytes=256)
+    with load_encrypted(path, AES(KEY), mmap) as x:
+        assert x.shape == arr.shape
+        assert x.dtype == arr.dtype
+        assert x.nbytes == arr.nbytes
+        assert_array_equal(np.asarray(x), arr)
+    assert arr.tobytes() not in path.read_bytes() or not arr.nbytes
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        0,
+        -1,
+        np.int64(7),
+        slice(10, 20),
+        slice(None, None, -7),
+        (slice(5, 9), 3),
+        (4, slice(1, None)),
+        [3, 250, 3, -1],
+        np.array([[1, 2], [299, 0]]),
+        (np.array([1, 2]), np.array([0, 6])),
+        np.arange(300) % 3 == 0,
+        (Ellipsis, 2),
+        (None, 5),
+        (),
+    ],
+)
+def test_indexing_matches_numpy(tmp_path, index):
+    arr = ARRAYS["float64"]
+    save_encrypted(tmp_path / "x", arr, KEY, chunk_bytes=512)
+    x = load_encrypted(tmp_path / "x", KEY)
+    assert_array_equal(x[index], arr[index])
+
+
+def test_decrypts_only_touched_chunks(tmp_path):
+    arr = np.arange(1000 * 8, dtype=np.float64).reshape(1000, 8)  # 64-byte rows
+    save_encrypted(tmp_path / "x", arr, KEY, chunk_bytes=640)  # 10 rows per chunk
+    x = load_encrypted(tmp_path / "x", KEY, cache_chunks=4)
+    assert x.chunk_rows == 10
+    assert x.nchunks == 100
+    assert_array_equal(x[105:112], arr[105:112])
+    assert list(x._cache) == [10, 11]
+    assert_array_equal(x[[999, 0]], arr[[999, 0]])
+    assert list(x._cache) == [10, 11, 0, 99]
+    x[125]
+    assert list(x._cache) == [11, 0, 99, 12]  # Least recently used first out
+
+
+def test_index_errors(tmp_path):
+    save_encrypted(tmp_path / "x", np.zeros((5, 2)), KEY)
+    x = load_encrypted(tmp_path / "x", KEY)
+    assert len(x) == 5
+    with pytest.raises(IndexError, match="out of bounds"):
+        x[5]
+    with pytest.raises(IndexError):
+        x[[0, 7]]
+    with pytest.raises(IndexError, match="boolean index"):
+        x[np.ones(4, dtype=bool)]
+    with pytest.raises(ValueError, match="without a copy"):
+        np.array(x, copy=False)
+    x.close()
+    with pytest.raises(ValueError, match="closed"):
+        x[0]
+
+
+def test_gcm_detects_tampering(tmp_path):
+    arr = np.arange(100, dtype=np.int64)
+    path = tmp_path / "x"
+    save_encrypted(path, arr, KEY, chunk_bytes=80)
+    raw = bytearray(path.read_bytes())
+    header = len(raw) - arr.nbytes - 10 * TAG_BYTES
+    stride = 80 + TAG_BYTES
+
+    tampered = raw.copy()
+    tampered[header + 3 * stride + 5] ^= 1
+    path.write_bytes(tampered)
+    x = load_encrypted(path, KEY)
+    assert_array_equal(x[:30], arr[:30])  # Chunks 0-2 are intact
+    with pytest.raises(ValueError, match="authentication failed"):
+        x[35]
+
+    swapped = raw.copy()
+    first, second = slice(header, header + stride), slice(header + stride, header + 2 * stride)
+    swapped[first], swapped[second] = raw[second], raw[first]
+    path.write_bytes(swapped)
+    with pytest.raises(ValueError, match="authentication failed"):
+        load_encrypted(path, KEY)[0]
+
+    altered = raw.replace(b"'int64'", b"'uint64'", 1).replace(b"'<i8'", b"'<u8'", 1)
+    path.write_bytes(altered)
+    with pytest.raises(ValueError, match="authentication failed"):
+        load_encrypted(path, KEY)[0]
+
+    path.write_bytes(raw)
+    with pytest.raises(ValueError, match="authentication failed"):
+        load_encrypted(path, bytes(16))[0]
+
+
+def test_bad_files(tmp_path):
+    path = tmp_path / "x"
+    save_encrypted(path, np.zeros(100), KEY)
+    raw = path.read_bytes()
+    with pytest.raises(ValueError, match="128-bit key"):
+        load_encrypted(path, bytes(32))
+    path.write_bytes(raw[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        load_encrypted(path, KEY)
+    path.write_bytes(b"\x93NUMPY" + raw[6:])
+    with pytest.raises(ValueError, match="Not an npaes"):
+        load_encrypted(path, KEY)
+    with pytest.raises(ValueError, match="objects"):
+        save_encrypted(path, np.array([object()]), KEY)
+    with pytest.raises(ValueError, match="`mode`"):
+        save_encrypted(path, np.zeros(1), KEY, mode="ecb")  # ty: ignore[invalid-argument-type]
+
+
+def test_header_is_aligned(tmp_path):
+    save_encrypted(tmp_path / "x", np.zeros(3), KEY, mode="ctr")
+    assert (tmp_path / "x").stat().st_size % 64 == 24
+
+
+def test_exported_lazily():
+    assert npaes.save_encrypted is arrays.save_encrypted
+    assert npaes.load_encrypted is arrays.load_encrypted
+    assert npaes.encrypt_array is arrays.encrypt_array
+    with pytest.raises(AttributeError, match="no attribute 'nope'"):
+        npaes.nope  # noqa: B018
+
+
+IV = bytes(range(16, 32))
+
+
+@pytest.mark.parametrize("name", ["float64", "int16-3d", "structured", "0d"])
+@pytest.mark.parametrize("mode", ["ctr", "cfb", "ofb"])
+def test_encrypt_array_matches_encrypt(name, mode):
+    arr = np.ascontiguousarray(ARRAYS[name])
+    cipher = AES(KEY, tile_blocks=16)  # Several CTR tiles for the larger arrays
+    enc = encrypt_array(cipher, arr, mode=mode, iv=IV)
+    assert enc.shape == arr.shape
+    assert enc.dtype == arr.dtype
+    assert enc.tobytes() == cipher.encrypt(arr.tobytes(), mode=mode, iv=IV)
+    assert_array_equal(decrypt_array(cipher, enc, mode=mode, iv=IV), arr)
+    raw = decrypt_array(cipher, enc.tobytes(), mode=mode, iv=IV, dtype=arr.dtype, shape=arr.shape)
+    assert_array_equal(raw, arr)
+
+
+def test_encrypt_array_ecb():
+    arr = np.arange(64, dtype=np.float32).reshape(4, 16)
+    cipher = AES(KEY)
+    enc = encrypt_array(cipher, arr)
+    assert enc.tobytes() == cipher.encrypt(arr.tobytes())
+    assert_array_equal(decrypt_array(cipher, enc.data, dtype=np.float32, shape=(4, 16)), arr)
+    assert decrypt_array(cipher, enc.tobytes()).dtype == np.uint8
+    with pytest.raises(ValueError, match="multiple of 16"):
+        encrypt_array(cipher, np.zeros(3))
+    with pytest.raises(ValueError, match="does not take an `iv`"):
+        encrypt_array(cipher, arr, iv=IV)
+
+
+@pytest.mark.parametrize(
+    ("mode", "size", "limit"),
+    # The per-block modes are slow, so they get a smaller array, and a
+    # looser bound since fixed overheads loom larger; a copy is still over it
+    [("ecb", 1 << 18, 4), ("ctr", 1 << 18, 4), ("cfb", 1 << 12, 2), ("ofb", 1 << 12, 2)],
+)
+def test_encrypt_array_in_place(mode, size, limit):
+    arr = np.random.default_rng(0).random(size)  # 2 MiB, or 32 KiB
+    expected = arr.copy()
+    cipher = AES(KEY, tile_blocks=size // 256)  # 64 tiles
+    iv = None if mode == "ecb" else IV
+    encrypt_array(cipher, arr[:16], mode=mode, iv=iv)  # Build lookup tables first
+    expected_ciphertext = cipher.encrypt(arr.tobytes(), mode=mode, iv=iv)
+    tracemalloc.start()
+    try:
+        assert encrypt_array(cipher, arr, mode=mode, iv=iv, out=arr) is arr
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < arr.nbytes // limit  # Engine scratch for one tile, no copy of the array
+    assert arr.tobytes() == expected_ciphertext
+    decrypt_array(cipher, arr, mode=mode, iv=iv, out=arr)
+    assert_array_equal(arr, expected)
+
+
+def test_metered_datetime_array():
+    arr = np.arange(4).astype("M8[D]")  # No buffer interface
+    metrics.reset()
+    metrics.enable()
+    try:
+        enc = encrypt_array(AES(KEY), arr, mode="ctr", iv=IV)
+        (series,) = [s for s in metrics.snapshot()["series"] if s["entry"] == "encrypt_array"]
+    finally:
+        metrics.disable()
+        metrics.reset()
+    assert enc.dtype == arr.dtype
+    assert series["bytes"] == arr.nbytes
+    assert_array_equal(decrypt_array(AES(KEY), enc, mode="ctr", iv=IV), arr)
+
+
+def test_encrypt_array_errors():
+    cipher = AES(KEY)
+    with pytest.raises(ValueError, match="C-contiguous"):
+        encrypt_array(cipher, np.zeros((4, 4))[:, ::2], mode="ctr", iv=IV)
+    with pytest.raises(ValueError, match="Python objects"):
+        encrypt_array(cipher, np.array([None]), mode="ctr", iv=IV)
+    with pytest.raises(ValueError, match="requires an `iv`"):
+        encrypt_array(cipher, np.zeros(3), mode="ctr")
+    with pytest.raises(ValueError, match="`mode`"):
+        encrypt_array(cipher, np.zeros(2), mode="cbc")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="`out` must have 16 bytes"):
+        encrypt_array(cipher, np.zeros(2), out=np.zeros(3))
+    with pytest.raises(ValueError, match="whole number"):
+        decrypt_array(cipher, bytes(20), mode="ctr", iv=IV, dtype=np.float64)
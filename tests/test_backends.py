@@ -0,0 +1,196 @@
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+from numpy import array_equal, uint8
+
+from npaes import AES, backends, key_schedule
+from npaes.backends import (
+    Backend,
+    available_backends,
+    calibrate,
+    get_backend,
+    register_backend,
+    select_backend,
+)
+
+from .test_npaes import aes128_vectors, aes192_vectors, aes256_vectors
+
+ALL_BACKENDS = available_backends()
+
+
+def test_registered_backends():
+    assert {"reference", "vectorized", "ttable"} <= set(ALL_BACKENDS)
+
+
+@pytest.mark.parametrize("name", ALL_BACKENDS)
+@pytest.mark.parametrize("vectors", [aes128_vectors, aes192_vectors, aes256_vectors])
+def test_fips197_appendix_c(name, vectors):
+    plaintext, key, ciphertext = map(bytes.fromhex, (vectors[0], vectors[1], vectors[-1]))
+    cipher = AES(key, backend=name)
+    assert cipher.encrypt(plaintext) == ciphertext
+    assert cipher.decrypt(ciphertext) == plaintext
+
+
+@pytest.mark.parametrize("name", ALL_BACKENDS)
+@pytest.mark.parametrize("keylen", [16, 24, 32])
+def test_matches_reference(name, keylen):
+    rng = np.random.default_rng(keylen)
+    key = rng.bytes(keylen)
+    msg = rng.bytes(16 * 37)
+    expected = AES(key, backend="reference").encrypt(msg)
+    cipher = AES(key, backend=name)
+    assert cipher.encrypt(msg) == expected
+    assert cipher.decrypt(expected) == msg
+
+
+@pytest.mark.parametrize("name", ALL_BACKENDS)
+def test_per_block_schedules(name):
+    rng = np.random.default_rng(0)
+    keys = [rng.bytes(32) for _ in range(5)]
+    blocks = rng.integers(0, 256, (5, 16), dtype=uint8)
+    schedules = np.stack([key_schedule(k) for k in keys])
+    backend = get_backend(name)
+    out = backend.encrypt_blocks(blocks, schedules)
+    for k, b, c in zip(keys, blocks, out, strict=True):
+        assert AES(k, backend="reference").encrypt(b.tobytes()) == c.tobytes()
+    assert array_equal(backend.decrypt_blocks(out, schedules), blocks)
+
+
+@pytest.mark.parametrize("name", ALL_BACKENDS)
+def test_inplace(name):
+    blocks = np.arange(64, dtype=uint8).reshape(4, 16)
+    schedule = key_schedule(bytes(16))
+    expected = get_backend("reference").encrypt_blocks(blocks, schedule)
+    backend = get_backend(name)
+    assert backend.encrypt_blocks(blocks, schedule, out=blocks) is blocks
+    assert array_equal(blocks, expected)
+
+
+@pytest.mark.parametrize("name", ["vectorized", "ttable"])
+@pytest.mark.parametrize("tile_blocks", [1, 7, 64])
+def test_tiled(name, tile_blocks):
+    key = bytes(range(16))
+    blocks = np.random.default_rng(tile_blocks).integers(0, 256, (100, 16), dtype=uint8)
+    expected = AES(key, backend=name).encrypt_blocks(blocks)
+    cipher = AES(key, backend=name, tile_blocks=tile_blocks)
+    assert array_equal(cipher.encrypt_blocks(blocks), expected)
+    out = blocks.copy()
+    assert cipher.decrypt_blocks(expected, out=out) is out
+    assert array_equal(out, blocks)
+    assert cipher.encrypt_blocks(out, out=out) is out
+    assert array_equal(out, expected)
+
+
+def test_tiled_memory_is_bounded():
+    blocks = np.zeros((1 << 16, 16), dtype=uint8)
+    cipher = AES(bytes(16), backend="ttable", max_memory=1 << 20)
+    assert cipher.tile_blocks == (1 << 20) // 128
+    tracemalloc.start()
+    try:
+        cipher.encrypt_blocks(blocks, out=blocks)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 1 << 20  # Untiled, about 7 MiB
+
+
+def test_tiled_mode_memory_is_output_bound():
+    # A bytes-returning entry point still allocates its output, but not
+    # the engine's temporaries for the whole input
+    data = bytes(1 << 22)
+    cipher = AES(bytes(16), backend="ttable", max_memory=1 << 20)
+    tracemalloc.start()
+    try:
+        cipher.encrypt(data, mode="ctr", iv=bytes(16))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 * len(data) + (1 << 20)  # Untiled, about 8 times the input
+
+
+def test_tiling_arguments():
+    with pytest.raises(ValueError, match="`tile_blocks` must be at least 1"):
+        AES(bytes(16), tile_blocks=0)
+    with pytest.raises(ValueError, match="at most one"):
+        AES(bytes(16), tile_blocks=16, max_memory=1 << 20)
+    with pytest.raises(ValueError, match="`max_memory` must be at least 128"):
+        AES(bytes(16), max_memory=100)
+    with pytest.raises(ValueError, match="`out` must have shape"):
+        AES(bytes(16), tile_blocks=1).encrypt_blocks(np.zeros((2, 16), uint8), np.zeros(32, uint8))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown backend"):
+        AES(bytes(16), backend="nope")
+
+
+def test_decrypt_length():
+    with pytest.raises(ValueError, match="multiple of 16"):
+        AES(bytes(16)).decrypt(bytes(15))
+
+
+def test_calibrate_writes_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv("NPAES_CACHE_DIR", str(tmp_path))
+    result = calibrate(sizes=(1, 8), repeat=1)
+    assert result[0][0] == 0
+    cached = json.loads((tmp_path / "thresholds.json").read_text())
+    assert [tuple(t) for t in cached["thresholds"]] == result
+    # A fresh process would read the file back rather than re-measure
+    monkeypatch.setattr(backends, "_thresholds", None)
+    assert backends.thresholds() == result
+
+
+def test_stale_cache_is_ignored(monkeypatch, tmp_path):
+    monkeypatch.setenv("NPAES_CACHE_DIR", str(tmp_path))
+    (tmp_path / "thresholds.json").write_text(
+        json.dumps({"fingerprint": "old", "thresholds": [[0, "reference"]]})
+    )
+    monkeypatch.setattr(backends, "_thresholds", None)
+    assert backends._load_thresholds() is None
+
+
+@pytest.mark.parametrize(
+    "thresholds",
+    [None, 5, [5], [[0]], [["zero", "ttable"]], [[0, "ttable", 1]], {"0": "ttable"}],
+)
+def test_malformed_cache_recalibrates(monkeypatch, tmp_path, thresholds):
+    monkeypatch.setenv("NPAES_CACHE_DIR", str(tmp_path))
+    cached = {"fingerprint": backends._fingerprint()}
+    if thresholds is not None:
+        cached["thresholds"] = thresholds
+    (tmp_path / "thresholds.json").write_text(json.dumps(cached))
+    monkeypatch.setattr(backends, "_thresholds", None)
+    assert backends._load_thresholds() is None
+    calls = []
+    monkeypatch.setattr(backends, "calibrate", lambda: calls.append(1) or [(0, "ttable")])
+    assert AES(bytes(16)).encrypt(bytes(16)) == AES(bytes(16), backend="ttable").encrypt(bytes(16))
+    assert calls == [1]
+
+
+def test_select_backend(monkeypatch):
+    monkeypatch.setattr(backends, "_thresholds", [(0, "vectorized"), (8, "ttable")])
+    assert select_backend(1).name == "vectorized"
+    assert select_backend(7).name == "vectorized"
+    assert select_backend(8).name == "ttable"
+    assert select_backend(1, "reference").name == "reference"
+
+
+def test_register_backend(monkeypatch):
+    monkeypatch.setattr(backends, "_registry", dict(backends._registry))
+    monkeypatch.setattr(backends, "_auto_names", list(backends._auto_names))
+
+    class Double(Backend):
+        name = "double-vectorized"
+
+        def encrypt_blocks(self, blocks, schedule, out=None):
+            return get_backend("vectorized").encrypt_blocks(blocks, schedule, out=out)
+
+    register_backend(Double(), auto=False)
+    assert "double-vectorized" in available_backends()
+    assert "double-vectorized" not in backends._auto_names
+    expected = AES(bytes(16)).encrypt(bytes(16))
+    assert AES(bytes(16), backend="double-vectorized").encrypt(bytes(16)) == expected
+    with pytest.raises(ValueError, match="Invalid backend name"):
+        register_backend(Backend())
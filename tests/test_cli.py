@@ -0,0 +1,139 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+from npaes import AES
+from npaes.cli import _HEADER, TAG_BYTES, _size, decrypt_stream, encrypt_stream, main
+
+KEY = bytes(range(16))
+DATA = os.urandom(1000)
+
+
+def _encrypt(data, **kwargs):
+    out = io.BytesIO()
+    assert encrypt_stream(io.BytesIO(data), out, AES(KEY), **kwargs) == len(data)
+    return out.getvalue()
+
+
+def _decrypt(blob, key=KEY, **kwargs):
+    out = io.BytesIO()
+    assert decrypt_stream(io.BytesIO(blob), out, AES(key), **kwargs) == len(out.getvalue())
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("mode", ["gcm", "ctr"])
+@pytest.mark.parametrize("size", [0, 1, 100, 1000])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_roundtrip(mode, size, workers):
+    blob = _encrypt(DATA[:size], mode=mode, chunk_size=100, workers=workers)
+    assert _decrypt(blob, workers=workers) == DATA[:size]
+    nonce = 16 if mode == "ctr" else 8
+    tags = (-(-size // 100) or 1) if mode == "gcm" else 0  # An empty stream has one empty chunk
+    assert len(blob) == _HEADER.size + nonce + size + TAG_BYTES * tags
+
+
+def test_ctr_matches_encrypt():
+    blob = _encrypt(DATA, mode="ctr", chunk_size=48)
+    iv = blob[_HEADER.size : _HEADER.size + 16]
+    assert blob[_HEADER.size + 16 :] == AES(KEY).encrypt(DATA, mode="ctr", iv=iv)
+
+
+def test_gcm_detects_tampering():
+    blob = _encrypt(DATA, chunk_size=100)
+    start = _HEADER.size + 8
+    record = 100 + TAG_BYTES
+    flipped = bytearray(blob)
+    flipped[start + 3 * record + 7] ^= 1
+    with pytest.raises(ValueError, match="Chunk 3 of the stream failed"):
+        _decrypt(bytes(flipped))
+    swapped = blob[:start] + blob[start + record : start + 2 * record] + blob[start + record :]
+    with pytest.raises(ValueError, match="Chunk 0"):
+        _decrypt(swapped)
+    with pytest.raises(ValueError, match="Chunk 8"):
+        _decrypt(blob[: start + 9 * record])  # Cut at a chunk boundary
+    with pytest.raises(ValueError, match="Chunk 9"):
+        _decrypt(blob[:-1])
+    with pytest.raises(ValueError, match="Chunk 0"):
+        _decrypt(blob, key=bytes(16))
+    with pytest.raises(ValueError, match="Not an npaes stream"):
+        _decrypt(b"NPAESX" + blob[6:])
+    with pytest.raises(ValueError, match="Truncated npaes stream header"):
+        _decrypt(blob[: _HEADER.size + 3])
+
+
+def test_arguments():
+    with pytest.raises(ValueError, match="`chunk_size`"):
+        _encrypt(DATA, chunk_size=0)
+    with pytest.raises(ValueError, match="`workers`"):
+        _encrypt(DATA, workers=0)
+    with pytest.raises(ValueError, match="`mode`"):
+        _encrypt(DATA, mode="ecb")  # ty: ignore[invalid-argument-type]
+    assert _size("4096") == 4096
+    assert _size("64k") == 64 * 1024
+    assert _size("2M") == 2 << 20
+
+
+def test_main_files(tmp_path, capsys):
+    key = tmp_path / "key"
+    key.write_bytes(os.urandom(32))
+    plain, enc, dec = tmp_path / "plain", tmp_path / "enc", tmp_path / "dec"
+    plain.write_bytes(DATA)
+    args = ["--key-file", str(key), "--chunk-size", "256", "--workers", "2"]
+    assert main(["encrypt", *args, "-i", str(plain), "-o", str(enc)]) == 0
+    assert "MB/s" in capsys.readouterr().err
+    assert main(["decrypt", *args, "-i", str(enc), "-o", str(dec), "-q"]) == 0
+    assert not capsys.readouterr().err
+    assert dec.read_bytes() == DATA
+    enc.write_bytes(enc.read_bytes()[:-1])
+    assert main(["decrypt", *args, "-i", str(enc), "-o", str(dec)]) == 1
+    assert "failed authentication" in capsys.readouterr().err
+    key.write_bytes(bytes(5))
+    with pytest.raises(SystemExit):
+        main(["encrypt", "--key-file", str(key)])
+    assert "16, 24, or 32 bytes" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    ("option", "value", "message"),
+    [
+        ("--chunk-size", "0", "at least 1 byte"),
+        ("--chunk-size", "5G", "less than 4 GiB"),
+        ("--tile-size", "0K", "at least 1 byte"),
+        ("--workers", "0", "at least 1"),
+        ("--workers", "two", "invalid worker count"),
+    ],
+)
+def test_main_rejects_bad_sizes_before_opening(tmp_path, capsys, option, value, message):
+    key, plain, enc = tmp_path / "key", tmp_path / "plain", tmp_path / "enc"
+    key.write_bytes(KEY)
+    plain.write_bytes(DATA)
+    with pytest.raises(SystemExit):
+        main(["encrypt", "--key-file", str(key), option, value, "-i", str(plain), "-o", str(enc)])
+    err = capsys.readouterr().err
+    assert f"argument {option}" in err
+    assert message in err
+    assert not enc.exists()
+
+
+def test_python_m_pipe():
+    env = {**os.environ, "NPAES_TEST_KEY": KEY.hex()}
+    command = [sys.executable, "-m", "npaes", "--key-env", "NPAES_TEST_KEY", "-q"]
+    enc = subprocess.run(
+        [*command[:3], "encrypt", *command[3:]],
+        input=DATA,
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    dec = subprocess.run(
+        [*command[:3], "decrypt", *command[3:]],
+        input=enc.stdout,
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    assert dec.stdout == DATA
+    assert not dec.stderr
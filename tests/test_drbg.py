@@ -0,0 +1,188 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.drbg import CTRDRBG, MAX_REQUEST_BYTES
+
+
+class SpecDRBG:
+    """A block-at-a-time transcription of SP 800-90A, section 10.2.1."""
+
+    def __init__(self, entropy, nonce, personalization, keylen, df):
+        self.keylen, self.seedlen, self.df = keylen, keylen + 16, df
+        self.key, self.v = bytes(keylen), 0
+        self.update(self.material(entropy + nonce, personalization))
+
+    def xor(self, a, b):
+        return bytes(x ^ y for x, y in zip(a, b, strict=True))
+
+    def material(self, entropy, additional):
+        if self.df:
+            return self.block_cipher_df(entropy + additional)
+        return self.xor(entropy, additional.ljust(self.seedlen, b"\0"))
+
+    def block_cipher_df(self, data):
+        s = len(data).to_bytes(4, "big") + self.seedlen.to_bytes(4, "big") + data + b"\x80"
+        s += bytes(-len(s) % 16)
+        k = AES(bytes(range(self.keylen)))
+        temp = b""
+        i = 0
+        while len(temp) < self.seedlen:
+            chain = bytes(16)
+            iv_s = i.to_bytes(4, "big") + bytes(12) + s
+            for j in range(0, len(iv_s), 16):
+                chain = k.encrypt(self.xor(chain, iv_s[j : j + 16]))
+            temp += chain
+            i += 1
+        cipher, x = AES(temp[: self.keylen]), temp[self.keylen : self.seedlen]
+        temp = b""
+        while len(temp) < self.seedlen:
+            x = cipher.encrypt(x)
+            temp += x
+        return temp[: self.seedlen]
+
+    def blocks(self, n):
+        cipher, temp = AES(self.key), b""
+        while len(temp) < n:
+            self.v = (self.v + 1) % 2**128
+            temp += cipher.encrypt(self.v.to_bytes(16, "big"))
+        return temp[:n]
+
+    def update(self, provided):
+        temp = self.xor(self.blocks(self.seedlen), provided)
+        self.key, self.v = temp[: self.keylen], int.from_bytes(temp[self.keylen :], "big")
+
+    def generate(self, n, additional=b""):
+        if additional:
+            additional = (
+                self.material(b"", additional) if self.df else additional.ljust(self.seedlen, b"\0")
+            )
+            self.update(additional)
+        else:
+            additional = bytes(self.seedlen)
+        out = self.blocks(n)
+        self.update(additional)
+        return out
+
+
+@pytest.mark.parametrize("key_bytes", [16, 24, 32])
+@pytest.mark.parametrize("derivation", [True, False])
+def test_matches_spec(key_bytes, derivation):
+    rng = np.random.default_rng(key_bytes)
+    if derivation:
+        entropy, nonce, pers = rng.bytes(37), rng.bytes(11), rng.bytes(5)
+    else:
+        entropy, nonce, pers = rng.bytes(key_bytes + 16), b"", rng.bytes(7)
+    ours = CTRDRBG(entropy, nonce, pers, key_bytes=key_bytes, derivation=derivation)
+    spec = SpecDRBG(entropy, nonce, pers, key_bytes, derivation)
+    assert ours.generate(0) == b""  # No request at all
+    for n, additional in [(1, b""), (64, b"extra"), (100, b"")]:
+        assert ours.generate(n, additional) == spec.generate(n, additional)
+    reseed = rng.bytes(key_bytes + 16)
+    ours.reseed(reseed, b"more")
+    spec.update(spec.material(reseed, b"more"))
+    assert ours.generate(33) == spec.generate(33)
+
+
+@pytest.mark.parametrize(
+    ("entropy", "personalization", "reseed", "reseed_input", "input1", "input2", "expected"),
+    [
+        # NIST CAVP CTR_DRBG, AES-256 no df, PredictionResistance = False
+        (
+            "e4bc23c5089a19d86f4119cb3fa08c0a4991e0a1def17e101e4c14d9c323460a"
+            "7c2fb58e0b086c6c57b55f56cae25bad",
+            "",
+            "fd85a836bba85019881e8c6bad23c9061adc75477659acaea8e4a01dfe07a183"
+            "2dad1c136f59d70f8653a5dc118663d6",
+            "",
+            "",
+            "",
+            "b2cb8905c05e5950ca31895096be29ea3d5a3b82b269495554eb80fe07de43e1"
+            "93b9e7c3ece73b80e062b1c1f68202fbb1c52a040ea2478864295282234aaada",
+        ),
+        (
+            "ae7ebe062971f5eb32e5b21444750785de816595ad2cbe80a209c8f8ab04b546"
+            "8166de8c6ae522d8f10b56386a3b424f",
+            "55860dae57fcac297087c137efb796878a75868f6e7681114e9b73ed0c67e3c6"
+            "2bfc9f5d77e8caa59bcdb223f4ffd247",
+            "a42407931bfeca70e6ee5dd197021a129525051c07468e8b25587c5ad50abe92"
+            "04e882fe847b8fd47cf7b4360e5aa034",
+            "ee4c88d1eb05f4853663eada501d2fc4b4984b283a88db579af2113031e03d9b"
+            "c570de943dd168918f3ba8065581fea7",
+            "4b4b03ef19b0f259dca2b3ee3ae4cd86c3895a784b3d8eee043a2003c08289f8"
+            "fffdad141e6b1ab2174d8d5d79c1e581",
+            "3062b33f116b46e20fe3c354726ae9b2a3a4c51922c8107863cb86f1f0bdad75"
+            "54075659d91c371e2b11b1e8106a1ed5",
+            "0d270518baeafac160ff1cb28c11ef68712c764c0c01674e6c9ca2cc9c7e0e8a"
+            "ccfd3c753635ee070081eee7628af6187fbc2854b3c204461a796cf3f3fcb092",
+        ),
+    ],
+)
+def test_cavp_vectors(entropy, personalization, reseed, reseed_input, input1, input2, expected):
+    h = bytes.fromhex
+    drbg = CTRDRBG(h(entropy), personalization=h(personalization), derivation=False)
+    drbg.reseed(h(reseed), h(reseed_input))
+    drbg.generate(64, h(input1))
+    assert drbg.generate(64, h(input2)) == h(expected)
+
+
+def test_known_answer_without_reseed():
+    # BoringSSL's CTRDRBGTest.Large: AES-256 no df, all-zero seed, one
+    # maximum-size request
+    out = CTRDRBG(bytes(48), derivation=False).generate(MAX_REQUEST_BYTES)
+    assert hashlib.sha256(out).hexdigest() == (
+        "69781596cac03f6a6ded221e26d07549a04b91583cf4e36dff41bfb9f8a81c2b"
+    )
+
+
+def test_deterministic_and_split_into_requests():
+    a, b = CTRDRBG(b"seed"), CTRDRBG(b"seed")
+    big = a.generate(MAX_REQUEST_BYTES + 100)
+    assert big[:MAX_REQUEST_BYTES] == b.generate(MAX_REQUEST_BYTES)
+    assert big[MAX_REQUEST_BYTES:] == b.generate(100)
+    assert a.reseed_counter == 3
+    assert CTRDRBG(b"other seed").generate(32) != CTRDRBG(b"seed").generate(32)
+
+
+def test_prefetch():
+    direct = CTRDRBG(b"seed")
+    buffered = CTRDRBG(b"seed", prefetch=256)
+    expected = direct.generate(256) + direct.generate(256)
+    got = b"".join(buffered.generate(n) for n in [1, 15, 100, 140, 200])
+    assert got == expected[: len(got)]
+    # Additional input bypasses and discards the buffer
+    assert buffered.generate(10, b"x") == direct.generate(10, b"x")
+    arr = buffered.generate_array(5)
+    assert arr.dtype == np.uint8
+    assert arr.shape == (5,)
+
+
+def test_reseed_interval():
+    rng = CTRDRBG(b"seed", reseed_interval=2)
+    rng.generate(16)
+    rng.generate(16)
+    with pytest.raises(RuntimeError, match="reseed required"):
+        rng.generate(16)
+    rng.reseed(b"fresh entropy")
+    assert len(rng.generate(16)) == 16
+
+
+def test_errors():
+    with pytest.raises(ValueError, match="len\\(entropy\\) must be 48"):
+        CTRDRBG(b"short", derivation=False)
+    with pytest.raises(ValueError, match="nonce is only used"):
+        CTRDRBG(bytes(48), b"nonce", derivation=False)
+    with pytest.raises(ValueError, match="at most 32 bytes"):
+        CTRDRBG(bytes(32), personalization=bytes(33), key_bytes=16, derivation=False)
+    with pytest.raises(ValueError, match="`key_bytes`"):
+        CTRDRBG(b"seed", key_bytes=20)
+    with pytest.raises(ValueError, match="`prefetch`"):
+        CTRDRBG(b"seed", prefetch=-1)
+    with pytest.raises(ValueError, match="`reseed_interval`"):
+        CTRDRBG(b"seed", reseed_interval=0)
+    with pytest.raises(TypeError, match="`entropy` must be bytes"):
+        CTRDRBG("seed")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="non-negative"):
+        CTRDRBG(b"seed").generate(-1)
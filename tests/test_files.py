@@ -0,0 +1,128 @@
+import io
+
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.files import EncryptedFile
+
+KEY = bytes(range(16))
+IV = bytes(range(100, 116))
+
+
+@pytest.fixture
+def blob():
+    plaintext = np.random.default_rng(0).bytes(5000)
+    ciphertext = AES(KEY).encrypt(plaintext, mode="ctr", iv=IV)
+    return plaintext, ciphertext
+
+
+def test_read_all(blob):
+    plaintext, ciphertext = blob
+    with EncryptedFile(io.BytesIO(ciphertext), AES(KEY), IV) as f:
+        assert f.readall() == plaintext
+        assert f.read(10) == b""
+
+
+@pytest.mark.parametrize(("offset", "n"), [(0, 1), (15, 2), (16, 16), (1234, 999), (4990, 100)])
+def test_random_access_read(blob, offset, n):
+    plaintext, ciphertext = blob
+    f = EncryptedFile(io.BytesIO(ciphertext), AES(KEY), IV)
+    assert f.seek(offset) == offset
+    assert f.read(n) == plaintext[offset : offset + n]
+    assert f.tell() == min(offset + n, len(plaintext))
+
+
+def test_readinto(blob):
+    plaintext, ciphertext = blob
+    f = EncryptedFile(io.BytesIO(ciphertext), AES(KEY), IV)
+    f.seek(-100, io.SEEK_END)
+    buf = bytearray(64)
+    assert f.readinto(buf) == 64
+    assert bytes(buf) == plaintext[-100:-36]
+    f.seek(10, io.SEEK_CUR)
+    assert f.read() == plaintext[-26:]
+
+
+def test_only_covering_blocks_are_encrypted(blob, monkeypatch):
+    _, ciphertext = blob
+    cipher = AES(KEY)
+    seen = []
+    encrypt_blocks = cipher.encrypt_blocks
+    monkeypatch.setattr(
+        cipher, "encrypt_blocks", lambda b, out=None: seen.append(len(b)) or encrypt_blocks(b, out)
+    )
+    f = EncryptedFile(io.BytesIO(ciphertext), cipher, IV)
+    f.seek(4000)
+    f.read(20)  # Bytes 4000-4019 span blocks 250 and 251
+    assert seen == [2]
+
+
+def test_write_then_read(blob):
+    plaintext, ciphertext = blob
+    raw = io.BytesIO(ciphertext)
+    f = EncryptedFile(raw, AES(KEY), IV)
+    f.seek(333)
+    assert f.write(b"patched!") == 8
+    expected = plaintext[:333] + b"patched!" + plaintext[341:]
+    assert raw.getvalue() == AES(KEY).encrypt(expected, mode="ctr", iv=IV)
+    f.seek(0)
+    assert f.read() == expected
+    f.seek(len(expected))
+    f.write(b"tail")
+    f.seek(-4, io.SEEK_END)
+    assert f.read() == b"tail"
+    assert f.truncate(10) == 10
+    f.seek(0)
+    assert f.read() == expected[:10]
+
+
+def test_write_would_block(blob):
+    class WouldBlock(io.BytesIO):
+        def write(self, b):
+            return None
+
+    f = EncryptedFile(WouldBlock(blob[1]), AES(KEY), IV)
+    f.seek(333)
+    assert f.write(b"patched!") is None
+    assert f.tell() == 333
+    assert f.read(8) == blob[0][333:341]
+
+
+def test_read_would_block(blob):
+    class WouldBlock(io.BytesIO):
+        def readinto(self, b):
+            return None
+
+    f = EncryptedFile(WouldBlock(blob[1]), AES(KEY), IV)
+    f.seek(333)
+    assert f.readinto(bytearray(8)) is None
+    assert f.tell() == 333
+    assert f.read(8) is None
+    assert io.BufferedReader(f).read(8) is None  # Not b"" (end of file)
+
+
+def test_buffered_wrappers(blob):
+    plaintext, _ = blob
+    raw = io.BytesIO()
+    with io.BufferedWriter(EncryptedFile(raw, AES(KEY), IV, closefd=False)) as w:
+        for i in range(0, len(plaintext), 7):
+            w.write(plaintext[i : i + 7])
+    assert not raw.closed
+    reader = io.BufferedReader(EncryptedFile(io.BytesIO(raw.getvalue()), AES(KEY), IV))
+    assert reader.read() == plaintext
+
+
+def test_errors(blob):
+    _, ciphertext = blob
+    with pytest.raises(ValueError, match="len\\(iv\\)"):
+        EncryptedFile(io.BytesIO(ciphertext), AES(KEY), b"short")
+    f = EncryptedFile(io.BytesIO(ciphertext), AES(KEY), IV)
+    with pytest.raises(ValueError, match="Negative seek"):
+        f.seek(-1)
+    with pytest.raises(ValueError, match="whence"):
+        f.seek(0, 7)
+    f.close()
+    f.close()
+    with pytest.raises(ValueError, match="closed file"):
+        f.read(1)
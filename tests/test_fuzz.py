@@ -0,0 +1,90 @@
+"""Differential fuzzing of every registered backend.
+
+Random (key, block) pairs are drawn in NumPy batches, one key per pair,
+and pushed through every backend in `npaes.backends`.  All engines must
+produce byte-identical ciphertext and round-trip back to the plaintext.
+The "reference" engine (`encrypt_raw()`/`decrypt_raw()` in a loop) is
+far too slow for every pair, so it checks a leading slice of each batch;
+the fast engines are compared against each other on all of it.  Each
+batch is also run with a single shared key, since that is a separate
+broadcasting path through the engines.
+
+The work is split into shards, each with its own seed, so shards can
+run in parallel (e.g. `task fuzz`, or `pytest -n auto` with
+pytest-xdist).  Scale is set through the environment:
+
+    NPAES_FUZZ_PAIRS      total pairs across all shards (default 8000)
+    NPAES_FUZZ_SHARDS     number of shards (default 4)
+    NPAES_FUZZ_BATCH      maximum pairs per batch (default 2000)
+    NPAES_FUZZ_REFERENCE  pairs per batch checked by "reference" (default 8)
+    NPAES_FUZZ_SEED       base seed (default 0)
+
+A failure reports the shard, seed, key and block needed to reproduce it.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from numpy import uint8
+
+from npaes import key_schedule, key_schedules
+from npaes.backends import available_backends, get_backend
+
+PAIRS = int(os.environ.get("NPAES_FUZZ_PAIRS", "8000"))
+SHARDS = int(os.environ.get("NPAES_FUZZ_SHARDS", "4"))
+BATCH = int(os.environ.get("NPAES_FUZZ_BATCH", "2000"))
+REFERENCE = int(os.environ.get("NPAES_FUZZ_REFERENCE", "8"))
+SEED = int(os.environ.get("NPAES_FUZZ_SEED", "0"))
+
+FAST_BACKENDS = tuple(name for name in available_backends() if name != "reference")
+
+
+def _check_same(expected, actual, keys, blocks, what):
+    bad = np.flatnonzero((expected != actual).any(axis=1))
+    if bad.size:
+        i = bad[0]
+        key = keys[i] if keys.ndim == 2 else keys
+        pytest.fail(
+            f"{what}: {bad.size} mismatched blocks; first at {i}:"
+            f" key={bytes(key).hex()} block={bytes(blocks[i]).hex()}"
+            f" expected={bytes(expected[i]).hex()} got={bytes(actual[i]).hex()}"
+        )
+
+
+def _fuzz_batch(keys, blocks, schedule, where):
+    ciphertexts = {}
+    for name in FAST_BACKENDS:
+        backend = get_backend(name)
+        ct = ciphertexts[name] = backend.encrypt_blocks(blocks, schedule)
+        _check_same(blocks, backend.decrypt_blocks(ct, schedule), keys, blocks, f"{where} {name}")
+    expected = ciphertexts[FAST_BACKENDS[0]]
+    for name, ct in ciphertexts.items():
+        _check_same(expected, ct, keys, blocks, f"{where} {name} vs {FAST_BACKENDS[0]}")
+
+    m = min(REFERENCE, len(blocks))
+    ref = get_backend("reference")
+    sub = schedule[:m] if schedule.ndim == 4 else schedule
+    ref_ct = ref.encrypt_blocks(blocks[:m], sub)
+    _check_same(ref_ct, expected[:m], keys, blocks, f"{where} reference")
+    _check_same(blocks[:m], ref.decrypt_blocks(ref_ct, sub), keys, blocks, f"{where} reference")
+
+
+@pytest.mark.parametrize("shard", range(SHARDS), ids=lambda i: f"shard{i}")
+def test_differential(shard):
+    rng = np.random.default_rng([SEED, shard])
+    remaining = PAIRS // SHARDS + (shard < PAIRS % SHARDS)
+    while remaining > 0:
+        # Ragged batch sizes shake out bugs that only hit particular shapes
+        n = min(remaining, int(rng.integers(1, BATCH + 1)))
+        remaining -= n
+        keylens = rng.choice([16, 24, 32], size=n)
+        for keylen in (16, 24, 32):
+            m = int((keylens == keylen).sum())
+            if not m:
+                continue
+            where = f"shard={shard} seed={SEED} AES-{keylen * 8}"
+            keys = rng.integers(0, 256, (m, keylen), dtype=uint8)
+            blocks = rng.integers(0, 256, (m, 16), dtype=uint8)
+            _fuzz_batch(keys, blocks, key_schedules(keys), f"{where} per-pair keys")
+            _fuzz_batch(keys[0], blocks, key_schedule(bytes(keys[0])), f"{where} shared key")
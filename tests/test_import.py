@@ -0,0 +1,40 @@
+"""`import npaes` must stay cheap: no derived tables, no backends module."""
+
+import json
+import subprocess
+import sys
+
+# Generous enough for a slow CI runner; `benchmarks/bench_import.py`
+# tracks the real figure (around 1 ms with bytecode)
+IMPORT_BUDGET_US = 50_000
+
+
+def _run(code):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+def test_import_builds_nothing_eagerly():
+    code = (
+        "import json, sys, npaes\n"
+        "state = {'backends': 'npaes.backends' in sys.modules,"
+        " 'gf': npaes._gf_product_table.cache_info().currsize}\n"
+        "npaes.AES(bytes(16), backend='ttable').encrypt(bytes(16))\n"
+        "from npaes import backends\n"
+        "state['te'] = backends._te.cache_info().currsize\n"
+        "state['td'] = backends._td.cache_info().currsize\n"
+        "print(json.dumps(state))\n"
+    )
+    state = json.loads(_run(code).stdout)
+    assert state == {"backends": False, "gf": 0, "te": 1, "td": 0}
+
+
+def test_import_time_budget():
+    stderr = _run("import numpy, numpy.typing; import npaes").stderr
+    total = 0
+    for line in stderr.splitlines():
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        if self_us.strip().isdigit() and name.strip().startswith("npaes"):
+            total += int(self_us)
+    assert 0 < total < IMPORT_BUDGET_US
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+import pytest
+from numpy import array_equal, uint8
+
+from npaes import AES, key_schedule
+from npaes.keyring import Keyring
+
+
+def _keys(n, key_bytes=16, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (n, key_bytes), dtype=uint8)
+
+
+@pytest.mark.parametrize("key_bytes", [16, 24, 32])
+def test_insert_and_cipher(key_bytes):
+    keys = _keys(5, key_bytes)
+    ring = Keyring(100, key_bytes)
+    ring.insert([3, 10, 50, 99, 0], keys)
+    assert len(ring) == 5
+    assert list(ring.ids()) == [0, 3, 10, 50, 99]
+    assert 10 in ring
+    assert 11 not in ring
+    assert 1000 not in ring
+    assert array_equal(ring.schedule(50), key_schedule(keys[2].tobytes()))
+    cipher = ring.cipher(99)
+    assert cipher.key == keys[3].tobytes()
+    assert cipher.encrypt(bytes(32)) == AES(keys[3].tobytes()).encrypt(bytes(32))
+
+
+def test_evict():
+    ring = Keyring(10)
+    ring.insert(np.arange(10), _keys(10))
+    ring.evict([2, 7, 7])
+    assert len(ring) == 8
+    assert 2 not in ring
+    assert not ring.schedules[7].any()
+    with pytest.raises(KeyError, match="Key id 2"):
+        ring.cipher(2)
+
+
+@pytest.mark.parametrize("tile_blocks", [3, None])
+def test_multi_tenant_blocks(tile_blocks):
+    keys = _keys(4)
+    ring = Keyring(4, tile_blocks=tile_blocks)
+    ring.insert(np.arange(4), keys)
+    rng = np.random.default_rng(1)
+    ids = rng.integers(0, 4, 20)
+    blocks = rng.integers(0, 256, (20, 16), dtype=uint8)
+    ct = ring.encrypt_blocks(ids, blocks)
+    for i, block, c in zip(ids, blocks, ct, strict=True):
+        assert AES(keys[i].tobytes()).encrypt(block.tobytes()) == c.tobytes()
+    assert ring.decrypt_blocks(ids, ct, out=ct) is ct
+    assert array_equal(ct, blocks)
+
+
+def test_memory_mapped(tmp_path):
+    path = tmp_path / "keys.ring"
+    keys = _keys(3, 32)
+    with Keyring(8, 32, path=path) as ring:
+        ring.insert([1, 2, 5], keys)
+    assert path.stat().st_size == 16 + 8 * (15 * 16 + 1)
+    with Keyring(8, 32, path=path) as ring:
+        assert list(ring.ids()) == [1, 2, 5]
+        assert ring.cipher(5).key == keys[2].tobytes()
+    with pytest.raises(ValueError, match="holds 8 keys of 32 bytes, not 9 of 32"):
+        Keyring(9, 32, path=path)
+    with pytest.raises(ValueError, match="holds 8 keys of 32 bytes, not 8 of 16"):
+        Keyring(8, 16, path=path)
+    with path.open("r+b") as f:
+        f.truncate(100)
+    with pytest.raises(ValueError, match="this keyring needs"):
+        Keyring(8, 32, path=path)
+    path.write_bytes(bytes(16 + 8 * (15 * 16 + 1)))
+    with pytest.raises(ValueError, match="not an npaes keyring"):
+        Keyring(8, 32, path=path)
+
+
+def test_memory_mapped_same_size_other_shape(tmp_path):
+    # 241 slots of 176 + 1 bytes (AES-128) take as many bytes as 177 of 240 + 1 (AES-256)
+    path = tmp_path / "keys.ring"
+    Keyring(241, 16, path=path).close()
+    with pytest.raises(ValueError, match="holds 241 keys of 16 bytes, not 177 of 32"):
+        Keyring(177, 32, path=path)
+
+
+def test_shared_memory():
+    name = f"npaes-test-{os.getpid()}"
+    writer = Keyring(16, shared_memory=name)
+    try:
+        reader = Keyring(16, shared_memory=name)
+        writer.insert([4], _keys(1))
+        assert 4 in reader
+        assert reader.cipher(4).key == _keys(1)[0].tobytes()
+        reader.close()
+        with pytest.raises(ValueError, match="closed keyring"):
+            reader.cipher(4)
+        with pytest.raises(ValueError, match="holds 16 keys of 16 bytes, not 8 of 16"):
+            Keyring(8, shared_memory=name)
+        with pytest.raises(ValueError, match="holds 16 keys of 16 bytes, not 16 of 32"):
+            Keyring(16, 32, shared_memory=name)
+        assert 4 in writer
+    finally:
+        writer.unlink()
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError, match="`capacity`"):
+        Keyring(0)
+    with pytest.raises(ValueError, match="`key_bytes`"):
+        Keyring(4, 20)
+    ring = Keyring(4)
+    with pytest.raises(ValueError, match=r"must be in \[0, 4\)"):
+        ring.insert([4], _keys(1))
+    with pytest.raises(TypeError, match="integers"):
+        ring.evict([1.5])
+    with pytest.raises(ValueError, match="`keys` must have shape"):
+        ring.insert([0, 1], _keys(1))
+    with pytest.raises(ValueError, match="not backed by shared memory"):
+        ring.unlink()
+    with pytest.raises(ValueError, match="`schedule` must have shape"):
+        AES.from_schedule(np.zeros((12, 4, 4), uint8))
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.keywrap import (
+    unwrap_key,
+    unwrap_key_with_padding,
+    unwrap_keys,
+    unwrap_keys_with_padding,
+    wrap_key,
+    wrap_key_with_padding,
+    wrap_keys,
+    wrap_keys_with_padding,
+)
+
+KEK = bytes(range(32))
+KEY = bytes.fromhex("00112233445566778899aabbccddeeff000102030405060708090a0b0c0d0e0f")
+
+
+@pytest.mark.parametrize(
+    ("kek_bytes", "key_bytes", "wrapped"),
+    [
+        # RFC 3394, sections 4.1, 4.2, 4.3 and 4.6
+        (16, 16, "1fa68b0a8112b447aef34bd8fb5a7b829d3e862371d2cfe5"),
+        (24, 16, "96778b25ae6ca435f92b5b97c050aed2468ab8a17ad84e5d"),
+        (32, 16, "64e8c3f9ce0f5ba263e9777905818a2a93c8191e7d6e8ae7"),
+        (
+            32,
+            32,
+            "28c9f404c4b810f4cbccb35cfb87f8263f5786e2d80ed326cbc7f0e71a99f43bfb988b9b7a02dd21",
+        ),
+    ],
+)
+def test_rfc3394(kek_bytes, key_bytes, wrapped):
+    cipher = AES(KEK[:kek_bytes])
+    assert wrap_key(cipher, KEY[:key_bytes]).hex() == wrapped
+    assert unwrap_key(cipher, bytes.fromhex(wrapped)) == KEY[:key_bytes]
+
+
+@pytest.mark.parametrize(
+    ("key", "wrapped"),
+    [
+        # RFC 5649, section 6
+        (
+            "c37b7e6492584340bed12207808941155068f738",
+            "138bdeaa9b8fa7fc61f97742e72248ee5ae6ae5360d1ae6a5f54f373fa543b6a",
+        ),
+        ("466f7250617369", "afbeb0f07dfbf5419200f2ccb50bb24f"),
+    ],
+)
+def test_rfc5649(key, wrapped):
+    cipher = AES(bytes.fromhex("5840df6e29b02af1ab493b705bf16ea1ae8338f4dcc176a8"))
+    assert wrap_key_with_padding(cipher, bytes.fromhex(key)).hex() == wrapped
+    assert unwrap_key_with_padding(cipher, bytes.fromhex(wrapped)).hex() == key
+
+
+@pytest.mark.parametrize("length", [16, 24, 32, 64])
+def test_wrap_keys_matches_single(length):
+    cipher = AES(KEK)
+    keys = np.random.default_rng(length).integers(0, 256, (40, length), dtype=np.uint8)
+    wrapped = wrap_keys(cipher, keys)
+    assert wrapped.shape == (40, length + 8)
+    for key, w in zip(keys, wrapped, strict=True):
+        assert wrap_key(cipher, key.tobytes()) == w.tobytes()
+    np.testing.assert_array_equal(unwrap_keys(cipher, wrapped), keys)
+
+
+def test_empty_stacks():
+    cipher = AES(KEK)
+    wrapped = wrap_keys(cipher, np.empty((0, 24), dtype=np.uint8))
+    assert (wrapped.shape, wrapped.dtype) == ((0, 32), np.uint8)
+    assert unwrap_keys(cipher, wrapped).shape == (0, 24)
+    assert wrap_keys_with_padding(cipher, np.empty((0, 5), dtype=np.uint8)).shape == (0, 16)
+    assert unwrap_keys_with_padding(cipher, np.empty((0, 16), dtype=np.uint8), 5).shape == (0, 5)
+
+
+@pytest.mark.parametrize("length", [1, 8, 9, 20, 33])
+def test_wrap_keys_with_padding_matches_single(length):
+    cipher = AES(KEK[:16])
+    keys = np.random.default_rng(length).integers(0, 256, (40, length), dtype=np.uint8)
+    wrapped = wrap_keys_with_padding(cipher, keys)
+    for key, w in zip(keys, wrapped, strict=True):
+        assert wrap_key_with_padding(cipher, key.tobytes()) == w.tobytes()
+    np.testing.assert_array_equal(unwrap_keys_with_padding(cipher, wrapped), keys)
+
+
+def test_unwrap_integrity_failure():
+    cipher = AES(KEK)
+    keys = np.zeros((5, 16), dtype=np.uint8)
+    wrapped = wrap_keys(cipher, keys)
+    wrapped[3, -1] ^= 1
+    with pytest.raises(ValueError, match="1 of 5 keys"):
+        unwrap_keys(cipher, wrapped)
+    with pytest.raises(ValueError, match="integrity check failed"):
+        unwrap_keys(AES(bytes(16)), wrapped[:1])
+    padded = wrap_keys_with_padding(cipher, keys[:, :7])
+    with pytest.raises(ValueError, match="integrity check failed"):
+        unwrap_keys_with_padding(cipher, padded, length=6)
+    with pytest.raises(ValueError, match="integrity check failed"):
+        unwrap_key_with_padding(cipher, wrap_key(cipher, KEY))
+
+
+def test_wrap_errors():
+    cipher = AES(KEK)
+    with pytest.raises(ValueError, match="multiple of 8 and at least 16"):
+        wrap_key(cipher, bytes(12))
+    with pytest.raises(ValueError, match="multiple of 8 and at least 24"):
+        unwrap_key(cipher, bytes(16))
+    with pytest.raises(ValueError, match="\\(K, L\\) uint8"):
+        wrap_keys(cipher, np.zeros(16, dtype=np.uint8))
+    with pytest.raises(TypeError, match="`key` must be bytes"):
+        wrap_key_with_padding(cipher, "key")  # ty: ignore[invalid-argument-type]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.mac import cmac, cmac_batch, cmac_subkeys, cmac_verify
+
+# RFC 4493, section 4 (the SP 800-38B AES-128 examples)
+RFC4493_KEY = bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c")
+RFC4493_MESSAGE = bytes.fromhex(
+    "6bc1bee22e409f96e93d7e117393172a"
+    "ae2d8a571e03ac9c9eb76fac45af8e51"
+    "30c81c46a35ce411e5fbc1191a0a52ef"
+    "f69f2445df4f9b17ad2b417be66c3710"
+)
+RFC4493_TAGS = {
+    0: "bb1d6929e95937287fa37d129b756746",
+    16: "070a16b46b4d4144f79bdd9dd04a287c",
+    40: "dfa66747de9ae63030ca32611497c827",
+    64: "51f0bebf7e3b9d92fc49741779363cfe",
+}
+
+
+def test_cmac_subkeys():
+    cipher = AES(RFC4493_KEY)
+    k1, k2 = cmac_subkeys(cipher)
+    assert k1.tobytes().hex() == "fbeed618357133667c85e08f7236a8de"
+    assert k2.tobytes().hex() == "f7ddac306ae266ccf90bc11ee46d513b"
+    assert cmac_subkeys(cipher) is cmac_subkeys(cipher)
+
+
+@pytest.mark.parametrize(("length", "tag"), RFC4493_TAGS.items())
+def test_cmac_rfc4493(length, tag):
+    cipher = AES(RFC4493_KEY)
+    assert cmac(cipher, RFC4493_MESSAGE[:length]).hex() == tag
+
+
+def test_cmac_batch_matches_single():
+    cipher = AES(RFC4493_KEY)
+    rng = np.random.default_rng(0)
+    messages = [rng.bytes(int(n)) for n in rng.integers(0, 80, 300)]
+    messages += [RFC4493_MESSAGE[:n] for n in RFC4493_TAGS]
+    tags = cmac_batch(cipher, messages)
+    assert tags.shape == (len(messages), 16)
+    for message, tag in zip(messages, tags, strict=True):
+        assert cmac(cipher, message) == tag.tobytes()
+    for i, (length, tag) in enumerate(RFC4493_TAGS.items(), start=300):
+        assert len(messages[i]) == length
+        assert tags[i].tobytes().hex() == tag
+    assert cmac_batch(cipher, []).shape == (0, 16)
+
+
+def test_cmac_verify():
+    cipher = AES(RFC4493_KEY)
+    tag = bytes.fromhex(RFC4493_TAGS[40])
+    assert cmac_verify(cipher, RFC4493_MESSAGE[:40], tag)
+    assert cmac_verify(cipher, RFC4493_MESSAGE[:40], tag[:8])
+    assert not cmac_verify(cipher, RFC4493_MESSAGE[:39], tag)
+    with pytest.raises(ValueError, match="len\\(tag\\)"):
+        cmac_verify(cipher, b"", tag[:4])
+    with pytest.raises(TypeError, match="`message` must be bytes"):
+        cmac(cipher, "abc")  # ty: ignore[invalid-argument-type]
@@ -0,0 +1,143 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import npaes
+from npaes import AES, aio, metrics
+from npaes.aead import SIV, ccm_encrypt_batch, gcm_decrypt, gcm_encrypt
+from npaes.keywrap import unwrap_keys, wrap_key
+from npaes.mac import cmac
+from npaes.modes import XTS, ctr_xor
+
+KEY = bytes(range(16))
+IV = bytes(16)
+
+
+@pytest.fixture
+def metered():
+    metrics.reset()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def _series(**labels):
+    return [
+        s
+        for s in metrics.snapshot()["series"]
+        if all(s[name] == value for name, value in labels.items())
+    ]
+
+
+def test_disabled_by_default():
+    assert not metrics.is_enabled()
+    assert npaes._metrics is None
+    AES(KEY).encrypt(bytes(16))
+    assert metrics.snapshot() == {"enabled": False, "series": []}
+
+
+def test_entry_points(metered):
+    cipher = AES(KEY, backend="ttable")
+    cipher.encrypt(bytes(64))
+    cipher.encrypt(plaintext=bytes(10), mode="ctr", iv=IV)
+    cipher.decrypt(bytes(32))
+    ctr_xor(AES(bytes(32)), bytes(100), IV)
+
+    (ecb,) = _series(entry="AES.encrypt", mode="ecb")
+    assert ecb["calls"] == 1
+    assert ecb["bytes"] == 64
+    assert ecb["blocks"] == 4
+    assert ecb["backend"] == "ttable"
+    assert ecb["key_bits"] == 128
+    (ctr,) = _series(entry="AES.encrypt", mode="ctr")
+    assert ctr["bytes"] == 10
+    assert ctr["blocks"] == 1
+    (decrypt,) = _series(entry="AES.decrypt")
+    assert decrypt["calls"] == 1
+    (direct,) = _series(entry="modes.ctr_xor", key_bits=256)
+    assert direct["backend"] == "auto"
+    # The CTR call went through modes.ctr_xor and AES.encrypt_blocks too
+    assert _series(entry="modes.ctr_xor", key_bits=128)[0]["calls"] == 1
+    blocks = _series(entry="AES.encrypt_blocks", key_bits=128)
+    assert sum(s["calls"] for s in blocks) == 2
+    assert {s["backend"] for s in blocks} == {"ttable"}
+
+
+def test_histogram_and_times(metered):
+    cipher = AES(KEY)
+    for _ in range(3):
+        cipher.encrypt(bytes(16))
+    (s,) = _series(entry="AES.encrypt")
+    assert s["wall_seconds"] > 0
+    assert s["cpu_seconds"] >= 0
+    buckets = list(s["latency_seconds"].values())
+    assert buckets == sorted(buckets)
+    assert s["latency_seconds"]["+Inf"] == 3
+    assert set(s["latency_seconds"]) == {f"{b:g}" for b in metrics.LATENCY_BUCKETS} | {"+Inf"}
+
+
+def test_xts_and_errors(metered):
+    xts = XTS(bytes(range(64)))
+    xts.encrypt(bytes(32), 0)
+    (s,) = _series(entry="XTS.encrypt_sectors")
+    assert s["mode"] == "xts"
+    assert s["key_bits"] == 256
+    with pytest.raises(ValueError, match="multiple of 16"):
+        AES(KEY).encrypt(bytes(15))
+    # Failed calls are still counted
+    assert _series(entry="AES.encrypt")[0]["calls"] == 1
+
+
+def test_aead_mac_and_keywrap(metered):
+    cipher = AES(KEY)
+    sealed = gcm_encrypt(cipher, bytes(12), bytes(40), b"ad")
+    gcm_decrypt(cipher, bytes(12), sealed, b"ad")
+    ccm_encrypt_batch(cipher, [bytes(12)] * 2, [bytes(5), bytes(20)])
+    SIV(bytes(64)).encrypt(bytes(7), b"ad")
+    cmac(cipher, bytes(33))
+    unwrap_keys(cipher, np.frombuffer(wrap_key(cipher, bytes(16)), dtype=np.uint8).reshape(1, -1))
+    assert _series(entry="aead.gcm_encrypt", mode="gcm")[0]["bytes"] == 40
+    assert _series(entry="aead.gcm_decrypt")[0]["bytes"] == 56  # With the tag
+    assert _series(entry="aead.gcm_encrypt_batch")[0]["calls"] == 1
+    assert _series(entry="aead.ccm_encrypt_batch", mode="ccm")[0]["bytes"] == 25
+    (siv,) = _series(entry="SIV.encrypt", mode="siv")
+    assert siv["key_bits"] == 256
+    assert _series(entry="mac.cmac", mode="cmac")[0]["bytes"] == 33
+    assert _series(entry="keywrap.wrap_key", mode="kw")[0]["bytes"] == 16
+    assert _series(entry="keywrap.unwrap_keys")[0]["bytes"] == 24
+
+
+def test_async_offloaded_calls(metered):
+    cipher = AES(KEY, backend="ttable")
+
+    async def main():
+        ct = await aio.encrypt(cipher, bytes(5000), mode="ctr", iv=IV, inline_bytes=256)
+        await aio.decrypt(cipher, ct, mode="ctr", iv=IV, inline_bytes=256)
+        await aio.encrypt(cipher, bytes(32))  # Inline
+
+    asyncio.run(main())
+    (enc,) = _series(entry="aio.encrypt", mode="ctr")
+    assert (enc["calls"], enc["bytes"], enc["cpu_seconds"]) == (1, 5000, 0.0)
+    assert _series(entry="aio.decrypt")[0]["bytes"] == 5000
+    assert _series(entry="AES.encrypt", mode="ecb")[0]["bytes"] == 32
+
+
+def test_bad_arguments_raise_as_unmetered(metered):
+    cipher = AES(KEY)
+    with pytest.raises(TypeError, match="`plaintext` must be bytes"):
+        cipher.encrypt("abc")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(TypeError, match="missing 1 required positional argument"):
+        cipher.encrypt()  # ty: ignore[missing-argument]
+    with pytest.raises(TypeError, match="`message` must be bytes"):
+        cmac(cipher, "abc")  # ty: ignore[invalid-argument-type]
+    assert not _series(entry="AES.encrypt")
+
+
+def test_disable_keeps_data(metered):
+    AES(KEY).encrypt(bytes(16))
+    metrics.disable()
+    AES(KEY).encrypt(bytes(16))
+    assert _series(entry="AES.encrypt")[0]["calls"] == 1
+    assert metrics.snapshot()["enabled"] is False
@@ -0,0 +1,270 @@
+import numpy as np
+import pytest
+
+from npaes import AES
+from npaes.modes import (
+    XTS,
+    OFBKeystream,
+    cfb_decrypt,
+    counter_blocks,
+    ctr_xor,
+    ctr_xor_batch,
+    ofb_keystream,
+    xts_tweaks,
+)
+
+# NIST SP 800-38A, Appendix F: the same four plaintext blocks throughout
+SP800_38A_PLAINTEXT = bytes.fromhex(
+    "6bc1bee22e409f96e93d7e117393172a"
+    "ae2d8a571e03ac9c9eb76fac45af8e51"
+    "30c81c46a35ce411e5fbc1191a0a52ef"
+    "f69f2445df4f9b17ad2b417be66c3710"
+)
+SP800_38A_KEYS = {
+    128: bytes.fromhex("2b7e151628aed2a6abf7158809cf4f3c"),
+    192: bytes.fromhex("8e73b0f7da0e6452c810f32b809079e562f8ead2522c6b7b"),
+    256: bytes.fromhex("603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4"),
+}
+CTR_IV = bytes.fromhex("f0f1f2f3f4f5f6f7f8f9fafbfcfdfeff")
+
+
+@pytest.mark.parametrize(
+    ("bits", "ciphertext"),
+    [
+        (
+            128,
+            "874d6191b620e3261bef6864990db6ce9806f66b7970fdff8617187bb9fffdff"
+            "5ae4df3edbd5d35e5b4f09020db03eab1e031dda2fbe03d1792170a0f3009cee",
+        ),
+        (
+            192,
+            "1abc932417521ca24f2b0459fe7e6e0b090339ec0aa6faefd5ccc2c6f4ce8e94"
+            "1e36b26bd1ebc670d1bd1d665620abf74f78a7f6d29809585a97daec58c6b050",
+        ),
+        (
+            256,
+            "601ec313775789a5b7a7f504bbf3d228f443e3ca4d62b59aca84e990cacaf5c5"
+            "2b0930daa23de94ce87017ba2d84988ddfc9c58db67aada613c2dd08457941a6",
+        ),
+    ],
+)
+def test_ctr_sp800_38a(bits, ciphertext):
+    cipher = AES(SP800_38A_KEYS[bits])
+    ct = bytes.fromhex(ciphertext)
+    assert cipher.encrypt(SP800_38A_PLAINTEXT, mode="ctr", iv=CTR_IV) == ct
+    assert cipher.decrypt(ct, mode="ctr", iv=CTR_IV) == SP800_38A_PLAINTEXT
+
+
+def test_ctr_any_length_and_offset():
+    cipher = AES(SP800_38A_KEYS[128])
+    msg = np.random.default_rng(0).bytes(1000)
+    ct = cipher.encrypt(msg, mode="ctr", iv=CTR_IV)
+    assert len(ct) == len(msg)
+    for offset, n in [(0, 0), (1, 1), (15, 17), (16, 32), (999, 1)]:
+        chunk = ctr_xor(cipher, msg[offset : offset + n], CTR_IV, offset)
+        assert chunk.tobytes() == ct[offset : offset + n]
+
+
+def test_ctr_xor_batch():
+    cipher = AES(SP800_38A_KEYS[192])
+    rng = np.random.default_rng(2)
+    lengths = rng.integers(0, 70, 40)
+    messages = [rng.bytes(int(n)) for n in lengths]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    ivs = rng.integers(0, 256, (40, 16), dtype=np.uint8)
+    ivs[0, 8:] = 0xFF  # The counter carries into the high half
+    out = ctr_xor_batch(cipher, b"".join(messages), offsets, ivs)
+    for i, msg in enumerate(messages):
+        expected = cipher.encrypt(msg, mode="ctr", iv=ivs[i].tobytes())
+        assert out[offsets[i] : offsets[i + 1]].tobytes() == expected
+    assert ctr_xor_batch(cipher, b"", [0], np.empty((0, 16), dtype=np.uint8)).size == 0
+
+
+def test_ctr_xor_batch_errors():
+    cipher = AES(bytes(16))
+    ivs = np.zeros((2, 16), dtype=np.uint8)
+    with pytest.raises(ValueError, match="start at 0 and end at len\\(data\\)"):
+        ctr_xor_batch(cipher, bytes(10), [0, 4, 9], ivs)
+    with pytest.raises(ValueError, match="nondecreasing"):
+        ctr_xor_batch(cipher, bytes(10), [0, 11, 10], ivs)
+    with pytest.raises(ValueError, match="1d integer"):
+        ctr_xor_batch(cipher, bytes(10), [0.0, 10.0], ivs)
+    with pytest.raises(ValueError, match="`ivs` must be a \\(2, 16\\)"):
+        ctr_xor_batch(cipher, bytes(10), [0, 4, 10], ivs[:1])
+
+
+def test_counter_blocks_carry():
+    # The counter is one 128-bit integer: the carry crosses the 64-bit halves
+    iv = bytes(7) + b"\x01" + b"\xff" * 8
+    blocks = counter_blocks(iv, 0, 2)
+    assert blocks[1].tobytes() == bytes(7) + b"\x02" + bytes(8)
+    wrapped = counter_blocks(b"\xff" * 16, 1, 1)
+    assert wrapped.tobytes() == bytes(16)
+    big = counter_blocks(bytes(16), 2**70 + 3, 1)
+    assert int.from_bytes(big.tobytes(), "big") == 2**70 + 3
+
+
+SP800_38A_IV = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+
+
+@pytest.mark.parametrize(
+    ("mode", "ciphertext"),
+    [
+        # SP 800-38A, F.3.13 (CFB128-AES128) and F.4.1 (OFB-AES128)
+        (
+            "cfb",
+            "3b3fd92eb72dad20333449f8e83cfb4ac8a64537a0b3a93fcde3cdad9f1ce58b"
+            "26751f67a3cbb140b1808cf187a4f4dfc04b05357c5d1c0eeac4c66f9ff7f2e6",
+        ),
+        (
+            "ofb",
+            "3b3fd92eb72dad20333449f8e83cfb4a7789508d16918f03f53c52dac54ed825"
+            "9740051e9c5fecf64344f7a82260edcc304c6528f659c77866a510d9c1d6ae5e",
+        ),
+    ],
+)
+def test_cfb_ofb_sp800_38a(mode, ciphertext):
+    cipher = AES(SP800_38A_KEYS[128])
+    ct = bytes.fromhex(ciphertext)
+    assert cipher.encrypt(SP800_38A_PLAINTEXT, mode=mode, iv=SP800_38A_IV) == ct
+    assert cipher.decrypt(ct, mode=mode, iv=SP800_38A_IV) == SP800_38A_PLAINTEXT
+    # A partial last block uses the leading bytes of its keystream
+    assert cipher.encrypt(SP800_38A_PLAINTEXT[:37], mode=mode, iv=SP800_38A_IV) == ct[:37]
+    assert cipher.decrypt(ct[:37], mode=mode, iv=SP800_38A_IV) == SP800_38A_PLAINTEXT[:37]
+
+
+def test_cfb_decrypt_empty():
+    assert cfb_decrypt(AES(bytes(16)), b"", SP800_38A_IV).size == 0
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_ofb_keystream_object(background):
+    cipher = AES(SP800_38A_KEYS[256])
+    msg = np.random.default_rng(1).bytes(1500)
+    expected = cipher.encrypt(msg, mode="ofb", iv=SP800_38A_IV)
+    with OFBKeystream(cipher, SP800_38A_IV, ahead=256, background=background) as ofb:
+        if not background:
+            ofb.precompute(1000)
+            assert ofb.buffered == 1008
+        pieces = [ofb.xor(msg[a:b]) for a, b in [(0, 1), (1, 1), (1, 600), (600, 1500)]]
+    assert b"".join(pieces) == expected
+    assert ofb_keystream(cipher, SP800_38A_IV, 3).tobytes() == bytes(
+        a ^ b for a, b in zip(expected[:48], msg[:48], strict=True)
+    )
+
+
+def test_ofb_keystream_errors():
+    cipher = AES(bytes(16))
+    with pytest.raises(ValueError, match="`ahead`"):
+        OFBKeystream(cipher, SP800_38A_IV, ahead=8)
+    with (
+        OFBKeystream(cipher, SP800_38A_IV, background=True) as ofb,
+        pytest.raises(ValueError, match="not used"),
+    ):
+        ofb.precompute(16)
+    ofb = OFBKeystream(cipher, SP800_38A_IV, background=True)
+    ofb.close()
+    ofb._chunks.clear()  # Drop what the thread made before it stopped
+    with pytest.raises(ValueError, match="closed"):
+        ofb.xor(b"data")
+
+
+def test_mode_errors():
+    cipher = AES(bytes(16))
+    with pytest.raises(ValueError, match="`mode` must be"):
+        cipher.encrypt(bytes(16), mode="xyz", iv=CTR_IV)  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="requires an `iv`"):
+        cipher.encrypt(b"abc", mode="ctr")
+    with pytest.raises(ValueError, match="does not use padding"):
+        cipher.decrypt(b"abc", "pkcs7", mode="ctr", iv=CTR_IV)
+    with pytest.raises(ValueError, match="does not take an `iv`"):
+        cipher.encrypt(bytes(16), iv=CTR_IV)
+    with pytest.raises(ValueError, match="does not take an `iv`"):
+        cipher.decrypt(bytes(16), iv=CTR_IV)
+    with pytest.raises(ValueError, match="len\\(iv\\)"):
+        cipher.encrypt(b"abc", mode="ctr", iv=b"short")
+    with pytest.raises(TypeError, match="`iv` must be bytes"):
+        cipher.encrypt(b"abc", mode="ctr", iv="0" * 16)  # ty: ignore[invalid-argument-type]
+
+
+@pytest.mark.parametrize(
+    ("key", "sector", "plaintext", "ciphertext"),
+    [
+        # IEEE 1619-2007, Annex B, vectors 2 and 3
+        (
+            "11" * 16 + "22" * 16,
+            0x3333333333,
+            "44" * 32,
+            "c454185e6a16936e39334038acef838bfb186fff7480adc4289382ecd6d394f0",
+        ),
+        (
+            "fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0" + "22" * 16,
+            0x3333333333,
+            "44" * 32,
+            "af85336b597afc1a900b2eb21ec949d292df4c047e0b21532186a5971a227a89",
+        ),
+        # Ciphertext stealing on a 17-byte data unit, checked against OpenSSL
+        (
+            "fffefdfcfbfaf9f8f7f6f5f4f3f2f1f0bfbebdbcbbbab9b8b7b6b5b4b3b2b1b0",
+            0x9A78563412,
+            bytes(range(17)).hex(),
+            "641610679dcbf92e505c41333fb06c2a95",
+        ),
+    ],
+)
+def test_xts_vectors(key, sector, plaintext, ciphertext):
+    xts = XTS(bytes.fromhex(key))
+    pt, ct = bytes.fromhex(plaintext), bytes.fromhex(ciphertext)
+    assert xts.encrypt(pt, sector) == ct
+    assert xts.decrypt(ct, sector) == pt
+
+
+@pytest.mark.parametrize("keylen", [32, 64])
+@pytest.mark.parametrize("sector_size", [16, 17, 31, 48, 512, 520])
+def test_xts_sectors_match_single(keylen, sector_size):
+    rng = np.random.default_rng(sector_size)
+    xts = XTS(rng.bytes(keylen))
+    data = rng.bytes(sector_size * 5)
+    ct = xts.encrypt_sectors(data, sector_size, first_sector=2**40 - 2)
+    for i in range(5):
+        unit = slice(i * sector_size, (i + 1) * sector_size)
+        assert xts.encrypt(data[unit], 2**40 - 2 + i) == ct[unit]
+    assert xts.decrypt_sectors(ct, sector_size, first_sector=2**40 - 2) == data
+
+
+def test_xts_tweaks_are_successive_doublings():
+    xts = XTS(bytes(range(32)))
+    tweaks = xts_tweaks(xts.tweak_cipher, 7, 2, 70)
+    for t in tweaks:
+        value = int.from_bytes(t[0].tobytes(), "little")
+        for j in range(1, 70):
+            value <<= 1
+            if value >> 128:
+                value ^= (1 << 128) | 0x87
+            assert int.from_bytes(t[j].tobytes(), "little") == value
+
+
+@pytest.mark.parametrize("first_sector", [2**64 - 2, 2**127 + 5, 2**128 - 3])
+def test_xts_128_bit_sectors(first_sector):
+    xts = XTS(bytes(range(32)))
+    tweaks = xts_tweaks(xts.tweak_cipher, first_sector, 3, 1)
+    for i, t in enumerate(tweaks):
+        assert t[0].tobytes() == xts.tweak_cipher.encrypt((first_sector + i).to_bytes(16, "little"))
+
+
+def test_xts_errors():
+    with pytest.raises(ValueError, match="32 or 64"):
+        XTS(bytes(16))
+    with pytest.raises(ValueError, match="must differ"):
+        XTS(bytes(32))
+    xts = XTS(bytes(range(32)))
+    with pytest.raises(ValueError, match="at least 16"):
+        xts.encrypt(bytes(15), 0)
+    with pytest.raises(ValueError, match="multiple of sector_size"):
+        xts.encrypt_sectors(bytes(100), 512)
+    with pytest.raises(TypeError, match="`data` must be bytes"):
+        xts.decrypt("x" * 16, 0)  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match=r"in \[0, 2\*\*128\)"):
+        xts.encrypt(bytes(16), -1)
+    with pytest.raises(ValueError, match=r"in \[0, 2\*\*128\)"):
+        xts.encrypt_sectors(bytes(32), 16, first_sector=2**128 - 1)
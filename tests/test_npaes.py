@@ -1,13 +1,18 @@
 # /usr/bin/env python
 
+import numpy as np
 import pytest
 from numpy import array, array_equal, uint8
 from numpy import bitwise_xor as xor
 
+import npaes
 from npaes import (
+    AES,
     RCON,
     array_to_hex,
+    decrypt_blocks,
     decrypt_raw,
+    encrypt_blocks,
     encrypt_raw,
     expand_key,
     gf_multiply,
@@ -15,7 +20,13 @@ from npaes import (
     inv_mix_columns,
     inv_shift_rows,
     inv_sub_bytes,
+    key_schedule,
+    key_schedules,
+    key_to_array,
     mix_columns,
+    schedule_cache_clear,
+    schedule_cache_info,
+    set_schedule_cache_size,
     shift_rows,
     sub_bytes,
 )
@@ -327,6 +338,22 @@ def test_expand_key(key, out):
     assert array_equal(expand_key(key), out)
 
 
+@pytest.mark.parametrize("key", [key128, key192, key256])
+def test_key_schedules(key):
+    raw = bytes(key.swapaxes(0, 1).flat)
+    other = bytes(range(len(raw)))
+    stacked = key_schedules(array([bytearray(raw), bytearray(other)], dtype=uint8))
+    assert array_equal(stacked[0], key_schedule(raw))
+    assert array_equal(stacked[1], key_schedule(other))
+    # Round keys are words of the expanded key, in column ordering
+    assert array_equal(stacked[0].swapaxes(0, 1).reshape(4, -1), expand_key(key))
+
+
+def test_key_schedules_bad_shape():
+    with pytest.raises(ValueError, match="must have shape"):
+        key_schedules(array([[0] * 20], dtype=uint8))
+
+
 # Test of intermediate values from xor with RCON lookup
 asw_to_axo_128 = (
     (hex_to_array("8a84eb01", 1), hex_to_array("8b84eb01", 1)),
@@ -817,3 +844,112 @@ def test_example_vectors(vectors):
 def test_example_inv_vectors(vectors):
     start, key, tgt = map(hex_to_array, (vectors[0], vectors[1], vectors[-1]))
     assert array_equal(decrypt_raw(tgt, key), start)
+
+
+# ---------------------------------------------------------------------
+# Schedule cache
+
+
+@pytest.fixture
+def schedule_cache():
+    maxsize = schedule_cache_info().maxsize
+    schedule_cache_clear()
+    yield
+    set_schedule_cache_size(maxsize)
+    schedule_cache_clear()
+
+
+def test_schedule_cache_hits(schedule_cache, monkeypatch):
+    key = bytes(range(16))
+    first = AES(key)
+    calls = []
+    with monkeypatch.context() as m:
+        m.setattr(npaes, "expand_key", lambda k: calls.append(k))
+        second = AES(key)
+    assert not calls
+    assert second._schedule is first._schedule
+    assert not first._schedule.flags.writeable
+    assert schedule_cache_info() == (1, 1, 0, 128, 1)
+    assert second.decrypt(first.encrypt(bytes(32))) == bytes(32)
+
+
+def test_schedule_cache_evicts_lru(schedule_cache):
+    set_schedule_cache_size(2)
+    a, b, c = (bytes([i]) * 16 for i in range(3))
+    AES(a)
+    AES(b)
+    AES(a)  # b is now least recently used
+    AES(c)
+    assert schedule_cache_info() == (1, 3, 1, 2, 2)
+    AES(a)
+    AES(b)
+    assert schedule_cache_info().hits == 2
+    set_schedule_cache_size(0)
+    assert schedule_cache_info().currsize == 0
+    AES(a)
+    assert schedule_cache_info().currsize == 0
+    with pytest.raises(ValueError, match="nonnegative"):
+        set_schedule_cache_size(-1)
+
+
+# ---------------------------------------------------------------------
+# Batched, broadcasting block functions
+
+
+def _random(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=uint8)
+
+
+@pytest.mark.parametrize("backend", ["reference", "vectorized", "ttable"])
+def test_encrypt_blocks_broadcasts_schedules(backend):
+    keys = _random((3, 24))
+    schedules = key_schedules(keys)  # (3, 13, 4, 4)
+    blocks = _random((4, 1, 16), seed=1)
+    out = encrypt_blocks(blocks, schedules, backend=backend, tile_blocks=5)
+    assert out.shape == (4, 3, 16)
+    for i in range(4):
+        for k in range(3):
+            assert out[i, k].tobytes() == AES(keys[k].tobytes()).encrypt(blocks[i, 0].tobytes())
+    assert array_equal(
+        decrypt_blocks(out, schedules[None], backend=backend), np.broadcast_to(blocks, out.shape)
+    )
+
+
+def test_encrypt_blocks_states_match_raw():
+    key = bytes(range(16))
+    blocks = _random((2, 3, 16))
+    states = blocks.reshape(2, 3, 4, 4).swapaxes(-1, -2)  # FIPS197 column ordering
+    out = encrypt_blocks(states, key_schedule(key))
+    assert out.shape == (2, 3, 4, 4)
+    for i, j in np.ndindex(2, 3):
+        assert array_equal(out[i, j], encrypt_raw(states[i, j].copy(), key_to_array(key)))
+    assert array_equal(decrypt_blocks(out, key_schedule(key)), states)
+    assert array_equal(decrypt_raw(out[1, 2].copy(), key_to_array(key)), states[1, 2])
+
+
+def test_encrypt_blocks_out():
+    schedule = key_schedule(bytes(16))
+    blocks = _random((10, 16))
+    expected = encrypt_blocks(blocks, schedule)
+    assert encrypt_blocks(blocks, schedule, out=blocks) is blocks
+    assert array_equal(blocks, expected)
+    states = np.empty((10, 4, 4), dtype=uint8)
+    assert encrypt_blocks(expected.reshape(10, 4, 4).swapaxes(1, 2), schedule, out=states) is states
+    assert array_equal(states.swapaxes(1, 2).reshape(10, 16), encrypt_blocks(expected, schedule))
+    with pytest.raises(ValueError, match=r"`out` must be uint8 with shape \(10, 16\)"):
+        encrypt_blocks(blocks, schedule, out=states)
+    with pytest.raises(ValueError, match="do not broadcast"):
+        encrypt_blocks(blocks, key_schedules(_random((3, 16))))
+    with pytest.raises(ValueError, match="`blocks` must have shape"):
+        encrypt_blocks(_random((10, 8)), schedule)
+    with pytest.raises(ValueError, match="`schedule` must have shape"):
+        encrypt_blocks(blocks, schedule[:5])
+    with pytest.raises(TypeError, match="uint8"):
+        encrypt_blocks(blocks.astype(np.int16), schedule)
+
+
+def test_all_exports_public_api():
+    namespace = {}
+    exec("from npaes import *", namespace)
+    for name in ["encrypt_blocks", "decrypt_blocks", "key_schedule", "key_schedules"]:
+        assert namespace[name] is getattr(npaes, name)
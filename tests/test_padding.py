@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from numpy import array_equal, uint8
+
+from npaes import AES
+from npaes.padding import pad_into, padded_size, pkcs7_pad_lengths, pkcs7_valid
+
+KEY = bytes(range(32))
+
+
+@pytest.mark.parametrize("n", [0, 1, 15, 16, 17, 31, 32, 33, 100])
+def test_pad_into(n):
+    data = bytes(range(n))
+    out = pad_into(data)
+    assert len(out) == padded_size(n) > n
+    assert out.tobytes()[:n] == data
+    k = len(out) - n
+    assert out.tobytes()[n:] == bytes([k]) * k
+
+
+def test_pad_into_preallocated():
+    out = np.zeros(32, dtype=uint8)
+    assert pad_into(b"x" * 20, out) is out
+    with pytest.raises(ValueError, match="must have shape"):
+        pad_into(b"x" * 20, np.zeros(16, dtype=uint8))
+
+
+@pytest.mark.parametrize("n", [0, 1, 15, 16, 17, 47, 48, 1000])
+def test_roundtrip(n):
+    cipher = AES(KEY)
+    msg = np.random.default_rng(n).bytes(n)
+    ct = cipher.encrypt(msg, padding="pkcs7")
+    assert len(ct) == padded_size(n)
+    assert cipher.decrypt(ct, padding="pkcs7") == msg
+    # Same as padding by hand
+    k = len(ct) - n
+    assert ct == cipher.encrypt(msg + bytes([k]) * k)
+
+
+def test_decrypt_rejects_bad_padding():
+    cipher = AES(KEY)
+    for last in (bytes(16), b"\x00" * 15 + b"\x11", b"\x01" * 14 + b"\x02\x03"):
+        with pytest.raises(ValueError, match="Invalid PKCS#7 padding"):
+            cipher.decrypt(cipher.encrypt(last), padding="pkcs7")
+    with pytest.raises(ValueError, match="Invalid PKCS#7 padding"):
+        cipher.decrypt(b"", padding="pkcs7")
+
+
+def test_unknown_padding():
+    cipher = AES(KEY)
+    with pytest.raises(ValueError, match="`padding` must be"):
+        cipher.encrypt(b"abc", padding="zero")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="`padding` must be"):
+        cipher.decrypt(bytes(16), padding="zero")  # ty: ignore[invalid-argument-type]
+
+
+def test_batched_validation():
+    last = np.stack([pad_into(bytes(range(n)))[-16:] for n in range(40)])
+    expected = np.array([padded_size(n) - n for n in range(40)])
+    assert array_equal(pkcs7_pad_lengths(last), expected)
+    assert pkcs7_valid(last).all()
+
+    last[3, -1] = 0
+    last[7, -2] ^= 1
+    valid = pkcs7_valid(last)
+    assert np.flatnonzero(~valid).tolist() == [3, 7]
+    with pytest.raises(ValueError, match="2 of 40"):
+        pkcs7_pad_lengths(last)
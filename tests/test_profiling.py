@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import npaes
+from npaes import AES, backends
+from npaes.profiling import STAGES, breakdown_table, profile_encrypt, profiling
+
+
+def test_restores_functions():
+    originals = {name: getattr(npaes, name) for name in ("sub_bytes", "xor", "expand_key")}
+    with profiling():
+        assert npaes.sub_bytes is not originals["sub_bytes"]
+        assert backends.sub_bytes is not originals["sub_bytes"]
+    for name, func in originals.items():
+        assert getattr(npaes, name) is func
+    assert backends.xor is originals["xor"]
+
+
+@pytest.mark.parametrize("name", ["reference", "vectorized", "ttable"])
+def test_results_unchanged(name):
+    key, msg = bytes(range(32)), bytes(range(64))
+    expected = AES(key, backend=name).encrypt(msg)
+    with profiling() as profile:
+        cipher = AES.from_schedule(npaes.key_schedule(key), backend=name)
+        assert cipher.encrypt(msg) == expected
+        assert cipher.decrypt(expected) == msg
+    assert profile.calls["add_round_key"] > 0
+
+
+@pytest.mark.parametrize("decrypt", [False, True])
+def test_vectorized_stages(decrypt):
+    profile = profile_encrypt(8, "vectorized", decrypt=decrypt, repeat=2)
+    # Nine full rounds plus the final one, per run; the Python-level
+    # calls are per batch, not per block
+    assert profile.calls["sub_bytes"] == 2 * 10
+    assert profile.calls["mix_columns"] == 2 * 9
+    assert profile.calls["add_round_key"] == 2 * 11
+    assert profile.calls["key_expansion"] == 2
+    times = profile.breakdown()
+    assert set(times) == {*STAGES, "other", "total"}
+    assert times["total"] >= sum(times[s] for s in STAGES)
+
+
+def test_reference_expands_per_block():
+    profile = profile_encrypt(3, "reference", repeat=1)
+    # Once for the schedule, then encrypt_raw() once per block
+    assert profile.calls["key_expansion"] == 1 + 3
+    assert profile.calls["sub_bytes"] == 3 * 10
+
+
+def test_table():
+    table = breakdown_table([1, 4], ["ttable"], repeat=1)
+    lines = table.splitlines()
+    assert "t_table_round" in lines[0]
+    assert len(lines) == 4
+
+
+def test_counts_every_thread_once():
+    cipher = AES(bytes(16), backend="vectorized")
+    msg = bytes(64)
+    cipher.encrypt(msg)
+
+    def work():
+        for _ in range(20):
+            cipher.encrypt(msg)
+
+    with profiling() as profile:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert profile.calls["sub_bytes"] == 4 * 20 * 10
+    assert profile.calls["mix_columns"] == 4 * 20 * 9
+
+
+def test_not_reentrant():
+    original = npaes.sub_bytes
+    with profiling(), pytest.raises(RuntimeError, match="already active"), profiling():
+        pass
+    assert npaes.sub_bytes is original
+    with profiling():  # Usable again afterwards
+        assert npaes.sub_bytes is not original
@@ -0,0 +1,109 @@
+"""One `AES` instance (and the module-level caches) under many threads.
+
+These run on every interpreter.  On a free-threaded build (3.13t/3.14t,
+in the CI matrix as jobs that may fail) the threads run in parallel.
+"""
+
+import os
+import sys
+import sysconfig
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import npaes
+from npaes import AES, backends, schedule_cache_clear, schedule_cache_info
+from npaes.aead import gcm_decrypt, gcm_encrypt
+from npaes.drbg import CTRDRBG
+from npaes.mac import cmac
+
+THREADS = 8
+KEY = bytes(range(16))
+IV = bytes(range(16, 32))
+
+
+def _run(func, n):
+    with ThreadPoolExecutor(THREADS) as pool:
+        return list(pool.map(func, range(n)))
+
+
+@pytest.mark.skipif(
+    not sysconfig.get_config_var("Py_GIL_DISABLED") or "PYTHON_GIL" in os.environ,
+    reason="free-threaded build, GIL not forced either way",
+)
+def test_gil_stays_disabled():
+    # Importing an extension that does not declare free-threading
+    # support would have turned the GIL back on
+    assert not sys._is_gil_enabled()
+
+
+@pytest.mark.parametrize("name", ["vectorized", "ttable"])
+def test_shared_instance(name):
+    cipher = AES(KEY, backend=name)
+    messages = [np.random.default_rng(i).bytes(16 * (i % 7) + i % 16) for i in range(64)]
+    expected = [
+        (
+            cipher.encrypt(m, "pkcs7"),
+            cipher.encrypt(m, mode="ctr", iv=IV),
+            cipher.encrypt(m, mode="cfb", iv=IV),
+            cmac(cipher, m),
+        )
+        for m in messages
+    ]
+
+    def work(i):
+        m = messages[i]
+        got = (
+            cipher.encrypt(m, "pkcs7"),
+            cipher.encrypt(m, mode="ctr", iv=IV),
+            cipher.encrypt(m, mode="cfb", iv=IV),
+            cmac(cipher, m),
+        )
+        assert cipher.decrypt(got[0], "pkcs7") == m
+        assert gcm_decrypt(cipher, IV[:12], gcm_encrypt(cipher, IV[:12], m)) == m
+        return got
+
+    assert _run(work, len(messages)) == expected
+
+
+def test_tables_are_read_only():
+    tables = [
+        npaes.SBOX,
+        npaes.INVSBOX,
+        npaes.RCON,
+        npaes.ETABLE,
+        npaes.colindexer,
+        npaes.pm0,
+        npaes._gf_product_table(),
+        backends._te(),
+        backends._td(),
+        backends._SHIFT,
+        AES(KEY)._schedule,
+    ]
+    for table in tables:
+        assert not table.flags.writeable
+
+
+def test_schedule_cache_counters():
+    maxsize = schedule_cache_info().maxsize
+    npaes.set_schedule_cache_size(4)
+    schedule_cache_clear()
+    try:
+        keys = [bytes([i]) * 16 for i in range(6)]
+        ciphers = _run(lambda i: AES(keys[i % 6]), 600)
+        info = schedule_cache_info()
+        assert info.hits + info.misses == 600
+        assert info.currsize <= 4
+        for i, cipher in enumerate(ciphers):
+            assert cipher.key == keys[i % 6]
+    finally:
+        npaes.set_schedule_cache_size(maxsize)
+        schedule_cache_clear()
+
+
+def test_shared_drbg_never_repeats():
+    serial = CTRDRBG(b"seed")
+    expected = {serial.generate(32) for _ in range(200)}
+    shared = CTRDRBG(b"seed")
+    assert set(_run(lambda _: shared.generate(32), 200)) == expected
@@ -0,0 +1,128 @@
+import io
+import os
+
+import pytest
+
+from npaes import AES
+from npaes.cli import _HEADER, decrypt_stream, main
+from npaes.tree import _plan, decrypt_tree, encrypt_tree
+
+KEY = bytes(range(16))
+SIZES = {"a/0": 0, "a/1": 1, "a/b/99": 99, "a/b/100": 100, "c/250": 250, "big": 2345, "top": 777}
+OPTIONS = {"chunk_size": 100, "tile_bytes": 1000, "batch_files": 3, "workers": 1}
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    for name, size in SIZES.items():
+        (src / name).parent.mkdir(parents=True, exist_ok=True)
+        (src / name).write_bytes(os.urandom(size))
+    (src / "empty" / "dir").mkdir(parents=True)
+    return src
+
+
+def _files(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+
+@pytest.mark.parametrize("mode", ["gcm", "ctr"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_roundtrip(tree, tmp_path, mode, workers):
+    options = {**OPTIONS, "workers": workers}
+    stats = encrypt_tree(tree, tmp_path / "enc", KEY, mode=mode, **options)
+    assert stats == (len(SIZES), sum(SIZES.values()))
+    del options["chunk_size"]
+    assert decrypt_tree(tmp_path / "enc", tmp_path / "dec", AES(KEY), **options) == stats
+    assert _files(tmp_path / "dec") == _files(tree)
+    assert (tmp_path / "dec" / "empty" / "dir").is_dir()
+    # Every output is an ordinary stream, whether it was batched or tiled
+    for name in ["a/b/100", "big"]:
+        out = io.BytesIO()
+        with (tmp_path / "enc" / name).open("rb") as f:
+            decrypt_stream(f, out, AES(KEY))
+        assert out.getvalue() == (tree / name).read_bytes()
+
+
+def test_plan_sizes_jobs(tree, tmp_path):
+    batches, tiles = [], []
+
+    def small(names, size):
+        batches.append(names)
+        return size, None, ()
+
+    def large(name, size):
+        tiles.append(name)
+        return [(1000, None, ()), (size - 1000, None, ())]
+
+    jobs, nfiles = _plan(tree, tmp_path, 1000, 3, small, large)
+    assert nfiles == len(SIZES)
+    assert tiles == ["big"]
+    assert sorted(name for names in batches for name in names) == sorted(set(SIZES) - {"big"})
+    assert max(map(len, batches)) <= 3
+    assert [size for size, _, _ in jobs] == sorted((size for size, _, _ in jobs), reverse=True)
+    assert (tmp_path / "a" / "b").is_dir()
+
+
+def test_gcm_detects_tampering(tree, tmp_path):
+    enc = tmp_path / "enc"
+    encrypt_tree(tree, enc, KEY, **OPTIONS)
+    options = {"tile_bytes": 1000, "workers": 1}
+
+    def tamper(name, offset):
+        blob = bytearray((enc / name).read_bytes())
+        blob[offset] ^= 1
+        (enc / name).write_bytes(blob)
+        return blob
+
+    start = _HEADER.size + 8
+    tamper("c/250", start + 116 + 5)
+    with pytest.raises(ValueError, match=r"c/250: Chunk 1 of the stream failed"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+    tamper("c/250", start + 116 + 5)
+    tamper("big", start + 20 * 116 + 3)
+    with pytest.raises(ValueError, match=r"big: Chunk 20 of the stream failed"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+    blob = tamper("big", start + 20 * 116 + 3)
+    (enc / "big").write_bytes(blob[: start + 20 * 116])  # Cut at a chunk boundary
+    with pytest.raises(ValueError, match=r"big: Chunk 19 of the stream failed"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+    (enc / "big").write_bytes(blob[:-1])
+    with pytest.raises(ValueError, match=r"big: Chunk 23 of the stream failed"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+    (enc / "big").write_bytes(blob)
+    (enc / "a" / "1").write_bytes(b"plaintext")
+    with pytest.raises(ValueError, match=r"a/1: Not an npaes stream"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+    (enc / "a" / "1").write_bytes((enc / "a" / "0").read_bytes()[:-1])
+    with pytest.raises(ValueError, match=r"a/1: Truncated npaes stream"):
+        decrypt_tree(enc, tmp_path / "dec", KEY, **options)
+
+
+def test_arguments(tree, tmp_path):
+    with pytest.raises(ValueError, match="inside the source"):
+        encrypt_tree(tree, tree / "enc", KEY)
+    with pytest.raises(ValueError, match="not a directory"):
+        encrypt_tree(tree / "top", tmp_path / "enc", KEY)
+    with pytest.raises(ValueError, match="`workers`"):
+        decrypt_tree(tree, tmp_path / "enc", KEY, workers=0)
+    with pytest.raises(ValueError, match="`tile_bytes`"):
+        encrypt_tree(tree, tmp_path / "enc", KEY, tile_bytes=0)
+    with pytest.raises(ValueError, match="`mode`"):
+        encrypt_tree(tree, tmp_path / "enc", KEY, mode="ecb")  # ty: ignore[invalid-argument-type]
+
+
+def test_main(tree, tmp_path, capsys):
+    key = tmp_path / "key"
+    key.write_bytes(KEY)
+    args = ["--key-file", str(key), "--tile-size", "1K", "--workers", "1"]
+    assert main(["encrypt", *args, "-i", str(tree), "-o", str(tmp_path / "enc")]) == 0
+    assert f"encrypted {len(SIZES)} files" in capsys.readouterr().err
+    assert main(["decrypt", *args, "-i", str(tmp_path / "enc"), "-o", str(tmp_path / "dec")]) == 0
+    assert _files(tmp_path / "dec") == _files(tree)
+    (tmp_path / "enc" / "top").write_bytes(b"")
+    assert main(["decrypt", *args, "-i", str(tmp_path / "enc"), "-o", str(tmp_path / "dec")]) == 1
+    assert "Not an npaes stream" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main(["encrypt", *args, "-i", str(tree)])
+    assert "output directory" in capsys.readouterr().err